@@ -3,17 +3,32 @@
 SENTINEL AWS Diagnostics
 ========================
 Verifica la configuración de AWS CLI, credenciales y recursos existentes.
-Ejecutar: python3 aws_diagnostics.py
+Ejecutar: python3 aws_diagnostics.py [--refresh]
 """
 
 import subprocess
+import asyncio
+import shlex
 import sys
 import os
+import io
 import json
+import time
+import argparse
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 DIVIDER = "=" * 60
 REGIONS_TO_CHECK = ["us-east-1", "us-east-2"]
 
+IDENTITY_CACHE_FILE = os.path.expanduser("~/.aws/sentinel-diag-identity.json")
+IDENTITY_CACHE_TTL = 600  # seconds
+
+_session = None
+_client_config = None
+_session_lock = threading.Lock()  # boto3 Sessions are not thread-safe
+
 def run(cmd, timeout=10):
     """Run a shell command with timeout."""
     try:
@@ -24,14 +39,88 @@ def run(cmd, timeout=10):
     except subprocess.TimeoutExpired:
         return "", "TIMEOUT", -1
 
+async def arun(cmd, timeout=10):
+    """Async version of run(): spawns the command without a shell."""
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *shlex.split(cmd),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except OSError as e:
+        return "", str(e), 127
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return "", "TIMEOUT", -1
+    return stdout.decode().strip(), stderr.decode().strip(), proc.returncode
+
+def _get_session():
+    """Shared boto3 Session: credentials are resolved once for every client."""
+    global _session, _client_config
+    if _session is None:
+        import boto3
+        from botocore.config import Config
+        _session = boto3.Session()
+        _client_config = Config(retries={"max_attempts": 2}, connect_timeout=5, read_timeout=10)
+    return _session
+
+@functools.lru_cache(maxsize=None)
+def _client(service, region=None):
+    """Client from the shared session, built once per (service, region)."""
+    with _session_lock:
+        return _get_session().client(service, region_name=region, config=_client_config)
+
+def _format_error(exc, timeout_msg):
+    from botocore.exceptions import ConnectTimeoutError, ReadTimeoutError
+    if isinstance(exc, (ConnectTimeoutError, ReadTimeoutError)):
+        return f"  ⏱️ {timeout_msg}"
+    return f"  ⚠️ Error: {exc}"
+
+def _identity_cache_key(creds_file):
+    """Cache key: profile + access key prefix + credentials file mtime."""
+    try:
+        creds_mtime = os.stat(creds_file).st_mtime
+    except OSError:
+        creds_mtime = 0
+    profile = os.environ.get("AWS_PROFILE", "default")
+    key_prefix = os.environ.get("AWS_ACCESS_KEY_ID", "")[:8]
+    return f"{profile}:{key_prefix}:{creds_mtime}"
+
+def _load_cached_identity(cache_key):
+    """Return the cached STS identity if it is fresh and matches cache_key."""
+    try:
+        if time.time() - os.stat(IDENTITY_CACHE_FILE).st_mtime > IDENTITY_CACHE_TTL:
+            return None
+        with open(IDENTITY_CACHE_FILE, "r") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("key") != cache_key:
+        return None
+    return cached.get("identity")
+
+def _save_cached_identity(cache_key, identity):
+    """Write the STS identity atomically (tmp file + os.replace)."""
+    tmp_path = IDENTITY_CACHE_FILE + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(IDENTITY_CACHE_FILE), exist_ok=True)
+        with open(tmp_path, "w") as f:
+            json.dump({"key": cache_key, "identity": identity}, f)
+        os.replace(tmp_path, IDENTITY_CACHE_FILE)
+    except OSError:
+        pass  # The cache is best-effort
+
 def section(title):
     print(f"\n{DIVIDER}")
     print(f"  {title}")
     print(DIVIDER)
 
-def check_aws_cli():
+def check_aws_cli(result=None):
     section("1. AWS CLI Installation")
-    stdout, stderr, code = run("aws --version")
+    stdout, stderr, code = result if result is not None else run("aws --version")
     if code == 0:
         print(f"  ✅ AWS CLI installed: {stdout}")
         return True
@@ -41,7 +130,23 @@ def check_aws_cli():
         print("              unzip awscliv2.zip && sudo ./aws/install")
         return False
 
-def check_credentials():
+def _fetch_identity(refresh=False):
+    """Resolve the STS caller identity, disk cache first. Returns (identity, cached, error)."""
+    creds_file = os.path.join(os.path.expanduser("~/.aws"), "credentials")
+    cache_key = _identity_cache_key(creds_file)
+    identity = None if refresh else _load_cached_identity(cache_key)
+    if identity is not None:
+        return identity, True, None
+
+    try:
+        response = _client("sts").get_caller_identity()
+    except Exception as e:
+        return None, False, e
+    identity = {k: response.get(k) for k in ("Account", "Arn", "UserId")}
+    _save_cached_identity(cache_key, identity)
+    return identity, False, None
+
+def check_credentials(refresh=False, prefetched=None):
     section("2. AWS Credentials")
     
     # Check config files
@@ -69,20 +174,22 @@ def check_credentials():
         else:
             print(f"  ⚠️  {var} not set in environment")
     
-    # Try sts get-caller-identity
-    stdout, stderr, code = run("aws sts get-caller-identity --output json", timeout=10)
-    if code == 0:
-        identity = json.loads(stdout)
-        print(f"\n  ✅ Authenticated as:")
-        print(f"     Account:  {identity.get('Account', 'N/A')}")
-        print(f"     ARN:      {identity.get('Arn', 'N/A')}")
-        print(f"     UserId:   {identity.get('UserId', 'N/A')}")
-        return True
-    else:
-        print(f"\n  ❌ Cannot authenticate: {stderr}")
+    # Try sts get-caller-identity (cached on disk for IDENTITY_CACHE_TTL seconds)
+    identity, cached, error = prefetched if prefetched is not None else _fetch_identity(refresh)
+    if isinstance(error, ImportError):
+        print("\n  ❌ Cannot authenticate: boto3 NOT installed")
+        return False
+    if error is not None:
+        print(f"\n  ❌ Cannot authenticate: {error}")
         print("\n  💡 Fix: Run 'aws configure' and enter your Access Key, Secret Key, and region (us-east-1)")
         return False
 
+    print(f"\n  ✅ Authenticated as{' (cached)' if cached else ''}:")
+    print(f"     Account:  {identity.get('Account', 'N/A')}")
+    print(f"     ARN:      {identity.get('Arn', 'N/A')}")
+    print(f"     UserId:   {identity.get('UserId', 'N/A')}")
+    return True
+
 def check_boto3():
     section("3. Python boto3 SDK")
     try:
@@ -94,65 +201,79 @@ def check_boto3():
         print("  💡 Install: pip3 install boto3")
         return False
 
-def audit_ec2(region):
+def audit_ec2(region, out=None):
     """Check for running/stopped EC2 instances."""
-    print(f"\n  --- EC2 Instances ({region}) ---")
-    stdout, stderr, code = run(
-        f"aws ec2 describe-instances --region {region} "
-        f"--filters 'Name=instance-state-name,Values=running,stopped' "
-        f"--query 'Reservations[].Instances[].{{ID:InstanceId,State:State.Name,Type:InstanceType,IP:PublicIpAddress,Name:Tags[?Key==`Name`].Value|[0]}}' "
-        f"--output json",
-        timeout=15
-    )
-    if code == 0 and stdout:
-        instances = json.loads(stdout)
-        if instances:
-            for inst in instances:
-                status_icon = "🟢" if inst.get("State") == "running" else "🟡"
-                print(f"  {status_icon} {inst.get('ID', 'N/A')} | {inst.get('State', 'N/A')} | "
-                      f"{inst.get('Type', 'N/A')} | IP: {inst.get('IP', 'N/A')} | "
-                      f"Name: {inst.get('Name', 'N/A')}")
-        else:
-            print("  (no instances found)")
-    elif stderr == "TIMEOUT":
-        print("  ⏱️ Timeout querying EC2")
+    print(f"\n  --- EC2 Instances ({region}) ---", file=out)
+    try:
+        paginator = _client("ec2", region).get_paginator("describe_instances")
+        instances = [
+            inst
+            for page in paginator.paginate(
+                Filters=[{"Name": "instance-state-name", "Values": ["running", "stopped"]}]
+            )
+            for reservation in page["Reservations"]
+            for inst in reservation["Instances"]
+        ]
+    except Exception as e:
+        print(_format_error(e, "Timeout querying EC2"), file=out)
+        return
+
+    if instances:
+        for inst in instances:
+            state = inst.get("State", {}).get("Name", "N/A")
+            name = next(
+                (t["Value"] for t in inst.get("Tags", []) if t["Key"] == "Name"), "N/A"
+            )
+            status_icon = "🟢" if state == "running" else "🟡"
+            print(f"  {status_icon} {inst.get('InstanceId', 'N/A')} | {state} | "
+                  f"{inst.get('InstanceType', 'N/A')} | IP: {inst.get('PublicIpAddress', 'N/A')} | "
+                  f"Name: {name}", file=out)
     else:
-        print(f"  ⚠️ Error: {stderr}")
+        print("  (no instances found)", file=out)
 
-def audit_s3():
+def audit_s3(out=None):
     """Check S3 buckets."""
-    print(f"\n  --- S3 Buckets ---")
-    stdout, stderr, code = run("aws s3 ls --output text", timeout=15)
-    if code == 0:
-        if stdout:
-            for line in stdout.split("\n"):
-                if "sentinel" in line.lower():
-                    print(f"  🪣 {line}  ← SENTINEL bucket")
-                else:
-                    print(f"  🪣 {line}")
-        else:
-            print("  (no buckets found)")
-    elif stderr == "TIMEOUT":
-        print("  ⏱️ Timeout listing S3")
-    else:
-        print(f"  ⚠️ Error: {stderr}")
+    print(f"\n  --- S3 Buckets ---", file=out)
+    try:
+        buckets = _client("s3").list_buckets()["Buckets"]
+    except Exception as e:
+        print(_format_error(e, "Timeout listing S3"), file=out)
+        return
 
-def audit_iam():
+    if not buckets:
+        print("  (no buckets found)", file=out)
+        return
+
+    sentinel_names = {b["Name"] for b in buckets if "sentinel" in b["Name"].lower()}
+    lines = []
+    for bucket in buckets:
+        name = bucket["Name"]
+        line = f"  🪣 {bucket['CreationDate']:%Y-%m-%d %H:%M:%S} {name}"
+        if name in sentinel_names:
+            line += "  ← SENTINEL bucket"
+        lines.append(line)
+    print("\n".join(lines), file=out)
+
+def audit_iam(out=None):
     """Check IAM roles related to sentinel."""
-    print(f"\n  --- IAM Roles (sentinel-related) ---")
-    stdout, stderr, code = run(
-        "aws iam list-roles --query 'Roles[?contains(RoleName, `sentinel`)].{Name:RoleName,Created:CreateDate}' --output json",
-        timeout=15
-    )
-    if code == 0 and stdout:
-        roles = json.loads(stdout)
-        if roles:
-            for role in roles:
-                print(f"  👤 {role.get('Name', 'N/A')} | Created: {role.get('Created', 'N/A')}")
-        else:
-            print("  (no sentinel-related roles found)")
-    elif stderr == "TIMEOUT":
-        print("  ⏱️ Timeout querying IAM")
+    print(f"\n  --- IAM Roles (sentinel-related) ---", file=out)
+    try:
+        paginator = _client("iam").get_paginator("list_roles")
+        roles = [
+            role
+            for page in paginator.paginate()
+            for role in page["Roles"]
+            if "sentinel" in role["RoleName"]
+        ]
+    except Exception as e:
+        print(_format_error(e, "Timeout querying IAM"), file=out)
+        return
+
+    if roles:
+        for role in roles:
+            print(f"  👤 {role.get('RoleName', 'N/A')} | Created: {role.get('CreateDate', 'N/A')}", file=out)
+    else:
+        print("  (no sentinel-related roles found)", file=out)
 
 def audit_resources(authenticated):
     section("4. AWS Resources Audit")
@@ -160,10 +281,21 @@ def audit_resources(authenticated):
         print("  ⚠️ Skipping audit — not authenticated")
         return
     
-    for region in REGIONS_TO_CHECK:
-        audit_ec2(region)
-    audit_s3()
-    audit_iam()
+    # Run audits concurrently; each one writes to its own buffer so output stays ordered
+    tasks = [(audit_ec2, (region,)) for region in REGIONS_TO_CHECK]
+    tasks += [(audit_s3, ()), (audit_iam, ())]
+    buffers = [io.StringIO() for _ in tasks]
+
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        futures = [
+            executor.submit(fn, *args, out=buf)
+            for (fn, args), buf in zip(tasks, buffers)
+        ]
+        for future in futures:
+            future.result()
+
+    for buf in buffers:
+        print(buf.getvalue(), end="")
 
 def check_local_files():
     section("5. Local Project Files")
@@ -172,8 +304,13 @@ def check_local_files():
     key_file = os.path.join(script_dir, "sentinel-hft-key.pem")
     env_file = os.path.join(script_dir, ".env")
     
-    if os.path.exists(key_file):
-        perms = oct(os.stat(key_file).st_mode)[-3:]
+    try:
+        key_stat = os.stat(key_file)
+    except FileNotFoundError:
+        key_stat = None
+
+    if key_stat is not None:
+        perms = oct(key_stat.st_mode)[-3:]
         print(f"  ✅ Key file exists: sentinel-hft-key.pem (permissions: {perms})")
         if perms != "400":
             print(f"     ⚠️ Permissions should be 400, run: chmod 400 {key_file}")
@@ -182,8 +319,10 @@ def check_local_files():
     
     if os.path.exists(env_file):
         print(f"  ✅ .env file exists")
-        from dotenv import load_dotenv
-        load_dotenv(env_file)
+        if not os.environ.get("_SENTINEL_DOTENV_LOADED"):
+            from dotenv import load_dotenv
+            load_dotenv(env_file)
+            os.environ["_SENTINEL_DOTENV_LOADED"] = "1"
         keys = ["BINANCE_API_KEY", "BINANCE_SECRET_KEY", "HF_TOKEN", "KAGGLE_USERNAME", "KAGGLE_KEY"]
         for key in keys:
             val = os.getenv(key)
@@ -204,11 +343,13 @@ def check_local_files():
     print()
     for rel_path, desc in data_dirs:
         full_path = os.path.join(script_dir, rel_path)
-        if os.path.exists(full_path):
-            count = len(os.listdir(full_path))
-            print(f"  ✅ {rel_path}/ ({count} items) — {desc}")
-        else:
+        try:
+            with os.scandir(full_path) as entries:
+                count = sum(1 for _ in entries)
+        except (FileNotFoundError, NotADirectoryError):
             print(f"  ❌ {rel_path}/ MISSING — {desc}")
+            continue
+        print(f"  ✅ {rel_path}/ ({count} items) — {desc}")
 
 def print_summary(cli_ok, creds_ok, boto3_ok):
     section("📋 SUMMARY & NEXT STEPS")
@@ -233,17 +374,30 @@ def print_summary(cli_ok, creds_ok, boto3_ok):
             print("  3. Install boto3:")
             print("     pip3 install boto3")
 
-def main():
+async def main_async(args):
     print("\n🛡️  SENTINEL AWS Diagnostics Tool")
     print(f"    Date: {__import__('datetime').datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
-    cli_ok = check_aws_cli()
-    creds_ok = check_credentials() if cli_ok else False
+
+    # `aws --version` and the STS call overlap; results are printed in order below
+    cli_result, identity = await asyncio.gather(
+        arun("aws --version"),
+        asyncio.to_thread(_fetch_identity, args.refresh),
+    )
+
+    cli_ok = check_aws_cli(cli_result)
+    creds_ok = check_credentials(prefetched=identity)
     boto3_ok = check_boto3()
     check_local_files()
     audit_resources(creds_ok)
     print_summary(cli_ok, creds_ok, boto3_ok)
     print()
 
+def main():
+    parser = argparse.ArgumentParser(description="SENTINEL AWS Diagnostics")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Ignore the cached STS identity and query AWS again")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,32 @@
+"""
+SENTINEL Cortex — Build de kernels AOT
+═══════════════════════════════════════
+Compila los kernels Numba a una extensión nativa (cortex/_fastkernels.*.so)
+para que los workers de ProcessPoolExecutor los importen sin pagar el JIT.
+
+Uso (una vez, al instalar):
+    python3 -m cortex._fastkernels_build
+
+Si la extensión no existe, cortex.gym.fast_env vuelve a @njit(cache=True).
+"""
+
+import os
+
+from numba.pycc import CC
+
+from cortex.gym.fast_env import (
+    REPLAY_GRID_SIGNATURE,
+    RUN_EPISODE_SIGNATURE,
+    _replay_grid,
+    _run_episode,
+)
+
+cc = CC("_fastkernels")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+cc.export("replay_grid", REPLAY_GRID_SIGNATURE)(_replay_grid)
+cc.export("run_episode", RUN_EPISODE_SIGNATURE)(_run_episode)
+
+
+if __name__ == "__main__":
+    cc.compile()
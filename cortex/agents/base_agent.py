@@ -7,6 +7,8 @@ Interfaz abstracta para todos los agentes de trading.
 from abc import ABC, abstractmethod
 from typing import Optional
 
+from cortex.gym.environment import Observation
+
 
 class BaseAgent(ABC):
     """Clase base para todos los agentes de trading."""
@@ -16,7 +18,7 @@ class BaseAgent(ABC):
         self._step_count = 0
 
     @abstractmethod
-    def decide(self, observation: dict) -> int:
+    def decide(self, observation: Observation) -> int:
         """
         Decide la acción a tomar basándose en la observación.
 
@@ -28,6 +30,17 @@ class BaseAgent(ABC):
         """
         pass
 
+    async def decide_async(self, observation: Observation) -> int:
+        """
+        Versión async de decide() para evaluar varios agentes con asyncio.gather.
+
+        Por defecto delega en decide(); los agentes con I/O (LLM) la sobreescriben.
+        """
+        return self.decide(observation)
+
+    async def aclose(self):
+        """Libera los recursos async del agente (clientes de red); por defecto nada."""
+
     def reset(self):
         """Reinicia el estado interno del agente."""
         self._step_count = 0
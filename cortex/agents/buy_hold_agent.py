@@ -5,11 +5,17 @@ Agente baseline: compra en el primer paso y mantiene hasta el final.
 """
 
 from cortex.agents.base_agent import BaseAgent
+from cortex.gym.environment import Observation
 
 HOLD = 0
 BUY = 1
 SELL = 2
 
+_REASONING = {
+    BUY: "Primer paso: comprar y mantener",
+    HOLD: "Mantener posición",
+}
+
 
 class BuyHoldAgent(BaseAgent):
     """
@@ -22,22 +28,23 @@ class BuyHoldAgent(BaseAgent):
     def __init__(self):
         super().__init__(name="BuyHold")
         self._has_bought = False
+        self._last_action = None  # El texto de reasoning se arma bajo demanda
 
-    def decide(self, observation: dict) -> int:
+    def decide(self, observation: Observation) -> int:
         self._step_count += 1
 
         if not self._has_bought:
             self._has_bought = True
-            self._reasoning = "Primer paso: comprar y mantener"
+            self._last_action = BUY
             return BUY
 
-        self._reasoning = "Mantener posición"
+        self._last_action = HOLD
         return HOLD
 
     def reset(self):
         super().reset()
         self._has_bought = False
-        self._reasoning = ""
+        self._last_action = None
 
     def get_reasoning(self) -> str:
-        return self._reasoning
+        return _REASONING.get(self._last_action, "")
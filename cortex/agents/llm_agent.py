@@ -7,22 +7,65 @@ y toma de decisiones de trading.
 Funciona como el "Slow Brain" del sistema dual.
 """
 
-import json
 import os
+import re
+import asyncio
+import functools
+import time
 import sqlite3
-from datetime import datetime
+import numpy as np
+from collections import OrderedDict
+from contextlib import AsyncExitStack
 from typing import Optional
 from dotenv import load_dotenv
 from cortex.agents.base_agent import BaseAgent
+from cortex.gym.environment import Observation
 
-# Load .env from project root
-_sentinel_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-load_dotenv(os.path.join(_sentinel_root, ".env"))
+try:
+    import orjson as _json  # Parse/serialize más rápido (opcional)
+except ImportError:
+    import json as _json
+
+# Load .env from project root (once per process tree; children inherit os.environ)
+if not os.environ.get("_SENTINEL_DOTENV_LOADED"):
+    _sentinel_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    load_dotenv(os.path.join(_sentinel_root, ".env"))
+    os.environ["_SENTINEL_DOTENV_LOADED"] = "1"
 
 HOLD = 0
 BUY = 1
 SELL = 2
 
+# Escrituras al cache SQLite que se agrupan en un solo commit
+CACHE_COMMIT_EVERY = 32
+
+# Entradas del LRU en memoria delante del cache SQLite
+MEM_CACHE_SIZE = 1024
+
+# Cambio mínimo de mercado para volver a consultar al LLM
+SENTIMENT_CHANGE_EPS = 0.05
+
+# Bloque JSON dentro de una respuesta con texto alrededor (del primer "{" al último "}")
+_JSON_BLOCK = re.compile(r"\{.*\}", re.S)
+
+
+@functools.lru_cache(maxsize=4)
+def _shared_bedrock_client(region: str):
+    """
+    Cliente bedrock-runtime compartido por todos los agentes de una región.
+
+    Un solo endpoint botocore con un pool de conexiones más grande en vez de
+    un cliente (y un pool de 10 conexiones) por instancia.
+    """
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        "bedrock-runtime",
+        region_name=region,
+        config=Config(max_pool_connections=50, retries={"max_attempts": 2}),
+    )
+
 
 class LLMAgent(BaseAgent):
     """
@@ -45,6 +88,7 @@ class LLMAgent(BaseAgent):
         llm_interval: int = 24,  # Cada cuántos pasos consultar al LLM
         cache_db: Optional[str] = None,
         offline_mode: bool = None,  # Auto-detect based on API key availability
+        change_eps: float = 5e-3,  # Variación relativa de precio que justifica re-analizar
     ):
         super().__init__(name=f"LLM({model_id.split('.')[-1][:20]})")
         self.model_id = model_id
@@ -52,9 +96,16 @@ class LLMAgent(BaseAgent):
         self.llm_interval = llm_interval
         self._bedrock_api_key = os.getenv("BEDROCK_API_KEY")
         self._reasoning = ""
+        # Valores crudos de la última decisión; el texto se arma en get_reasoning()
+        self._last_decision = None
         self._last_llm_signal = "NEUTRAL"
         self._last_llm_confidence = 0.0
 
+        # Detector de cambios: entradas de la última consulta al LLM
+        self._change_eps = change_eps
+        self._last_analyzed_price = None
+        self._last_analyzed_sentiment = None
+
         # Auto-detect offline mode: use online if API key is available
         if offline_mode is None:
             self.offline_mode = self._bedrock_api_key is None
@@ -67,99 +118,239 @@ class LLMAgent(BaseAgent):
         # Cache SQLite
         self._cache_db = cache_db
         self._cache_conn = None
+        self._cache_cursor = None
+        self._pending_writes = 0
+        self._mem_cache: "OrderedDict[str, str]" = OrderedDict()
         if cache_db:
             self._init_cache(cache_db)
 
-        # Bedrock client (lazy init)
+        # Bedrock client: None usa el cliente compartido de la región
         self._bedrock_client = None
+        # Cliente async (aioboto3): se abre una vez por event loop y se cierra con aclose()
+        self._aio_session = None
+        self._aio_client = None
+        self._aio_stack: Optional[AsyncExitStack] = None
+        self._aio_loop = None
 
 
     def _init_cache(self, db_path: str):
         """Inicializa cache SQLite para respuestas LLM."""
         self._cache_conn = sqlite3.connect(db_path)
+        # WAL + synchronous=NORMAL: los commits no hacen fsync del journal completo
+        self._cache_conn.execute("PRAGMA journal_mode=WAL")
+        self._cache_conn.execute("PRAGMA synchronous=NORMAL")
+        self._cache_conn.execute("PRAGMA temp_store=MEMORY")
+        self._cache_conn.execute("PRAGMA mmap_size=268435456")
         self._cache_conn.execute("""
             CREATE TABLE IF NOT EXISTS llm_cache (
                 cache_key TEXT PRIMARY KEY,
                 response TEXT,
-                timestamp TEXT
+                timestamp INTEGER  -- epoch seconds (DBs antiguas: TEXT ISO, SQLite lo acepta)
             )
         """)
         self._cache_conn.commit()
+        self._cache_cursor = self._cache_conn.cursor()
 
     def _get_bedrock_client(self):
-        """Lazy initialization del cliente Bedrock."""
-        if self._bedrock_client is None:
-            try:
-                import boto3
-                self._bedrock_client = boto3.client(
-                    "bedrock-runtime", region_name=self.region
-                )
-            except Exception as e:
-                print(f"  ⚠️  No se pudo conectar a Bedrock: {e}")
-                self._bedrock_client = None
-        return self._bedrock_client
+        """Cliente Bedrock: el asignado a la instancia o el compartido de la región."""
+        if self._bedrock_client is not None:
+            return self._bedrock_client
+        try:
+            return _shared_bedrock_client(self.region)
+        except Exception as e:
+            print(f"  ⚠️  No se pudo conectar a Bedrock: {e}")
+            return None
 
-    def decide(self, observation: dict) -> int:
+    def decide(self, observation: Observation) -> int:
         self._step_count += 1
 
         prices = observation.get("prices")
         if prices is None or len(prices) < 10:
+            self._last_decision = None
             self._reasoning = "Datos insuficientes"
             return HOLD
 
-        sentiment = observation.get("sentiment", 0.0)
-        current_price = observation.get("current_price", 0.0)
-        position = observation.get("position", 0.0)
-        has_position = position > 0
-
         # --- Consultar LLM cada N pasos ---
         if self._step_count % self.llm_interval == 1:
             if self.offline_mode:
                 # Usar sentimiento pre-computado como proxy del LLM
-                self._analyze_offline(sentiment, prices)
-            else:
+                self._analyze_offline(
+                    observation.get("sentiment", 0.0), prices, observation.get("ret5")
+                )
+            elif self._inputs_changed(observation):
                 self._analyze_with_llm(observation)
 
+        return self._combine_signals(observation)
+
+    async def decide_async(self, observation: Observation) -> int:
+        """
+        Igual que decide(), pero la consulta a Bedrock no bloquea el event loop.
+
+        Permite solapar las llamadas de varios agentes con asyncio.gather.
+        """
+        self._step_count += 1
+
+        prices = observation.get("prices")
+        if prices is None or len(prices) < 10:
+            self._last_decision = None
+            self._reasoning = "Datos insuficientes"
+            return HOLD
+
+        if self._step_count % self.llm_interval == 1:
+            if self.offline_mode:
+                self._analyze_offline(
+                    observation.get("sentiment", 0.0), prices, observation.get("ret5")
+                )
+            elif self._inputs_changed(observation):
+                await self._analyze_with_llm_async(observation)
+
+        return self._combine_signals(observation)
+
+    def decide_batch(self, env) -> Optional[np.ndarray]:
+        """
+        Acciones que tomaría decide() en cada paso de `env` desde reset(),
+        calculadas de una vez (solo en modo offline; online retorna None).
+
+        Parte del estado de reset() y asume que cada BUY abre posición y cada
+        SELL la cierra; quien reproduzca las acciones debe verificar que la
+        posición del entorno coincida (una compra puede fallar sin fondos).
+        No modifica el estado del agente.
+        """
+        if not self.offline_mode:
+            return None
+
+        data = env.data
+        start = env.window_size
+        n_steps = max(0, len(data) - 1 - start)
+        actions = np.zeros(n_steps, dtype=np.int8)
+        if n_steps == 0 or env.window_size < 10:
+            return actions  # "Datos insuficientes" en todos los pasos
+
+        idx = np.arange(start, start + n_steps)
+        closes = data["close"].to_numpy(dtype=float)[idx]
+        if "sentiment_score" in data.columns:
+            sentiment = data["sentiment_score"].to_numpy(dtype=float)[idx]
+        else:
+            sentiment = np.zeros(n_steps)
+        indicators = env.indicators
+        ret5 = indicators["ret5"][idx]
+        sma10 = indicators["sma10"][idx]
+
+        # Señal offline (_analyze_offline) en los pasos de consulta, arrastrada
+        # hasta la siguiente; antes de la primera, NEUTRAL con confianza 0
+        combined = sentiment * 0.6 + np.where(ret5 > 0, 1.0, -1.0) * 0.4
+        analysis = (np.arange(1, n_steps + 1) % self.llm_interval) == 1
+        last = np.maximum.accumulate(np.where(analysis, np.arange(n_steps), -1))
+        score = np.where(last >= 0, combined[np.maximum(last, 0)], 0.0)
+        buy_signal = score > 0.5            # BULLISH con confianza > 0.5
+        sell_signal = score < -0.5          # BEARISH con confianza > 0.5
+        neutral = np.abs(score) <= 0.2
+
+        # Respaldo en NEUTRAL: desvío del precio respecto a la SMA10
+        with np.errstate(divide="ignore", invalid="ignore"):
+            price_vs_sma = np.where(sma10 > 0, (closes - sma10) / sma10, 0.0)
+        neutral_sell = neutral & (price_vs_sma > 0.03)
+        neutral_buy = neutral & (price_vs_sma < -0.03)
+
+        # La posición depende de las acciones previas: recorrido escalar
+        has_position = False
+        for t, (b, s, nb, ns) in enumerate(zip(
+            buy_signal.tolist(), sell_signal.tolist(), neutral_buy.tolist(), neutral_sell.tolist()
+        )):
+            if (b or nb) and not has_position:
+                actions[t] = BUY
+                has_position = True
+            elif (s or ns) and has_position:
+                actions[t] = SELL
+                has_position = False
+
+        return actions
+
+    @staticmethod
+    def _market_inputs(observation: dict) -> tuple:
+        """(precio, sentimiento) que ve el detector de cambios."""
+        price = observation.get("current_price")
+        if price is None:
+            price = float(observation["prices"][-1, 3])
+        return price, observation.get("sentiment", 0.0)
+
+    def _inputs_changed(self, observation: dict) -> bool:
+        """
+        True si precio o sentimiento se movieron lo suficiente desde el último
+        análisis del LLM que terminó bien. Si no, se reutiliza la señal anterior.
+        """
+        price, sentiment = self._market_inputs(observation)
+        last_price = self._last_analyzed_price
+        return not (
+            last_price
+            and abs(price - last_price) / last_price <= self._change_eps
+            and abs(sentiment - self._last_analyzed_sentiment) <= SENTIMENT_CHANGE_EPS
+        )
+
+    def _mark_analyzed(self, observation: dict):
+        """Registra las entradas de un análisis exitoso (LLM o cache)."""
+        self._last_analyzed_price, self._last_analyzed_sentiment = self._market_inputs(observation)
+
+    def _combine_signals(self, observation: dict) -> int:
+        """Combina la última señal del LLM con indicadores rápidos."""
+        prices = observation["prices"]
+        sentiment = observation.get("sentiment", 0.0)
+        current_price = observation.get("current_price", 0.0)
+        position = observation.get("position", 0.0)
+        has_position = position > 0
+
         # --- Combinar señal LLM con indicadores rápidos ---
         signal = self._last_llm_signal
         confidence = self._last_llm_confidence
 
-        # Indicadores rápidos de respaldo
-        closes = prices[:, 3]
-        sma_10 = float(closes[-10:].mean()) if len(closes) >= 10 else current_price
-        price_vs_sma = (current_price - sma_10) / sma_10 if sma_10 > 0 else 0
-
-        reasons = [f"LLM={signal}(conf={confidence:.0%})", f"Sent={sentiment:.2f}"]
-
         if signal == "BULLISH" and confidence > 0.5:
             if not has_position:
-                self._reasoning = " | ".join(reasons) + " → BUY"
+                self._last_decision = (signal, confidence, sentiment, "BUY", None)
                 return BUY
         elif signal == "BEARISH" and confidence > 0.5:
             if has_position:
-                self._reasoning = " | ".join(reasons) + " → SELL"
+                self._last_decision = (signal, confidence, sentiment, "SELL", None)
                 return SELL
         elif signal == "NEUTRAL":
-            # En neutral, usar indicadores rápidos
+            # En neutral, usar indicadores rápidos de respaldo
+            sma_10 = observation.get("sma10")
+            if sma_10 is None:
+                sma_10 = float(prices[-10:, 3].mean())
+            price_vs_sma = (current_price - sma_10) / sma_10 if sma_10 > 0 else 0
             if price_vs_sma > 0.03 and has_position:
-                self._reasoning = f"Neutral + SMA desvío +{price_vs_sma:.1%} → SELL"
+                self._last_decision = (signal, confidence, sentiment, "SELL", price_vs_sma)
                 return SELL
             elif price_vs_sma < -0.03 and not has_position:
-                self._reasoning = f"Neutral + SMA desvío {price_vs_sma:.1%} → BUY"
+                self._last_decision = (signal, confidence, sentiment, "BUY", price_vs_sma)
                 return BUY
 
-        self._reasoning = " | ".join(reasons) + " → HOLD"
+        self._last_decision = (signal, confidence, sentiment, "HOLD", None)
         return HOLD
 
-    def _analyze_offline(self, sentiment: float, prices):
-        """Análisis sin LLM usando sentimiento pre-computado."""
-        closes = prices[:, 3]
-
+    @staticmethod
+    def _format_reasoning(
+        signal: str, confidence: float, sentiment: float, action_name: str,
+        price_vs_sma: Optional[float],
+    ) -> str:
+        """Construye el texto explicativo de la decisión."""
+        if price_vs_sma is not None:
+            return f"Neutral + SMA desvío {price_vs_sma:+.1%} → {action_name}"
+        return f"LLM={signal}(conf={confidence:.0%}) | Sent={sentiment:.2f} → {action_name}"
+
+    def _analyze_offline(self, sentiment: float, prices, recent_return: Optional[float] = None):
+        """
+        Análisis sin LLM usando sentimiento pre-computado.
+
+        `recent_return` es el "ret5" precomputado por el entorno; si no viene,
+        se calcula desde la ventana de precios.
+        """
         # Tendencia de precios
-        if len(closes) >= 5:
-            recent_return = (closes[-1] - closes[-5]) / closes[-5]
-        else:
-            recent_return = 0.0
+        if recent_return is None:
+            closes = prices[:, 3]
+            if len(closes) >= 5:
+                recent_return = (closes[-1] - closes[-5]) / closes[-5]
+            else:
+                recent_return = 0.0
 
         # Combinar sentimiento + tendencia
         combined_score = sentiment * 0.6 + (1.0 if recent_return > 0 else -1.0) * 0.4
@@ -181,6 +372,97 @@ class LLMAgent(BaseAgent):
             self._analyze_offline(observation.get("sentiment", 0.0), observation["prices"])
             return
 
+        request = self._prepare_llm_request(observation)
+        if request is None:
+            self._mark_analyzed(observation)
+            return  # Resuelto desde cache
+        cache_key, body = request
+
+        try:
+            # Llamar a Bedrock
+            response = client.invoke_model(
+                body=body,
+                modelId=self.model_id,
+                accept="application/json",
+                contentType="application/json",
+            )
+            raw_body = response["body"].read()
+            self._handle_llm_response(cache_key, raw_body)
+            self._mark_analyzed(observation)
+
+        except Exception as e:
+            print(f"  ⚠️  Error llamando LLM: {e}")
+            self._analyze_offline(observation.get("sentiment", 0.0), observation["prices"])
+
+    async def _analyze_with_llm_async(self, observation: dict):
+        """Versión async de _analyze_with_llm (aioboto3); usa la síncrona si no está instalado."""
+        try:
+            import aioboto3
+        except ImportError:
+            self._analyze_with_llm(observation)
+            return
+
+        request = self._prepare_llm_request(observation)
+        if request is None:
+            self._mark_analyzed(observation)
+            return  # Resuelto desde cache
+        cache_key, body = request
+
+        try:
+            client = await self._get_aio_client(aioboto3)
+            response = await client.invoke_model(
+                body=body,
+                modelId=self.model_id,
+                accept="application/json",
+                contentType="application/json",
+            )
+            raw_body = await response["body"].read()
+            self._handle_llm_response(cache_key, raw_body)
+            self._mark_analyzed(observation)
+
+        except Exception as e:
+            print(f"  ⚠️  Error llamando LLM: {e}")
+            self._analyze_offline(observation.get("sentiment", 0.0), observation["prices"])
+
+    async def _get_aio_client(self, aioboto3):
+        """
+        Cliente bedrock-runtime async del agente, abierto una vez por event loop.
+
+        Los clientes aiobotocore quedan ligados al loop donde se abrieron: si
+        cambia (otro asyncio.run), se descarta el anterior y se abre uno nuevo.
+        """
+        loop = asyncio.get_running_loop()
+        if self._aio_client is not None and self._aio_loop is not loop:
+            try:
+                await self.aclose()
+            except Exception:
+                pass  # El loop anterior ya no existe; sus conexiones no se pueden cerrar
+        if self._aio_client is None:
+            if self._aio_session is None:
+                self._aio_session = aioboto3.Session()
+            stack = AsyncExitStack()
+            self._aio_client = await stack.enter_async_context(
+                self._aio_session.client("bedrock-runtime", region_name=self.region)
+            )
+            self._aio_stack = stack
+            self._aio_loop = loop
+        return self._aio_client
+
+    async def aclose(self):
+        """Cierra el cliente async de Bedrock (antes de terminar su event loop)."""
+        stack = self._aio_stack
+        self._aio_client = None
+        self._aio_stack = None
+        self._aio_loop = None
+        if stack is not None:
+            await stack.aclose()
+
+    def _prepare_llm_request(self, observation: dict) -> Optional[tuple]:
+        """
+        Construye (cache_key, body) para invoke_model.
+
+        Retorna None si la respuesta ya estaba en cache (y la aplica).
+        """
         prices = observation["prices"]
         closes = prices[:, 3]
         current_price = observation.get("current_price", closes[-1])
@@ -193,36 +475,26 @@ class LLMAgent(BaseAgent):
         cached = self._check_cache(cache_key)
         if cached:
             self._parse_llm_response(cached)
-            return
-
-        try:
-            # Llamar a Bedrock
-            body = json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 200,
-                "messages": [{"role": "user", "content": prompt}],
-                "temperature": 0.1,
-            })
-
-            response = client.invoke_model(
-                body=body,
-                modelId=self.model_id,
-                accept="application/json",
-                contentType="application/json",
-            )
+            return None
 
-            response_body = json.loads(response["body"].read())
-            result_text = response_body["content"][0]["text"]
+        body = _json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 200,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.1,
+        })
+        return cache_key, body
 
-            # Cache result
-            self._save_cache(cache_key, result_text)
+    def _handle_llm_response(self, cache_key: str, raw_body: bytes):
+        """Extrae el texto de la respuesta de Bedrock, lo cachea y lo parsea."""
+        response_body = _json.loads(raw_body)
+        result_text = response_body["content"][0]["text"]
 
-            # Parse
-            self._parse_llm_response(result_text)
+        # Cache result
+        self._save_cache(cache_key, result_text)
 
-        except Exception as e:
-            print(f"  ⚠️  Error llamando LLM: {e}")
-            self._analyze_offline(observation.get("sentiment", 0.0), prices)
+        # Parse
+        self._parse_llm_response(result_text)
 
     def _build_prompt(self, closes, current_price: float, sentiment: float) -> str:
         """Construye el prompt para el LLM."""
@@ -244,49 +516,87 @@ Respond ONLY with a JSON object:
     def _parse_llm_response(self, response_text: str):
         """Parsea la respuesta del LLM."""
         try:
-            # Intentar extraer JSON
-            start = response_text.find("{")
-            end = response_text.rfind("}") + 1
-            if start >= 0 and end > start:
-                data = json.loads(response_text[start:end])
+            # Caso común: la respuesta es solo el objeto JSON
+            try:
+                data = _json.loads(response_text)
+            except ValueError:
+                data = None
+
+            # Si hay texto alrededor, extraer el bloque JSON
+            if not isinstance(data, dict):
+                match = _JSON_BLOCK.search(response_text)
+                data = _json.loads(match.group()) if match else None
+
+            if isinstance(data, dict):
                 self._last_llm_signal = data.get("signal", "NEUTRAL").upper()
                 self._last_llm_confidence = float(data.get("confidence", 0.5))
             else:
                 self._last_llm_signal = "NEUTRAL"
                 self._last_llm_confidence = 0.3
-        except (json.JSONDecodeError, ValueError):
+        except ValueError:  # Incluye JSONDecodeError de json y orjson
             self._last_llm_signal = "NEUTRAL"
             self._last_llm_confidence = 0.3
 
     def _check_cache(self, key: str) -> Optional[str]:
-        """Busca en cache."""
+        """Busca en cache (primero el LRU en memoria, luego SQLite)."""
         if self._cache_conn is None:
             return None
-        cursor = self._cache_conn.execute(
+
+        cached = self._mem_cache.get(key)
+        if cached is not None:
+            self._mem_cache.move_to_end(key)
+            return cached
+
+        row = self._cache_cursor.execute(
             "SELECT response FROM llm_cache WHERE cache_key = ?", (key,)
-        )
-        row = cursor.fetchone()
-        return row[0] if row else None
+        ).fetchone()
+        if row is None:
+            return None
+        self._remember(key, row[0])
+        return row[0]
+
+    def _remember(self, key: str, response: str):
+        """Inserta en el LRU en memoria, descartando la entrada más antigua."""
+        self._mem_cache[key] = response
+        self._mem_cache.move_to_end(key)
+        if len(self._mem_cache) > MEM_CACHE_SIZE:
+            self._mem_cache.popitem(last=False)
 
     def _save_cache(self, key: str, response: str):
-        """Guarda en cache."""
+        """Guarda en cache (el commit se agrupa cada CACHE_COMMIT_EVERY escrituras)."""
         if self._cache_conn is None:
             return
-        self._cache_conn.execute(
+        self._cache_cursor.execute(
             "INSERT OR REPLACE INTO llm_cache (cache_key, response, timestamp) VALUES (?, ?, ?)",
-            (key, response, datetime.now().isoformat()),
+            (key, response, int(time.time())),
         )
-        self._cache_conn.commit()
+        self._remember(key, response)
+        self._pending_writes += 1
+        if self._pending_writes >= CACHE_COMMIT_EVERY:
+            self._flush_cache()
+
+    def _flush_cache(self):
+        """Confirma las escrituras pendientes del cache."""
+        if self._cache_conn is not None and self._pending_writes:
+            self._cache_conn.commit()
+            self._pending_writes = 0
 
     def reset(self):
         super().reset()
+        self._flush_cache()
         self._last_llm_signal = "NEUTRAL"
         self._last_llm_confidence = 0.0
+        self._last_analyzed_price = None
+        self._last_analyzed_sentiment = None
+        self._last_decision = None
         self._reasoning = ""
 
     def get_reasoning(self) -> str:
-        return self._reasoning
+        if self._last_decision is None:
+            return self._reasoning
+        return self._format_reasoning(*self._last_decision)
 
     def __del__(self):
         if self._cache_conn:
+            self._flush_cache()
             self._cache_conn.close()
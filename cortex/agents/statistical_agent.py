@@ -7,12 +7,72 @@ No requiere LLM — funciona como el "Fast Brain" del sistema dual.
 
 import numpy as np
 from cortex.agents.base_agent import BaseAgent
+from cortex.gym.environment import Observation
+from cortex.strategies._kernels import rolling_mean, window_mean
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
 
 HOLD = 0
 BUY = 1
 SELL = 2
 
 
+def _stat_kernel(closes, sma_fast_n, sma_slow_n, rsi_period,
+                 rsi_lo, rsi_hi, sentiment, sentiment_w):
+    """
+    Calcula (sma_fast, sma_slow, rsi, signal_score) en una sola pasada.
+
+    Misma lógica que el camino NumPy de StatisticalAgent, escrita con bucles
+    explícitos para compilarse con Numba. Las medias usan window_mean (suma
+    por pares como np.mean): con precios planos las SMA empatan exactamente
+    igual que en NumPy y el cruce no cambia de signo.
+    """
+    n = closes.shape[0]
+
+    sma_fast = window_mean(closes, max(0, n - sma_fast_n), n)
+    sma_slow = window_mean(closes, max(0, n - sma_slow_n), n)
+
+    if n < rsi_period + 1:
+        rsi = 50.0
+    else:
+        gains = np.zeros(rsi_period)
+        losses = np.zeros(rsi_period)
+        for k in range(rsi_period):
+            delta = closes[n - rsi_period + k] - closes[n - rsi_period + k - 1]
+            if delta > 0:
+                gains[k] = delta
+            elif delta < 0:
+                losses[k] = -delta
+        avg_gain = window_mean(gains, 0, rsi_period)
+        avg_loss = window_mean(losses, 0, rsi_period)
+        if avg_loss == 0.0:
+            rsi = 100.0
+        else:
+            rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+    score = 0.0
+    if sma_fast > sma_slow:
+        score += 0.4
+    elif sma_fast < sma_slow:
+        score -= 0.4
+    if rsi < rsi_lo:
+        score += 0.3
+    elif rsi > rsi_hi:
+        score -= 0.3
+    if sentiment != 0.0:
+        score += sentiment * sentiment_w
+
+    return sma_fast, sma_slow, rsi, score
+
+
+if HAS_NUMBA:
+    _stat_kernel = njit(cache=True)(_stat_kernel)
+
+
 class StatisticalAgent(BaseAgent):
     """
     Agente estadístico basado en indicadores técnicos.
@@ -41,76 +101,200 @@ class StatisticalAgent(BaseAgent):
         self.sentiment_weight = sentiment_weight
         self._reasoning = ""
 
-    def decide(self, observation: dict) -> int:
+        # Claves de indicadores precomputados por el entorno (si están presentes)
+        self._sma_fast_key = f"sma{sma_fast}"
+        self._sma_slow_key = f"sma{sma_slow}"
+        self._rsi_key = f"rsi{rsi_period}"
+        # Valores crudos de la última decisión; el texto se arma en get_reasoning()
+        self._last_decision = None
+
+        # Vista de cierres cacheada para el último array de precios recibido
+        self._last_prices = None
+        self._closes = None
+
+    def decide(self, observation: Observation) -> int:
         self._step_count += 1
 
         prices = observation.get("prices")
         if prices is None or len(prices) < self.sma_slow:
+            self._last_decision = None
             self._reasoning = "Datos insuficientes para calcular indicadores"
             return HOLD
 
-        # Extraer precios de cierre (columna index 3 = close)
-        closes = prices[:, 3]
+        # --- Obtener sentimiento ---
+        sentiment = observation.get("sentiment", 0.0)
 
-        # --- Calcular SMA ---
-        sma_fast = np.mean(closes[-self.sma_fast:])
-        sma_slow_val = np.mean(closes[-self.sma_slow:])
+        # --- Indicadores + score ---
+        sma_fast = observation.get(self._sma_fast_key)
+        sma_slow_val = observation.get(self._sma_slow_key)
+        rsi = observation.get(self._rsi_key)
+        if sma_fast is not None and sma_slow_val is not None and rsi is not None:
+            # Ya calculados por el entorno: solo falta el score
+            signal_score = self._signal_score(sma_fast, sma_slow_val, rsi, sentiment)
+        else:
+            # Extraer precios de cierre (columna index 3 = close)
+            if prices is not self._last_prices:
+                self._last_prices = prices
+                self._closes = prices[:, 3]
+            sma_fast, sma_slow_val, rsi, signal_score = self._compute_indicators(
+                self._closes, sentiment
+            )
 
-        # --- Calcular RSI ---
-        rsi = self._calculate_rsi(closes, self.rsi_period)
+        # Posición actual
+        has_position = observation.get("position", 0.0) > 0
 
-        # --- Obtener sentimiento ---
-        sentiment = observation.get("sentiment", 0.0)
+        # Decisión final
+        if signal_score > 0.3 and not has_position:
+            action = BUY
+        elif signal_score < -0.3 and has_position:
+            action = SELL
+        else:
+            action = HOLD
+
+        self._last_decision = (sma_fast, sma_slow_val, rsi, sentiment, signal_score, action)
+        return action
+
+    def decide_series(self, prices: np.ndarray, sentiment=0.0) -> np.ndarray:
+        """
+        Calcula las acciones para una serie completa de una vez (backtests en bloque).
+
+        La acción i es la de decide() con la ventana prices[:i + 1], asumiendo
+        que cada BUY abre posición y cada SELL la cierra. Cada media de SMA y
+        RSI se calcula por ventana con la suma por pares de np.mean
+        (rolling_mean), así que los valores son idénticos a los de decide() y
+        los empates exactos entre SMAs se conservan. `sentiment` puede ser un
+        escalar o un array alineado con `prices`.
+        """
+        closes = np.ascontiguousarray(np.asarray(prices, dtype=float)[:, 3])
+        n = len(closes)
+        actions = np.zeros(n, dtype=np.int8)
+        if n < self.sma_slow:
+            return actions
+
+        # Índices con datos suficientes (ventana de al menos sma_slow cierres)
+        idx = np.arange(self.sma_slow - 1, n)
 
-        # --- Lógica de decisión ---
+        # rolling_mean(a, k)[j] = media de a[j:j + k]: la ventana que termina en idx
+        sma_fast = rolling_mean(closes, self.sma_fast)[idx + 1 - self.sma_fast]
+        sma_slow = rolling_mean(closes, self.sma_slow)[idx + 1 - self.sma_slow]
+
+        # RSI: medias de ganancias/pérdidas de los últimos `rsi_period` deltas
+        period = self.rsi_period
+        rsi = np.full(len(idx), 50.0)
+        ready = idx >= period
+        if ready.any():
+            deltas = np.diff(closes)
+            avg_gain = rolling_mean(np.where(deltas > 0, deltas, 0.0), period)
+            avg_loss = rolling_mean(np.where(deltas < 0, -deltas, 0.0), period)
+            start = idx[ready] - period
+            gain, loss = avg_gain[start], avg_loss[start]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rsi[ready] = np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+
+        score = np.sign(sma_fast - sma_slow) * 0.4
+        score += np.where(rsi < self.rsi_oversold, 0.3, 0.0)
+        score -= np.where(rsi > self.rsi_overbought, 0.3, 0.0)
+        sentiment = np.broadcast_to(np.asarray(sentiment, dtype=float), closes.shape)
+        score += sentiment[idx] * self.sentiment_weight
+
+        # La posición depende de las acciones previas: recorrido escalar
+        has_position = False
+        for i, signal_score in zip(idx.tolist(), score.tolist()):
+            if signal_score > 0.3 and not has_position:
+                actions[i] = BUY
+                has_position = True
+            elif signal_score < -0.3 and has_position:
+                actions[i] = SELL
+                has_position = False
+
+        return actions
+
+    def _compute_indicators(self, closes: np.ndarray, sentiment: float) -> tuple:
+        """Calcula (sma_fast, sma_slow, rsi, signal_score) desde la ventana de cierres."""
+        if HAS_NUMBA:
+            return _stat_kernel(
+                closes, self.sma_fast, self.sma_slow, self.rsi_period,
+                self.rsi_oversold, self.rsi_overbought,
+                float(sentiment), self.sentiment_weight,
+            )
+
+        # Camino NumPy (sin Numba)
+        sma_fast, sma_slow_val = self._rolling_smas(closes)
+        rsi = self._calculate_rsi(closes, self.rsi_period)
+        signal_score = self._signal_score(sma_fast, sma_slow_val, rsi, sentiment)
+        return sma_fast, sma_slow_val, rsi, signal_score
+
+    def _signal_score(self, sma_fast: float, sma_slow: float, rsi: float, sentiment: float) -> float:
+        """Combina los indicadores en un score de señal."""
         signal_score = 0.0
-        reasons = []
 
         # SMA Crossover
-        if sma_fast > sma_slow_val:
+        if sma_fast > sma_slow:
             signal_score += 0.4
-            reasons.append(f"SMA{self.sma_fast}({sma_fast:.0f}) > SMA{self.sma_slow}({sma_slow_val:.0f})")
-        elif sma_fast < sma_slow_val:
+        elif sma_fast < sma_slow:
             signal_score -= 0.4
-            reasons.append(f"SMA{self.sma_fast}({sma_fast:.0f}) < SMA{self.sma_slow}({sma_slow_val:.0f})")
 
         # RSI
         if rsi < self.rsi_oversold:
             signal_score += 0.3
-            reasons.append(f"RSI={rsi:.0f} (sobreventa)")
         elif rsi > self.rsi_overbought:
             signal_score -= 0.3
-            reasons.append(f"RSI={rsi:.0f} (sobrecompra)")
 
         # Sentimiento
         if sentiment != 0.0:
             signal_score += sentiment * self.sentiment_weight
+
+        return signal_score
+
+    def _format_reasoning(
+        self,
+        sma_fast: float,
+        sma_slow: float,
+        rsi: float,
+        sentiment: float,
+        signal_score: float,
+        action: int,
+    ) -> str:
+        """Construye el texto explicativo de la decisión."""
+        reasons = []
+        if sma_fast > sma_slow:
+            reasons.append(f"SMA{self.sma_fast}({sma_fast:.0f}) > SMA{self.sma_slow}({sma_slow:.0f})")
+        elif sma_fast < sma_slow:
+            reasons.append(f"SMA{self.sma_fast}({sma_fast:.0f}) < SMA{self.sma_slow}({sma_slow:.0f})")
+
+        if rsi < self.rsi_oversold:
+            reasons.append(f"RSI={rsi:.0f} (sobreventa)")
+        elif rsi > self.rsi_overbought:
+            reasons.append(f"RSI={rsi:.0f} (sobrecompra)")
+
+        if sentiment != 0.0:
             reasons.append(f"Sentiment={sentiment:.2f}")
 
-        # Posición actual
-        has_position = observation.get("position", 0.0) > 0
+        action_name = {BUY: "BUY", SELL: "SELL"}.get(action, "HOLD")
+        return " | ".join(reasons) + f" → Score={signal_score:.2f} → {action_name}"
 
-        self._reasoning = " | ".join(reasons) + f" → Score={signal_score:.2f}"
+    def _rolling_smas(self, closes: np.ndarray) -> tuple:
+        """
+        Calcula SMA rápida y lenta (np.mean de cada ventana).
 
-        # Decisión final
-        if signal_score > 0.3 and not has_position:
-            self._reasoning += " → BUY"
-            return BUY
-        elif signal_score < -0.3 and has_position:
-            self._reasoning += " → SELL"
-            return SELL
-        else:
-            self._reasoning += " → HOLD"
-            return HOLD
+        Sin sumas incrementales: con precios planos las dos SMA deben empatar
+        exactamente, y una suma arrastrada rompe el empate por redondeo.
+        """
+        return np.mean(closes[-self.sma_fast:]), np.mean(closes[-self.sma_slow:])
 
     def _calculate_rsi(self, closes: np.ndarray, period: int = 14) -> float:
-        """Calcula el Relative Strength Index."""
+        """
+        Calcula el Relative Strength Index.
+
+        Se recalcula desde la ventana en cada paso: unas sumas incrementales
+        acumulan error de redondeo y el RSI puede cruzar un umbral por un ulp.
+        """
         if len(closes) < period + 1:
             return 50.0  # Neutral
 
         deltas = np.diff(closes[-(period + 1):])
-        gains = np.where(deltas > 0, deltas, 0)
-        losses = np.where(deltas < 0, -deltas, 0)
+        gains = np.where(deltas > 0, deltas, 0.0)
+        losses = np.where(deltas < 0, -deltas, 0.0)
 
         avg_gain = np.mean(gains)
         avg_loss = np.mean(losses)
@@ -125,6 +309,11 @@ class StatisticalAgent(BaseAgent):
     def reset(self):
         super().reset()
         self._reasoning = ""
+        self._last_decision = None
+        self._last_prices = None
+        self._closes = None
 
     def get_reasoning(self) -> str:
-        return self._reasoning
+        if self._last_decision is None:
+            return self._reasoning
+        return self._format_reasoning(*self._last_decision)
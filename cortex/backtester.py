@@ -11,58 +11,163 @@ Uso:
 
 import os
 import sys
+import copy
 import yaml
+import functools
+import importlib
 import argparse
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
+try:
+    from tqdm.auto import tqdm
+    HAS_TQDM = True
+except ImportError:
+    HAS_TQDM = False
+
 # Add project root to path
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from cortex.gym.data_loader import DataLoader
-from cortex.gym.environment import TradingEnvironment
+from cortex.gym.environment import TradingEnvironment, HOLD
+from cortex.gym.exchange_mock import SELL_SIDE_CODE
 from cortex.metrics import MetricsEngine, BacktestResult
 
 
-def load_config(config_path: str) -> dict:
-    """Carga configuración YAML."""
+@functools.lru_cache(maxsize=8)
+def _load_config_cached(config_path: str, mtime: float) -> dict:
     with open(config_path, "r") as f:
-        return yaml.safe_load(f)
+        return yaml.safe_load(f) or {}
 
 
-def create_agent(agent_name: str, config: dict = None):
-    """Factory para crear agentes por nombre."""
-    agent_name = agent_name.lower().replace("-", "_")
+def load_config(config_path: str) -> dict:
+    """
+    Carga configuración YAML.
 
-    if agent_name == "buy_hold":
-        from cortex.agents.buy_hold_agent import BuyHoldAgent
-        return BuyHoldAgent()
+    El parseo se cachea por (path, mtime): si el archivo cambia se vuelve a
+    leer. Se devuelve una copia para que el caller pueda modificarla.
+    """
+    config_path = os.path.abspath(config_path)
+    return copy.deepcopy(_load_config_cached(config_path, os.path.getmtime(config_path)))
 
-    elif agent_name == "statistical":
-        from cortex.agents.statistical_agent import StatisticalAgent
-        return StatisticalAgent()
 
-    elif agent_name == "llm":
-        from cortex.agents.llm_agent import LLMAgent
-        model = config.get("models", {}).get("fast_path", "claude-3-haiku") if config else "claude-3-haiku"
-        return LLMAgent(offline_mode=True)
+# Agentes disponibles: nombre → (módulo, clase, kwargs del constructor).
+# Los módulos se importan al primer uso y la clase queda cacheada por proceso.
+AGENT_REGISTRY = {
+    "buy_hold": ("cortex.agents.buy_hold_agent", "BuyHoldAgent", {}),
+    "statistical": ("cortex.agents.statistical_agent", "StatisticalAgent", {}),
+    "llm": ("cortex.agents.llm_agent", "LLMAgent", {"offline_mode": True}),
+    "swing": ("cortex.strategies.swing", "SwingStrategy", {}),
+    "contrarian": ("cortex.strategies.contrarian", "ContrarianStrategy", {}),
+}
 
-    elif agent_name == "swing":
-        from cortex.strategies.swing import SwingStrategy
-        return SwingStrategy()
 
-    elif agent_name == "contrarian":
-        from cortex.strategies.contrarian import ContrarianStrategy
-        return ContrarianStrategy()
+@functools.lru_cache(maxsize=None)
+def _agent_class(agent_name: str):
+    """Importa (una vez) la clase registrada para `agent_name`."""
+    module_name, class_name, _ = AGENT_REGISTRY[agent_name]
+    return getattr(importlib.import_module(module_name), class_name)
 
-    else:
+
+def create_agent(agent_name: str, config: dict = None):
+    """Factory para crear agentes por nombre."""
+    agent_name = agent_name.lower().replace("-", "_")
+
+    if agent_name not in AGENT_REGISTRY:
         raise ValueError(
             f"Agente desconocido: '{agent_name}'. "
-            f"Opciones: buy_hold, statistical, llm, swing, contrarian"
+            f"Opciones: {', '.join(AGENT_REGISTRY)}"
         )
 
+    kwargs = AGENT_REGISTRY[agent_name][2]
+    return _agent_class(agent_name)(**kwargs)
+
+
+def _edge_dates(timestamps: pd.Series) -> tuple:
+    """Primera y última fecha (YYYY-MM-DD) de la columna timestamp."""
+    if timestamps.dtype.kind == "M" and getattr(timestamps.dtype, "tz", None) is None:
+        values = timestamps.to_numpy()
+        return (
+            str(np.datetime_as_string(values[0], unit="D")),
+            str(np.datetime_as_string(values[-1], unit="D")),
+        )
+    # Con zona horaria (u otros tipos) la fecha local sale del valor boxeado
+    first, last = timestamps.iloc[0], timestamps.iloc[-1]
+    return tuple(str(ts.date()) if hasattr(ts, "date") else str(ts) for ts in (first, last))
+
+
+def collect_trade_pnls(exchange) -> list:
+    """
+    PnL de cada venta registrada en el exchange (neto recibido - cantidad × precio).
+
+    Usa el buffer estructurado `trade_history_array` si el exchange lo expone
+    (cálculo vectorizado); si no, recorre la lista de Fills.
+    """
+    fills = getattr(exchange, "trade_history_array", None)
+    if fills is not None:
+        sells = fills[fills["side_code"] == SELL_SIDE_CODE]
+        return (sells["total_cost"] - sells["quantity"] * sells["price"]).tolist()
+    return [
+        fill.total_cost - fill.quantity * fill.price
+        for fill in exchange.trade_history
+        if fill.side == "SELL"
+    ]
+
+
+def _play_episode(env, agent, plan, on_step, record: bool):
+    """Un episodio desde env.reset(); con `plan`, None si la posición se aparta de la prevista."""
+    actions, position_open = [], []
+    observation = env.reset()
+    done = False
+    step = 0
+    while not done:
+        is_open = observation.get("position", 0.0) > 0
+        if plan is None:
+            action = agent.decide(observation)
+        elif is_open != plan[1][step]:
+            return None
+        else:
+            action = plan[0][step]
+        if record:
+            actions.append(action)
+            position_open.append(is_open)
+        observation, reward, terminated, truncated, info = env.step(action)
+        done = terminated or truncated
+        step += 1
+        if on_step is not None:
+            on_step(step, info)
+    return actions, position_open
+
+
+def run_episode(env, agent, on_step=None, record: bool = False):
+    """
+    Corre un episodio completo de `agent` sobre `env`.
+
+    Si el agente expone decide_batch() y retorna acciones, se ejecutan sin
+    llamar a decide() en cada paso. Si la posición del entorno se aparta de
+    la que asumen esas acciones (p. ej. una compra sin fondos), el episodio
+    se repite desde cero con decide().
+
+    Args:
+        on_step: Callback on_step(step, info) tras cada paso
+        record: Guardar la acción y si había posición abierta en cada paso
+
+    Returns:
+        (actions, position_open); listas vacías si record=False
+    """
+    decide_batch = getattr(agent, "decide_batch", None)
+    planned = decide_batch(env) if decide_batch is not None else None
+    if planned is not None:
+        opened = (np.cumsum(planned != HOLD) % 2 == 1).tolist()
+        result = _play_episode(env, agent, (planned.tolist(), [False] + opened[:-1]), on_step, record)
+        if result is not None:
+            return result
+        agent.reset()
+    return _play_episode(env, agent, None, on_step, record)
+
 
 def run_backtest(
     agent_name: str,
@@ -84,7 +189,7 @@ def run_backtest(
         start_date: Fecha inicio (YYYY-MM-DD)
         end_date: Fecha fin (YYYY-MM-DD)
         config_path: Path al config.yaml
-        output_path: Path para guardar CSV de resultados
+        output_path: Path para guardar los resultados (CSV, o Parquet si termina en .parquet)
         verbose: Imprimir progreso
 
     Returns:
@@ -151,40 +256,53 @@ def run_backtest(
     if verbose:
         print(f"  🏃 Ejecutando backtest con {agent.name}...")
 
-    observation = env.reset()
-    done = False
+    # Progreso: barra tqdm (refresco cada 1%) si está instalado, si no una
+    # línea cada 10% de pasos. Sin verbose el umbral nunca se alcanza.
+    pbar = None
+    if verbose and HAS_TQDM:
+        pbar = tqdm(total=env.total_steps, desc=f"     {agent.name}", unit="step")
+        print_stride = max(1, env.total_steps // 100)
+    else:
+        print_stride = max(1, env.total_steps // 10)
+    next_print = print_stride if verbose else sys.maxsize
     step = 0
 
-    while not done:
-        action = agent.decide(observation)
-        observation, reward, terminated, truncated, info = env.step(action)
-        done = terminated or truncated
-        step += 1
-
-        # Progreso cada 10% de pasos
-        if verbose and step % max(1, env.total_steps // 10) == 0:
-            pct = step / env.total_steps * 100
+    def report_progress(current_step: int, info: dict):
+        # next_print no se reinicia si run_episode repite el episodio: el
+        # progreso mostrado nunca retrocede
+        nonlocal next_print, step
+        step = current_step
+        if step >= next_print:
+            next_print += print_stride
             pv = info.get("portfolio_value", 0)
             sc = info.get("score", 0)
-            print(f"     [{pct:5.1f}%] Step {step}/{env.total_steps} | Portfolio: ${pv:.2f} | Score: {sc:.0f}")
+            if pbar is not None:
+                pbar.set_postfix(portfolio=f"${pv:.2f}", score=f"{sc:.0f}", refresh=False)
+                pbar.update(step - pbar.n)
+            else:
+                pct = step / env.total_steps * 100
+                print(f"     [{pct:5.1f}%] Step {step}/{env.total_steps} | Portfolio: ${pv:.2f} | Score: {sc:.0f}")
+
+    run_episode(env, agent, on_step=report_progress if verbose else None)
+
+    if pbar is not None:
+        pbar.update(step - pbar.n)
+        pbar.close()
 
     # Calcular métricas
     if verbose:
         print(f"\n  📈 Calculando métricas...")
 
     # Recolectar trade PnLs del exchange
-    trade_pnls = []
-    for fill in env.exchange.trade_history:
-        if fill.side == "SELL":
-            trade_pnls.append(fill.total_cost - fill.quantity * fill.price)
+    trade_pnls = collect_trade_pnls(env.exchange)
 
     # Si no hay trades de venta, usar la equity curve para PnL
-    if not trade_pnls and env.equity_curve:
-        trade_pnls = [env.equity_curve[-1] - initial_capital]
+    if not trade_pnls and len(env.equity_curve):
+        trade_pnls = [float(env.equity_curve[-1]) - initial_capital]
 
-    actual_start = str(data["timestamp"].iloc[0].date()) if hasattr(data["timestamp"].iloc[0], "date") else str(data["timestamp"].iloc[0])
-    actual_end = str(data["timestamp"].iloc[-1].date()) if hasattr(data["timestamp"].iloc[-1], "date") else str(data["timestamp"].iloc[-1])
+    actual_start, actual_end = _edge_dates(data["timestamp"])
 
+    trade_log = env.get_step_log_df()
     result = MetricsEngine.calculate_all(
         strategy_name=agent.name,
         symbol=symbol,
@@ -193,7 +311,7 @@ def run_backtest(
         initial_capital=initial_capital,
         equity_curve=env.equity_curve,
         trade_pnls=trade_pnls,
-        trade_log=env.get_step_log_df(),
+        trade_log=trade_log,
     )
 
     # Imprimir resultados
@@ -217,14 +335,29 @@ def run_backtest(
     # Guardar resultados
     if output_path:
         os.makedirs(os.path.dirname(output_path) if os.path.dirname(output_path) else ".", exist_ok=True)
-        trade_log = env.get_step_log_df()
-        trade_log.to_csv(output_path, index=False)
+        if output_path.endswith(".parquet"):
+            trade_log.to_parquet(output_path, index=False)
+        else:
+            trade_log.to_csv(output_path, index=False)
         if verbose:
             print(f"  💾 Resultados guardados en: {output_path}")
 
     return result
 
 
+# (clave, título, ancho, formato) de cada columna de compare_agents
+COMPARISON_COLUMNS = [
+    ("strategy_name", "Estrategia", 20, "{:<20}"),
+    ("total_return_pct", "Retorno %", 10, "{:>+10.2f}"),
+    ("sharpe_ratio", "Sharpe", 8, "{:>8.4f}"),
+    ("max_drawdown_pct", "Max DD %", 9, "{:>9.2f}"),
+    ("total_trades", "Trades", 7, "{:>7d}"),
+    ("win_rate", "Win %", 7, "{:>7.2f}"),
+    ("profit_factor", "PF", 8, "{:>8.4f}"),
+    ("final_value", "Valor final", 12, "{:>12.2f}"),
+]
+
+
 def compare_agents(
     agents: list,
     symbol: str = "BTCUSDT",
@@ -261,21 +394,23 @@ def compare_agents(
         )
         results.append(result.to_dict())
 
-    # Crear tabla comparativa
-    comparison = pd.DataFrame(results)
-    columns_order = [
-        "strategy_name", "total_return_pct", "sharpe_ratio",
-        "max_drawdown_pct", "total_trades", "win_rate",
-        "profit_factor", "final_value",
+    # Tabla comparativa (formateo directo, sin pasar por DataFrame.to_string)
+    header = " ".join(f"{title:>{width}}" if i else f"{title:<{width}}"
+                      for i, (_, title, width, _) in enumerate(COMPARISON_COLUMNS))
+    rows = [
+        " ".join(fmt.format(r[key]) for key, _, _, fmt in COMPARISON_COLUMNS)
+        for r in results
     ]
-    comparison = comparison[[c for c in columns_order if c in comparison.columns]]
 
     print(f"\n\n{'═' * 80}")
     print(f"  📊 COMPARACIÓN DE ESTRATEGIAS | {symbol}")
     print(f"{'═' * 80}")
-    print(comparison.to_string(index=False))
+    print("\n".join([header, *rows]))
     print(f"{'═' * 80}\n")
 
+    comparison = pd.DataFrame.from_records(
+        results, columns=[key for key, _, _, _ in COMPARISON_COLUMNS]
+    )
     return comparison
 
 
@@ -304,7 +439,7 @@ Ejemplos:
     parser.add_argument("--config", type=str, default=None,
                         help="Path al config.yaml")
     parser.add_argument("--output", type=str, default=None,
-                        help="Path para guardar CSV")
+                        help="Path para guardar resultados (.csv o .parquet)")
     parser.add_argument("--compare", nargs="+", default=None,
                         help="Comparar múltiples agentes")
 
@@ -13,15 +13,19 @@ Uso:
 import os
 import sys
 import argparse
+import hashlib
 import itertools
 from datetime import datetime
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from multiprocessing.managers import SharedMemoryManager
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from cortex.experiments.experiment_store import (
+    AsyncExperimentStore,
     ExperimentStore,
     ExperimentResult,
     generate_experiment_id,
@@ -57,17 +61,282 @@ PRESET_GRIDS = {
 }
 
 
-def run_single_experiment(params: dict) -> dict:
+# ═══════════════════════════════════════════
+#  Datos precargados (una carga por dataset del grid)
+# ═══════════════════════════════════════════
+
+# (symbol, interval, start_date, end_date) → DataFrame, o la excepción de la carga
+_PRELOADED: dict = {}
+
+# Worker: esquema de memoria compartida por dataset, aún sin adjuntar
+_SHARED_SPECS: dict = {}
+
+# Bloques de memoria compartida adjuntados por este proceso (mantenerlos vivos)
+_SHM_BLOCKS: list = []
+
+
+def _param_hash(params: dict) -> str:
+    """Hash estable de la configuración de un experimento (sin su ID)."""
+    canonical = (
+        params["agent"],
+        params["symbol"],
+        params["interval"],
+        params.get("start_date"),
+        params.get("end_date"),
+        params.get("hold_penalty_rate", 0.05),
+        params.get("risk_per_trade_pct", 0.1),
+        params.get("initial_capital", 100.0),
+        params.get("fee_rate", 0.001),
+        params.get("slippage", 0.0005),
+    )
+    return hashlib.blake2b(repr(canonical).encode(), digest_size=16).hexdigest()
+
+
+def _data_key(params: dict) -> tuple:
+    """Clave del dataset que usa un experimento."""
+    return (params["symbol"], params["interval"], params.get("start_date"), params.get("end_date"))
+
+
+def _preload_data(keys) -> dict:
+    """Carga cada dataset una sola vez en el proceso padre."""
+    from cortex.gym.data_loader import DataLoader
+
+    loader = DataLoader()
+    frames = {}
+    for key in keys:
+        symbol, interval, start_date, end_date = key
+        try:
+            frames[key] = loader.load_merged(symbol, interval, start_date=start_date, end_date=end_date)
+        except Exception as e:
+            frames[key] = e
+    return frames
+
+
+def _share_frames(frames: dict, manager: SharedMemoryManager) -> dict:
+    """
+    Copia las columnas numéricas de cada DataFrame a memoria compartida.
+
+    Retorna el esquema que usa _attach_frame para reconstruirlos: por columna
+    (nombre, bloque, (shape, dtype)). Columnas no numéricas (object, fechas con
+    zona horaria) viajan serializadas como Series; errores y DataFrames vacíos,
+    tal cual.
+    """
+    import numpy as np
+
+    specs = {}
+    for key, frame in frames.items():
+        if isinstance(frame, Exception) or frame.empty:
+            specs[key] = frame
+            continue
+        columns = []
+        for col in frame.columns:
+            values = frame[col].to_numpy()
+            if values.dtype.kind not in "biufmM":
+                columns.append((col, None, frame[col]))
+                continue
+            shm = manager.SharedMemory(size=values.nbytes)
+            np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+            columns.append((col, shm.name, (values.shape, values.dtype.str)))
+        specs[key] = columns
+    return specs
+
+
+def _attach_shm(name: str) -> shared_memory.SharedMemory:
+    """Adjunta un bloque existente sin registrarlo en el resource tracker del worker."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        from multiprocessing import resource_tracker
+
+        # Antes de 3.13 adjuntar también registra el bloque; register + unregister
+        # borraría el registro del manager si comparten tracker (KeyError al unlink)
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _attach_frame(spec: list):
+    """DataFrame cuyas columnas numéricas son vistas de la memoria compartida (sin copia)."""
+    import numpy as np
+    import pandas as pd
+
+    columns = {}
+    for col, shm_name, payload in spec:
+        if shm_name is None:
+            columns[col] = payload
+            continue
+        shm = _attach_shm(shm_name)
+        _SHM_BLOCKS.append(shm)
+        shape, dtype = payload
+        columns[col] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    return pd.DataFrame(columns, copy=False)
+
+
+def _dataset(key: tuple):
+    """
+    Dataset precargado para `key`, o None si no hay. En un worker se adjunta
+    a la memoria compartida al primer uso: cada worker solo mapea los
+    datasets de las tareas que le tocan.
+    """
+    data = _PRELOADED.get(key)
+    if data is None and key in _SHARED_SPECS:
+        spec = _SHARED_SPECS.pop(key)
+        data = _attach_frame(spec) if isinstance(spec, list) else spec
+        _PRELOADED[key] = data
+    return data
+
+
+# Librerías numéricas con pool de threads propio (BLAS/OpenMP)
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def default_workers() -> int:
+    """CPUs disponibles para este proceso (respeta taskset/cgroups si el SO lo expone)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _limit_worker_threads():
+    """
+    Un thread de BLAS/OpenMP por worker: el paralelismo ya lo da el pool, y
+    con N workers × N threads la máquina queda sobresuscrita.
+
+    Las variables de entorno cubren las librerías que se inicializan después;
+    para las ya cargadas en el padre (numpy, heredado por fork) se usa
+    threadpoolctl si está instalado.
+    """
+    for var in _THREAD_ENV_VARS:
+        os.environ[var] = "1"
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(1)
+
+
+def _init_worker(specs: dict):
+    """
+    Initializer del pool: guarda el esquema de memoria compartida (cada
+    dataset se adjunta al primer uso, ver _dataset) y precarga los módulos de
+    simulación y las clases de agentes (una vez por worker, no por experimento).
+    """
+    _limit_worker_threads()
+
+    import cortex.gym.environment
+    import cortex.metrics
+    from cortex.backtester import AGENT_REGISTRY, _agent_class
+
+    for agent_name in AGENT_REGISTRY:
+        try:
+            _agent_class(agent_name)
+        except ImportError:
+            pass  # Se reporta al crear el agente
+
+    _SHARED_SPECS.update(specs)
+
+
+# Agentes cuyas decisiones dependen solo de precios/sentimiento y de si hay
+# posición abierta: se simulan una vez por dataset y el resto de celdas del
+# grid (hold_penalty_rate × risk_per_trade_pct) se reproduce con replay_grid.
+# "llm" entra porque create_agent lo construye con offline_mode=True (reglas
+# sobre el sentimiento precomputado, sin llamadas a Bedrock).
+DETERMINISTIC_AGENTS = {"buy_hold", "statistical", "swing", "contrarian", "llm"}
+
+
+def _group_key(params: dict) -> tuple:
+    """Celdas que comparten agente, dataset y costos (solo cambian hp/rpt)."""
+    return (
+        params["agent"],
+        _data_key(params),
+        params.get("initial_capital", 100.0),
+        params.get("fee_rate", 0.001),
+        params.get("slippage", 0.0005),
+    )
+
+
+def _experiment_result(
+    params: dict,
+    agent_name: str,
+    data,
+    equity_curve,
+    trade_pnls: list,
+    score_final: float,
+    total_hold_penalty: float,
+    trade_log=None,
+) -> ExperimentResult:
+    """
+    Calcula las métricas de una celda y arma su ExperimentResult.
+
+    equity_curve es un np.ndarray[float64] (env.equity_curve o fila de
+    replay_grid); MetricsEngine lo usa sin convertirlo.
+    """
+    from cortex.metrics import MetricsEngine
+    from cortex.backtester import _edge_dates
+
+    initial_capital = params.get("initial_capital", 100.0)
+    if not trade_pnls and len(equity_curve):
+        trade_pnls = [float(equity_curve[-1]) - initial_capital]
+
+    actual_start, actual_end = _edge_dates(data["timestamp"])
+
+    metrics = MetricsEngine.calculate_all(
+        strategy_name=agent_name,
+        symbol=params["symbol"],
+        start_date=actual_start,
+        end_date=actual_end,
+        initial_capital=initial_capital,
+        equity_curve=equity_curve,
+        trade_pnls=trade_pnls,
+        trade_log=trade_log,
+    )
+
+    return ExperimentResult(
+        experiment_id=params["experiment_id"],
+        timestamp=datetime.now().isoformat(),
+        agent_name=agent_name,
+        symbol=params["symbol"],
+        interval=params["interval"],
+        start_date=actual_start,
+        end_date=actual_end,
+        initial_capital=initial_capital,
+        fee_rate=params.get("fee_rate", 0.001),
+        slippage=params.get("slippage", 0.0005),
+        hold_penalty_rate=params.get("hold_penalty_rate", 0.05),
+        risk_per_trade_pct=params.get("risk_per_trade_pct", 0.1),
+        final_value=metrics.final_value,
+        total_pnl=metrics.total_pnl,
+        total_return_pct=metrics.total_return_pct,
+        sharpe_ratio=metrics.sharpe_ratio,
+        max_drawdown_pct=metrics.max_drawdown_pct,
+        total_trades=metrics.total_trades,
+        win_rate=metrics.win_rate,
+        profit_factor=metrics.profit_factor,
+        score_final=score_final,
+        total_hold_penalty=total_hold_penalty,
+        extra_params={**params.get("extra_params", {}), "param_hash": _param_hash(params)},
+    )
+
+
+def run_single_experiment(params: dict, trace: dict = None):
     """
     Ejecuta un solo backtest como experimento independiente.
     Diseñado para ser compatible con ProcessPoolExecutor.
+
+    Usa el dataset precargado por run_experiment_grid si existe; si no, lo
+    carga desde disco. Si se pasa `trace`, guarda ahí las acciones y la
+    posición vista en cada paso (para reproducir otras celdas del grid).
+
+    Retorna el ExperimentResult (se pickea tal cual hacia el proceso padre),
+    o un dict con "error" si el experimento falla.
     """
     # Importar aquí para evitar problemas con multiprocessing
-    import yaml
     from cortex.gym.data_loader import DataLoader
     from cortex.gym.environment import TradingEnvironment
-    from cortex.metrics import MetricsEngine
-    from cortex.backtester import create_agent
+    from cortex.backtester import create_agent, collect_trade_pnls, run_episode
 
     agent_name = params["agent"]
     symbol = params["symbol"]
@@ -79,12 +348,17 @@ def run_single_experiment(params: dict) -> dict:
     slippage = params.get("slippage", 0.0005)
     start_date = params.get("start_date")
     end_date = params.get("end_date")
-    experiment_id = params.get("experiment_id", generate_experiment_id())
+    params.setdefault("experiment_id", generate_experiment_id())
+    experiment_id = params["experiment_id"]
 
     try:
         # Cargar datos
-        loader = DataLoader()
-        data = loader.load_merged(symbol, interval, start_date=start_date, end_date=end_date)
+        data = _dataset(_data_key(params))
+        if data is None:
+            loader = DataLoader()
+            data = loader.load_merged(symbol, interval, start_date=start_date, end_date=end_date)
+        elif isinstance(data, Exception):
+            raise data
 
         if data.empty:
             return {"error": f"No data for {symbol} {interval}", "experiment_id": experiment_id}
@@ -106,65 +380,75 @@ def run_single_experiment(params: dict) -> dict:
         )
 
         # Correr simulación
-        observation = env.reset()
-        done = False
-        while not done:
-            action = agent.decide(observation)
-            observation, reward, terminated, truncated, info = env.step(action)
-            done = terminated or truncated
-
-        # Métricas
-        trade_pnls = []
-        for fill in env.exchange.trade_history:
-            if fill.side == "SELL":
-                trade_pnls.append(fill.total_cost - fill.quantity * fill.price)
-        if not trade_pnls and env.equity_curve:
-            trade_pnls = [env.equity_curve[-1] - initial_capital]
-
-        actual_start = str(data["timestamp"].iloc[0].date()) if hasattr(data["timestamp"].iloc[0], "date") else str(data["timestamp"].iloc[0])
-        actual_end = str(data["timestamp"].iloc[-1].date()) if hasattr(data["timestamp"].iloc[-1], "date") else str(data["timestamp"].iloc[-1])
-
-        metrics = MetricsEngine.calculate_all(
-            strategy_name=agent.name,
-            symbol=symbol,
-            start_date=actual_start,
-            end_date=actual_end,
-            initial_capital=initial_capital,
-            equity_curve=env.equity_curve,
-            trade_pnls=trade_pnls,
-            trade_log=env.get_step_log_df(),
+        actions, position_open = run_episode(env, agent, record=trace is not None)
+
+        if trace is not None:
+            trace.update(
+                agent_name=agent.name,
+                data=data,
+                actions=actions,
+                position_open=position_open,
+                closes=env.data["close"].to_numpy(dtype=float)[env.window_size:env.window_size + len(actions)],
+            )
+
+        # Métricas (el ExperimentResult no guarda el log por paso: no se construye)
+        return _experiment_result(
+            params, agent.name, data, env.equity_curve, collect_trade_pnls(env.exchange),
+            env.score, env.total_hold_penalty,
         )
 
-        return ExperimentResult(
-            experiment_id=experiment_id,
-            timestamp=datetime.now().isoformat(),
-            agent_name=agent.name,
-            symbol=symbol,
-            interval=interval,
-            start_date=actual_start,
-            end_date=actual_end,
-            initial_capital=initial_capital,
-            fee_rate=fee_rate,
-            slippage=slippage,
-            hold_penalty_rate=hold_penalty_rate,
-            risk_per_trade_pct=risk_per_trade_pct,
-            final_value=metrics.final_value,
-            total_pnl=metrics.total_pnl,
-            total_return_pct=metrics.total_return_pct,
-            sharpe_ratio=metrics.sharpe_ratio,
-            max_drawdown_pct=metrics.max_drawdown_pct,
-            total_trades=metrics.total_trades,
-            win_rate=metrics.win_rate,
-            profit_factor=metrics.profit_factor,
-            score_final=env.score,
-            total_hold_penalty=env.total_hold_penalty,
-            extra_params=params.get("extra_params", {}),
-        ).to_dict()
-
     except Exception as e:
         return {"error": str(e), "experiment_id": experiment_id, "agent": agent_name, "symbol": symbol}
 
 
+def run_experiment_group(group: list) -> list:
+    """
+    Ejecuta celdas que comparten _group_key (solo difieren en hp/rpt).
+
+    Para agentes deterministas corre el entorno una vez con la primera celda y
+    reproduce sus acciones en el resto con replay_grid. Las celdas donde la
+    reproducción no es válida (la posición diverge) se simulan completas.
+    """
+    import numpy as np
+    from cortex.gym.fast_env import replay_grid
+
+    first = group[0]
+    if len(group) == 1 or first["agent"].lower().replace("-", "_") not in DETERMINISTIC_AGENTS:
+        return [run_single_experiment(p) for p in group]
+
+    trace = {}
+    results = [run_single_experiment(first, trace=trace)]
+    rest = group[1:]
+    if isinstance(results[0], dict) or not trace["actions"]:
+        return results + [run_single_experiment(p) for p in rest]
+
+    equity, sell_pnl, scores, penalties, valid = replay_grid(
+        trace["closes"],
+        np.asarray(trace["actions"], dtype=np.int64),
+        np.asarray(trace["position_open"], dtype=np.bool_),
+        np.array([p.get("hold_penalty_rate", 0.05) for p in rest], dtype=float),
+        np.array([p.get("risk_per_trade_pct", 0.1) for p in rest], dtype=float),
+        first.get("fee_rate", 0.001),
+        first.get("slippage", 0.0005),
+        first.get("initial_capital", 100.0),
+    )
+
+    for k, params in enumerate(rest):
+        if not valid[k]:
+            results.append(run_single_experiment(params))
+            continue
+        pnls = sell_pnl[k]
+        try:
+            results.append(_experiment_result(
+                params, trace["agent_name"], trace["data"], equity[k],
+                pnls[~np.isnan(pnls)].tolist(), float(scores[k]), float(penalties[k]),
+            ))
+        except Exception as e:
+            results.append({"error": str(e), "experiment_id": params["experiment_id"],
+                            "agent": params["agent"], "symbol": params["symbol"]})
+    return results
+
+
 def run_experiment_grid(
     agents: list = None,
     symbols: list = None,
@@ -174,27 +458,30 @@ def run_experiment_grid(
     start_date: str = None,
     end_date: str = None,
     parallel: bool = False,
-    max_workers: int = 4,
+    max_workers: int = None,
     store_mode: str = "local",
+    skip_existing: bool = True,
 ) -> list:
     """
     Ejecuta una grid de experimentos.
 
+    max_workers=None usa todas las CPUs disponibles (default_workers()).
+
+    Con skip_existing, las celdas cuya configuración ya está guardada en el
+    ExperimentStore no se vuelven a correr (ni aparecen en el resultado).
+
     Returns:
-        Lista de ExperimentResult dicts
+        Lista de ExperimentResult
     """
     agents = agents or ["buy_hold", "statistical", "swing", "contrarian"]
     symbols = symbols or ["BTCUSDT"]
     intervals = intervals or ["1d"]
     hold_penalty_rates = hold_penalty_rates or [0.05]
     risk_per_trade_pcts = risk_per_trade_pcts or [0.1]
+    max_workers = max_workers or default_workers()
 
-    # Generar todas las combinaciones
-    combinations = list(itertools.product(
-        agents, symbols, intervals, hold_penalty_rates, risk_per_trade_pcts
-    ))
-
-    total = len(combinations)
+    total = (len(agents) * len(symbols) * len(intervals)
+             * len(hold_penalty_rates) * len(risk_per_trade_pcts))
     print(f"\n🛡️  SENTINEL Experiment Grid")
     print(f"{'═' * 60}")
     print(f"  Agents:          {agents}")
@@ -202,13 +489,12 @@ def run_experiment_grid(
     print(f"  Hold Penalties:  {hold_penalty_rates}")
     print(f"  Risk/Trade:      {risk_per_trade_pcts}")
     print(f"  Total:           {total} experiments")
-    print(f"  Mode:            {'Parallel' if parallel else 'Sequential'}")
+    print(f"  Mode:            {f'Parallel ({max_workers} workers)' if parallel else 'Sequential'}")
     print(f"{'═' * 60}\n")
 
-    # Preparar parámetros
-    all_params = []
-    for agent, symbol, interval, hp, rpt in combinations:
-        all_params.append({
+    # Preparar parámetros (directo desde el producto, sin lista intermedia de tuplas)
+    all_params = [
+        {
             "agent": agent,
             "symbol": symbol,
             "interval": interval,
@@ -217,43 +503,94 @@ def run_experiment_grid(
             "start_date": start_date,
             "end_date": end_date,
             "experiment_id": generate_experiment_id(),
-        })
+        }
+        for agent, symbol, interval, hp, rpt in itertools.product(
+            agents, symbols, intervals, hold_penalty_rates, risk_per_trade_pcts
+        )
+    ]
 
     # Ejecutar
     results = []
     store = ExperimentStore(mode=store_mode)
 
-    if parallel and total > 1:
-        # Ejecución paralela
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            futures = {executor.submit(run_single_experiment, p): p for p in all_params}
-            for i, future in enumerate(as_completed(futures), 1):
-                result = future.result()
-                if "error" in result:
-                    print(f"  ❌ [{i}/{total}] Error: {result['error']}")
-                else:
-                    exp = ExperimentResult(**result)
-                    store.save(exp)
-                    print(f"  ✅ [{i}/{total}] {exp.agent_name} | {exp.symbol} | "
-                          f"PnL: ${exp.total_pnl:+.2f} | Score: {exp.score_final:.0f} | "
-                          f"Sharpe: {exp.sharpe_ratio:.3f}")
-                    results.append(result)
-    else:
-        # Ejecución secuencial
-        for i, params in enumerate(all_params, 1):
-            print(f"  🏃 [{i}/{total}] {params['agent']} | {params['symbol']} | "
-                  f"penalty={params['hold_penalty_rate']} | risk={params['risk_per_trade_pct']}")
-
-            result = run_single_experiment(params)
-
-            if "error" in result:
-                print(f"     ❌ Error: {result['error']}")
-            else:
-                exp = ExperimentResult(**result)
-                store.save(exp)
-                print(f"     ✅ PnL: ${exp.total_pnl:+.2f} | Score: {exp.score_final:.0f} | "
-                      f"Sharpe: {exp.sharpe_ratio:.3f}")
-                results.append(result)
+    if skip_existing:
+        pending = [p for p in all_params if not store.has(_param_hash(p))]
+        if len(pending) < len(all_params):
+            print(f"  ⏭️  {len(all_params) - len(pending)} experimentos ya guardados, se omiten\n")
+        all_params = pending
+
+    # Descartar celdas sin datos antes de crear agentes/entornos o lanzar workers
+    from cortex.gym.data_loader import DataLoader
+    loader = DataLoader()
+    series_ok = {}
+    for p in all_params:
+        series = (p["symbol"], p["interval"])
+        if series not in series_ok:
+            series_ok[series] = loader.has_data(*series)
+    for symbol, interval in (series for series, ok in series_ok.items() if not ok):
+        n = sum(1 for p in all_params if (p["symbol"], p["interval"]) == (symbol, interval))
+        print(f"  ❌ Sin datos de precios para {symbol} {interval}: {n} experimentos omitidos")
+    all_params = [p for p in all_params if series_ok[(p["symbol"], p["interval"])]]
+
+    # Cada (symbol, interval, fechas) se lee del disco una sola vez
+    frames = _preload_data(dict.fromkeys(_data_key(p) for p in all_params))
+    empty = {key for key, data in frames.items() if not isinstance(data, Exception) and data.empty}
+    for key in empty:
+        n = sum(1 for p in all_params if _data_key(p) == key)
+        print(f"  ❌ Sin datos para {key[0]} {key[1]} en el rango pedido: {n} experimentos omitidos")
+    all_params = [p for p in all_params if _data_key(p) not in empty]
+    total = len(all_params)
+
+    # Agrupar celdas que solo difieren en hp/rpt (se reproducen desde una simulación)
+    groups = {}
+    for p in all_params:
+        groups.setdefault(_group_key(p), []).append(p)
+    groups = list(groups.values())
+
+    # Guardado en segundo plano (se vacía al salir del with, antes del leaderboard)
+    with AsyncExperimentStore(store) as writer:
+        if parallel and total > 1:
+            # Ejecución paralela: los workers adjuntan los datos desde memoria compartida
+            with SharedMemoryManager() as manager:
+                specs = _share_frames(frames, manager)
+                del frames
+                with ProcessPoolExecutor(
+                    max_workers=max_workers, initializer=_init_worker, initargs=(specs,)
+                ) as executor:
+                    # ~4 chunks por worker: balance de carga vs. overhead de IPC
+                    chunksize = max(1, len(groups) // (max_workers * 4))
+                    i = 0
+                    for group_results in executor.map(run_experiment_group, groups, chunksize=chunksize):
+                        for exp in group_results:
+                            i += 1
+                            if isinstance(exp, dict):
+                                print(f"  ❌ [{i}/{total}] Error: {exp['error']}")
+                            else:
+                                writer.save(exp)
+                                print(f"  ✅ [{i}/{total}] {exp.agent_name} | {exp.symbol} | "
+                                      f"PnL: ${exp.total_pnl:+.2f} | Score: {exp.score_final:.0f} | "
+                                      f"Sharpe: {exp.sharpe_ratio:.3f}")
+                                results.append(exp)
+        else:
+            # Ejecución secuencial
+            _PRELOADED.update(frames)
+            try:
+                i = 0
+                for group in groups:
+                    for params, exp in zip(group, run_experiment_group(group)):
+                        i += 1
+                        print(f"  🏃 [{i}/{total}] {params['agent']} | {params['symbol']} | "
+                              f"penalty={params['hold_penalty_rate']} | risk={params['risk_per_trade_pct']}")
+
+                        if isinstance(exp, dict):
+                            print(f"     ❌ Error: {exp['error']}")
+                        else:
+                            writer.save(exp)
+                            print(f"     ✅ PnL: ${exp.total_pnl:+.2f} | Score: {exp.score_final:.0f} | "
+                                  f"Sharpe: {exp.sharpe_ratio:.3f}")
+                            results.append(exp)
+            finally:
+                _PRELOADED.clear()
 
     # Leaderboard
     print(f"\n{'═' * 80}")
@@ -300,12 +637,14 @@ Ejemplos:
     parser.add_argument("--end", type=str, default=None)
     parser.add_argument("--parallel", action="store_true",
                         help="Ejecutar en paralelo")
-    parser.add_argument("--workers", type=int, default=4,
-                        help="Número de workers paralelos")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Número de workers paralelos (default: CPUs disponibles)")
     parser.add_argument("--dynamodb", action="store_true",
                         help="Guardar en DynamoDB además de local")
     parser.add_argument("--leaderboard", action="store_true",
                         help="Solo mostrar leaderboard de experimentos existentes")
+    parser.add_argument("--rerun", action="store_true",
+                        help="Re-ejecutar también experimentos ya guardados")
 
     args = parser.parse_args()
 
@@ -354,6 +693,7 @@ Ejemplos:
         parallel=args.parallel,
         max_workers=args.workers,
         store_mode="dynamodb" if args.dynamodb else "local",
+        skip_existing=not args.rerun,
     )
 
 
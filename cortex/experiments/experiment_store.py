@@ -1,7 +1,8 @@
 """
 SENTINEL — Experiment Store (Fase 4)
 ═════════════════════════════════════
-Almacena resultados de experimentos en JSON local + DynamoDB opcional.
+Almacena resultados de experimentos en un JSONL local (append-only, una
+línea por experimento) + DynamoDB opcional.
 
 Cada experimento tiene:
   - ID único (UUID)
@@ -13,12 +14,29 @@ Cada experimento tiene:
 import os
 import json
 import uuid
+import queue
+import threading
+import contextlib
+from decimal import Decimal
 from datetime import datetime
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field, fields, asdict, MISSING
 from typing import List, Optional, Dict, Any
 
+import numpy as np
+
+try:
+    import orjson  # Parser en C para leer el JSONL (opcional)
+except ImportError:
+    orjson = None
+
+try:
+    import fcntl  # Lock entre procesos al escribir el JSONL (POSIX)
+except ImportError:
+    fcntl = None
+
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 RESULTS_DIR = os.path.join(PROJECT_ROOT, "results", "experiments")
+EXPERIMENTS_FILENAME = "experiments.jsonl"
 
 
 @dataclass
@@ -55,12 +73,25 @@ class ExperimentResult:
         return asdict(self)
 
 
+# Una columna por campo de ExperimentResult: números en float64/int64 (misma
+# precisión que el JSONL, para no alterar rankings), el resto como objeto
+_FIELD_DTYPES = {float: np.float64, int: np.int64}
+EXPERIMENT_DTYPE = np.dtype([
+    (f.name, _FIELD_DTYPES.get(f.type, object)) for f in fields(ExperimentResult)
+])
+_FIELD_DEFAULTS = {
+    f.name: f.default_factory for f in fields(ExperimentResult) if f.default_factory is not MISSING
+}
+_REQUIRED_FIELDS = frozenset(EXPERIMENT_DTYPE.names) - frozenset(_FIELD_DEFAULTS)
+
+
 class ExperimentStore:
     """
     Almacena y recupera resultados de experimentos.
 
     Modos:
-    - local: JSON files en results/experiments/
+    - local: results/experiments/experiments.jsonl (los exp_*.json de
+      versiones anteriores se migran al JSONL al abrir el store)
     - dynamodb: Tabla DynamoDB (requiere AWS configurado)
     """
 
@@ -68,8 +99,13 @@ class ExperimentStore:
         self.mode = mode
         self.table_name = table_name
         self._dynamodb = None
+        self._ddb_writer = None  # batch_writer compartido (ver batch_writer())
+        self._param_hashes: Optional[set] = None  # Se carga en el primer has()
+        # (sort_by, top_n) → (versión del JSONL, ranking); ver get_leaderboard()
+        self._lb_cache: Dict[tuple, tuple] = {}
 
         os.makedirs(RESULTS_DIR, exist_ok=True)
+        self._migrate_json_files()
 
         if mode == "dynamodb":
             self._init_dynamodb()
@@ -109,73 +145,388 @@ class ExperimentStore:
 
     def save(self, result: ExperimentResult) -> str:
         """Guarda un resultado de experimento."""
-        data = result.to_dict()
+        self.save_many([result])
+        return result.experiment_id
+
+    def save_many(self, results: List[ExperimentResult]):
+        """
+        Guarda varios resultados: una línea por experimento en el JSONL (un
+        solo append) y, en modo dynamodb, vía batch_writer (BatchWriteItem de 25).
+        """
+        records = [result.to_dict() for result in results]
+        if self._param_hashes is not None:
+            self._param_hashes.update(
+                r.extra_params["param_hash"] for r in results if "param_hash" in r.extra_params
+            )
 
         # Siempre guardar localmente
-        filepath = os.path.join(RESULTS_DIR, f"{result.experiment_id}.json")
-        with open(filepath, "w") as f:
-            json.dump(data, f, indent=2, default=str)
+        self._append_records(records)
 
         # Guardar en DynamoDB si aplica
         if self.mode == "dynamodb" and self._dynamodb:
             try:
-                table = self._dynamodb.Table(self.table_name)
-                # DynamoDB no soporta float, convertir a Decimal
-                from decimal import Decimal
-                ddb_data = json.loads(json.dumps(data, default=str), parse_float=Decimal)
-                table.put_item(Item=ddb_data)
+                items = [_to_ddb_item(data) for data in records]
+                if self._ddb_writer is not None:
+                    for item in items:
+                        self._ddb_writer.put_item(Item=item)
+                else:
+                    with self.batch_writer() as batch:
+                        for item in items:
+                            batch.put_item(Item=item)
             except Exception as e:
                 print(f"  ⚠️  Error guardando en DynamoDB: {e}")
 
-        return result.experiment_id
+    @contextlib.contextmanager
+    def batch_writer(self):
+        """
+        Mantiene un batch_writer de DynamoDB abierto durante el bloque: los
+        save()/save_many() de adentro se acumulan y se envían en
+        BatchWriteItem de 25 (boto3 reintenta los no procesados). En modo
+        local no hace nada y retorna None.
+        """
+        if self.mode != "dynamodb" or not self._dynamodb or self._ddb_writer is not None:
+            yield self._ddb_writer
+            return
+        with self._dynamodb.Table(self.table_name).batch_writer() as writer:
+            self._ddb_writer = writer
+            try:
+                yield writer
+            finally:
+                self._ddb_writer = None
+
+    def has(self, param_hash: str) -> bool:
+        """True si ya hay un experimento guardado con esa configuración (extra_params.param_hash)."""
+        if self._param_hashes is None:
+            self._param_hashes = {
+                r["extra_params"]["param_hash"]
+                for r in self.list_all_dicts()
+                if isinstance(r.get("extra_params"), dict) and "param_hash" in r["extra_params"]
+            }
+        return param_hash in self._param_hashes
 
     def load(self, experiment_id: str) -> Optional[ExperimentResult]:
         """Carga un experimento por ID."""
-        filepath = os.path.join(RESULTS_DIR, f"{experiment_id}.json")
-        if os.path.exists(filepath):
-            with open(filepath, "r") as f:
-                data = json.load(f)
-            return ExperimentResult(**data)
-        return None
+        data = self._read_records().get(experiment_id)
+        if data is None:
+            return None
+        return ExperimentResult(**data)
 
     def list_all(self) -> List[ExperimentResult]:
         """Lista todos los experimentos guardados localmente."""
         results = []
-        if not os.path.exists(RESULTS_DIR):
-            return results
-
-        for filename in sorted(os.listdir(RESULTS_DIR)):
-            if filename.endswith(".json"):
-                filepath = os.path.join(RESULTS_DIR, filename)
-                with open(filepath, "r") as f:
-                    data = json.load(f)
-                try:
-                    results.append(ExperimentResult(**data))
-                except TypeError:
-                    pass  # Skip malformed files
+        for data in self._read_records().values():
+            try:
+                results.append(ExperimentResult(**data))
+            except TypeError:
+                pass  # Skip malformed records
         return results
 
+    def list_all_dicts(self) -> List[dict]:
+        """Como list_all(), pero con los registros crudos (sin construir ExperimentResult)."""
+        return list(self._read_records().values())
+
+    def list_all_array(self) -> np.ndarray:
+        """
+        Todos los experimentos como un array estructurado (EXPERIMENT_DTYPE),
+        una fila por experimento. Los registros malformados se omiten, igual
+        que en list_all().
+        """
+        rows = []
+        for data in self._read_records().values():
+            if _is_experiment_record(data):
+                rows.append(tuple(
+                    data[name] if name in data else _FIELD_DEFAULTS[name]()
+                    for name in EXPERIMENT_DTYPE.names
+                ))
+        try:
+            return np.array(rows, dtype=EXPERIMENT_DTYPE)
+        except (TypeError, ValueError):
+            # Algún valor no convertible (p. ej. un número guardado como texto)
+            return np.array([r for r in rows if _fits_dtype(r)], dtype=EXPERIMENT_DTYPE)
+
     def get_leaderboard(self, sort_by: str = "sharpe_ratio", top_n: int = 20) -> list:
-        """Genera un ranking de experimentos."""
-        results = self.list_all()
-        if not results:
+        """
+        Genera un ranking de experimentos.
+
+        Selecciona el top con np.partition sobre la columna `sort_by` de
+        list_all_array() (O(N)) y solo construye ExperimentResult para esas
+        filas. Empates: se respeta el orden de guardado; NaN va al final.
+
+        El ranking se cachea por (sort_by, top_n) mientras el JSONL no cambie
+        (mismo mtime y tamaño): las consultas repetidas no releen el archivo.
+        """
+        version = _file_version(_experiments_path())
+        cached = self._lb_cache.get((sort_by, top_n))
+        if cached is not None and cached[0] == version:
+            return list(cached[1])
+
+        experiments = self.list_all_array()
+        if not len(experiments) or top_n <= 0:
             return []
 
-        results.sort(key=lambda r: getattr(r, sort_by, 0), reverse=True)
-        return results[:top_n]
+        if sort_by not in EXPERIMENT_DTYPE.names:
+            order = range(min(top_n, len(experiments)))  # Todos empatan en 0
+        elif EXPERIMENT_DTYPE[sort_by].kind not in "biuf":
+            # Columna no numérica (p. ej. agent_name): orden Python
+            values = experiments[sort_by]
+            order = sorted(range(len(values)), key=lambda i: values[i], reverse=True)[:top_n]
+        else:
+            values = np.nan_to_num(experiments[sort_by].astype(float), nan=-np.inf)
+            order = _top_indices(values, top_n)
+
+        results = [
+            ExperimentResult(**dict(zip(EXPERIMENT_DTYPE.names, experiments[i].item())))
+            for i in order
+        ]
+        self._lb_cache[(sort_by, top_n)] = (version, results)
+        return list(results)
 
     def delete(self, experiment_id: str):
-        """Elimina un experimento."""
-        filepath = os.path.join(RESULTS_DIR, f"{experiment_id}.json")
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        """Elimina un experimento (reescribe el JSONL sin esa línea)."""
+        path = _experiments_path()
+        if not os.path.exists(path):
+            return
+        with open(path, "r+") as f, _locked(f):
+            lines = [line for line in f if _record_id(line) != experiment_id]
+            f.seek(0)
+            f.writelines(lines)
+            f.truncate()
+        self._param_hashes = None
 
     def clear_all(self):
         """Elimina todos los experimentos locales."""
         if os.path.exists(RESULTS_DIR):
             for f in os.listdir(RESULTS_DIR):
-                if f.endswith(".json"):
+                if f.endswith(".json") or f == EXPERIMENTS_FILENAME:
                     os.remove(os.path.join(RESULTS_DIR, f))
+        self._param_hashes = None
+
+    # ─── JSONL local ───
+
+    def _append_records(self, records: List[dict]):
+        """Agrega los registros al JSONL en una sola escritura, bajo lock."""
+        if not records:
+            return
+        payload = "".join(json.dumps(data, default=str) + "\n" for data in records)
+        with open(_experiments_path(), "a") as f, _locked(f):
+            f.write(payload)
+
+    def _read_records(self) -> Dict[str, dict]:
+        """experiment_id → registro; si un ID se guardó dos veces gana el último."""
+        records = {}
+        path = _experiments_path()
+        if not os.path.exists(path):
+            return records
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    data = _loads(line)
+                except ValueError:
+                    continue  # Línea truncada (p. ej. proceso interrumpido)
+                if isinstance(data, dict):
+                    records[data.get("experiment_id")] = data
+        return records
+
+    def _migrate_json_files(self):
+        """
+        Pasa los JSON por experimento (formato anterior) al JSONL y los borra.
+
+        Solo se migran objetos con experiment_id; otros JSON de la carpeta
+        (resúmenes, listas) se dejan en su lugar.
+        """
+        legacy = sorted(f for f in os.listdir(RESULTS_DIR) if f.endswith(".json"))
+        if not legacy:
+            return
+        with open(_experiments_path(), "a") as out, _locked(out):
+            for filename in legacy:
+                filepath = os.path.join(RESULTS_DIR, filename)
+                try:
+                    with open(filepath, "rb") as f:
+                        data = _loads(f.read())
+                except FileNotFoundError:
+                    continue  # Otro proceso ya lo migró
+                except ValueError:
+                    continue  # Archivo corrupto: se deja en su lugar
+                if not isinstance(data, dict) or "experiment_id" not in data:
+                    continue  # No es un experimento
+                out.write(json.dumps(data, default=str) + "\n")
+                out.flush()
+                os.remove(filepath)
+
+
+class AsyncExperimentStore:
+    """
+    Guarda resultados en segundo plano sobre un ExperimentStore.
+
+    save() solo encola; un thread drena la cola y guarda en lotes con
+    save_many(), así la latencia de DynamoDB no frena el loop de experimentos.
+    close() espera a que todo lo encolado quede guardado y relanza el primer
+    error de guardado; los resultados que no se guardaron quedan en `failed`.
+    """
+
+    _STOP = object()
+    _PUT_TIMEOUT = 1.0  # Cada cuánto save() revisa que el thread siga vivo
+
+    def __init__(self, store: ExperimentStore, batch_size: int = 25, max_pending: int = 256):
+        self.store = store
+        self.batch_size = batch_size
+        self.failed: List[ExperimentResult] = []
+        self._error: Optional[BaseException] = None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._drain, name="experiment-store", daemon=True)
+        self._thread.start()
+
+    def save(self, result: ExperimentResult) -> str:
+        """Encola un resultado (bloquea solo si hay max_pending sin guardar)."""
+        self._put(result)
+        return result.experiment_id
+
+    def _put(self, item):
+        """put() que falla en vez de bloquear para siempre si el thread murió."""
+        while True:
+            if not self._thread.is_alive():
+                raise RuntimeError("El thread de guardado de experimentos terminó") from self._error
+            try:
+                self._queue.put(item, timeout=self._PUT_TIMEOUT)
+                return
+            except queue.Full:
+                continue
+
+    def _drain(self):
+        try:
+            with self.store.batch_writer():
+                self._drain_queue()
+        except Exception as e:
+            print(f"  ⚠️  Error enviando el último lote a DynamoDB: {e}")
+            self._error = self._error or e
+
+    def _drain_queue(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            try:
+                self.store.save_many(batch)
+            except Exception as e:
+                print(f"  ⚠️  Error guardando {len(batch)} experimentos: {e}")
+                self.failed.extend(batch)
+                self._error = self._error or e
+
+    def close(self):
+        """Vacía la cola, detiene el thread y relanza si algo no se guardó."""
+        if self._thread.is_alive():
+            try:
+                self._put(self._STOP)
+            except RuntimeError:
+                pass  # El thread murió justo ahora: lo pendiente se recoge abajo
+            self._thread.join()
+
+        # Lo que quedó en la cola (el thread murió antes de drenarla) tampoco se guardó
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                self.failed.append(item)
+
+        if self._error is not None or self.failed:
+            raise RuntimeError(
+                f"Error guardando experimentos ({len(self.failed)} sin guardar)"
+            ) from self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _top_indices(values: "np.ndarray", top_n: int) -> list:
+    """Índices de los top_n mayores, de mayor a menor, estable ante empates."""
+    n = len(values)
+    if n > top_n:
+        kth = np.partition(values, n - top_n)[n - top_n]
+        candidates = np.flatnonzero(values >= kth)
+    else:
+        candidates = np.arange(n)
+    ranked = candidates[np.argsort(-values[candidates], kind="stable")]
+    return ranked[:top_n].tolist()
+
+
+def _is_experiment_record(data: dict) -> bool:
+    """True si ExperimentResult(**data) es válido (mismos campos, sin faltantes)."""
+    keys = data.keys()
+    return _REQUIRED_FIELDS <= keys and keys <= EXPERIMENT_DTYPE.fields.keys()
+
+
+def _fits_dtype(row: tuple) -> bool:
+    try:
+        np.array([row], dtype=EXPERIMENT_DTYPE)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _file_version(path: str) -> Optional[tuple]:
+    """(mtime_ns, tamaño) del archivo, o None si no existe."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _experiments_path() -> str:
+    return os.path.join(RESULTS_DIR, EXPERIMENTS_FILENAME)
+
+
+@contextlib.contextmanager
+def _locked(f):
+    """Lock exclusivo sobre el archivo abierto (no-op sin fcntl)."""
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        f.flush()
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _record_id(line: str) -> Optional[str]:
+    try:
+        data = _loads(line)
+    except ValueError:
+        return None
+    return data.get("experiment_id") if isinstance(data, dict) else None
+
+
+def _loads(raw):
+    """orjson si está instalado; json si no, o si el registro trae NaN/Infinity (orjson los rechaza)."""
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except ValueError:
+            pass
+    return json.loads(raw)
+
+
+def _to_ddb_item(data: dict) -> dict:
+    """DynamoDB no soporta float: serializa y relee los números como Decimal."""
+    return json.loads(json.dumps(data, default=str), parse_float=Decimal)
 
 
 def generate_experiment_id() -> str:
@@ -1,3 +1,3 @@
-from cortex.gym.environment import TradingEnvironment
+from cortex.gym.environment import Observation, TradingEnvironment
 from cortex.gym.data_loader import DataLoader
 from cortex.gym.exchange_mock import ExchangeMock
@@ -6,9 +6,16 @@ Soporta carga local y desde S3.
 """
 
 import os
+import json
+import hashlib
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
 
 # Mapping entre símbolos del config (BTCUSDT) y archivos locales (BTC-USD)
@@ -18,6 +25,158 @@ SYMBOL_FILE_MAP = {
     "SOLUSDT": "SOL-USD",
 }
 
+# Columnas (en minúsculas) que se leen del Parquet de precios: tiempo + OHLCV
+PRICE_FILE_COLUMNS = {"date", "datetime", "timestamp", "open", "high", "low", "close", "volume"}
+# Nombres aceptados para la columna de tiempo, en orden de preferencia
+TIME_COLUMNS = ["Date", "Datetime", "timestamp", "date"]
+
+# Clave de metadata del Parquet de cache con los archivos de entrada + mtime
+MERGED_CACHE_KEY = b"sentinel.merged_inputs"
+# Subir al cambiar cómo se leen/fusionan las fuentes: invalida los caches previos
+MERGED_CACHE_VERSION = 2
+
+
+@functools.lru_cache(maxsize=32)
+def _load_prices_cached(
+    filepath: str,
+    mtime: float,
+    start_date: Optional[str],
+    end_date: Optional[str],
+) -> pd.DataFrame:
+    """
+    Lee y normaliza el Parquet de precios. Cacheado por (path, mtime, fechas):
+    si el archivo cambia se vuelve a leer. No mutar el resultado (load_prices
+    entrega copias).
+    """
+    # Solo las columnas necesarias, con memory map y sin consolidar bloques
+    schema = pq.read_schema(filepath)
+    columns = [name for name in schema.names if name.lower() in PRICE_FILE_COLUMNS]
+
+    # Filtro de fechas empujado al Parquet (salta row groups por sus
+    # estadísticas min/max) si la columna de tiempo es un timestamp sin zona;
+    # si no, se filtra en pandas después de normalizar
+    filters = []
+    time_field = next((schema.field(c) for c in TIME_COLUMNS if c in schema.names), None)
+    pushdown = (
+        time_field is not None
+        and pa.types.is_timestamp(time_field.type)
+        and time_field.type.tz is None
+    )
+    if pushdown:
+        if start_date:
+            filters.append((time_field.name, ">=", pd.to_datetime(start_date)))
+        if end_date:
+            filters.append((time_field.name, "<=", pd.to_datetime(end_date)))
+
+    table = pq.read_table(filepath, columns=columns, filters=filters or None, memory_map=True)
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    del table
+
+    # Normalizar nombre de columna de tiempo
+    time_col = None
+    for col in TIME_COLUMNS:
+        if col in df.columns:
+            time_col = col
+            break
+
+    if time_col is None and df.index.name in ["Date", "Datetime"]:
+        df = df.reset_index()
+        time_col = df.columns[0]
+
+    if time_col:
+        df = df.rename(columns={time_col: "timestamp"})
+        # El Parquet suele traer la columna ya como datetime: no re-parsear
+        if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
+            df["timestamp"] = pd.to_datetime(df["timestamp"], cache=True)
+
+    # Normalizar nombres de columnas a minúsculas
+    df.columns = [c.lower() for c in df.columns]
+
+    # Asegurar columnas mínimas
+    required = ["timestamp", "open", "high", "low", "close", "volume"]
+    for col in required:
+        if col not in df.columns:
+            raise ValueError(
+                f"Columna '{col}' no encontrada en {filepath}. "
+                f"Columnas disponibles: {list(df.columns)}"
+            )
+
+    df = df[required]
+    df = df.sort_values("timestamp").reset_index(drop=True)
+
+    # Filtrar por fechas (si no se pudo en la lectura)
+    if not pushdown:
+        if start_date:
+            df = df[df["timestamp"] >= pd.to_datetime(start_date)]
+        if end_date:
+            df = df[df["timestamp"] <= pd.to_datetime(end_date)]
+        df = df.reset_index(drop=True)
+    return df
+
+
+def _calendar_days(timestamps: pd.Series) -> np.ndarray:
+    """Fecha (datetime64[D]) de cada timestamp, en hora local si tiene zona."""
+    if getattr(timestamps.dt, "tz", None) is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    return timestamps.to_numpy().astype("datetime64[D]")
+
+
+def _read_merged_cache(cache_path: str, inputs: bytes) -> Optional[pd.DataFrame]:
+    """Lee el merge cacheado si existe y se generó con las mismas entradas."""
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if metadata.get(MERGED_CACHE_KEY) != inputs:
+        return None
+    table = pq.read_table(cache_path, memory_map=True)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _write_merged_cache(cache_path: str, inputs: bytes, merged: pd.DataFrame):
+    """Escribe el merge en cache (atómico vía rename); si falla, solo no se cachea."""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        table = pa.Table.from_pandas(merged, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), MERGED_CACHE_KEY: inputs}
+        )
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def _list_dir(path: str) -> Tuple[List[str], List[str]]:
+    """(archivos, subdirectorios) de `path` con scandir (sin stat por entrada)."""
+    files, subdirs = [], []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):  # Como os.walk
+                subdirs.append(entry.path)
+            elif entry.is_file():
+                files.append(entry.path)
+    return files, subdirs
+
+
+def _scan_files(directory: str, suffixes: tuple) -> List[str]:
+    """
+    Rutas relativas a `directory` de los archivos con esas extensiones (recursivo).
+
+    Cada subdirectorio se lista en un thread del pool: en discos de red el
+    costo es la latencia de cada listado, no la CPU.
+    """
+    found = []
+    max_workers = min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = [executor.submit(_list_dir, directory)]
+        while pending:
+            files, subdirs = pending.pop().result()
+            found.extend(f for f in files if f.endswith(suffixes))
+            pending.extend(executor.submit(_list_dir, d) for d in subdirs)
+    return sorted(os.path.relpath(f, directory) for f in found)
+
 
 class DataLoader:
     """Carga y prepara datos para el entorno de simulación."""
@@ -36,6 +195,16 @@ class DataLoader:
         self.data_dir = data_dir
         self.prices_dir = os.path.join(data_dir, "market", "raw")
         self.sentiment_dir = os.path.join(data_dir, "sentimental", "raw")
+        self.cache_dir = os.path.join(data_dir, "cache")
+
+    def _prices_path(self, symbol: str, interval: str) -> str:
+        """Ruta del Parquet de precios para symbol/interval."""
+        file_symbol = SYMBOL_FILE_MAP.get(symbol, symbol)
+        return os.path.join(self.prices_dir, f"{file_symbol}_{interval}.parquet")
+
+    def has_data(self, symbol: str, interval: str = "1d") -> bool:
+        """True si existe el archivo de precios (no lo lee; el rango de fechas se valida al cargar)."""
+        return os.path.exists(self._prices_path(symbol, interval))
 
     def load_prices(
         self,
@@ -56,10 +225,7 @@ class DataLoader:
         Returns:
             DataFrame con columnas: timestamp, open, high, low, close, volume
         """
-        # Resolver nombre de archivo
-        file_symbol = SYMBOL_FILE_MAP.get(symbol, symbol)
-        filename = f"{file_symbol}_{interval}.parquet"
-        filepath = os.path.join(self.prices_dir, filename)
+        filepath = self._prices_path(symbol, interval)
 
         if not os.path.exists(filepath):
             raise FileNotFoundError(
@@ -67,46 +233,22 @@ class DataLoader:
                 f"Ejecuta: python3 download_prices_now.py"
             )
 
-        df = pd.read_parquet(filepath)
+        # Copia profunda: el caller puede mutarla sin tocar la entrada cacheada
+        # (con pandas < 3 una copia superficial compartiría los datos)
+        mtime = os.path.getmtime(filepath)
+        return _load_prices_cached(filepath, mtime, start_date, end_date).copy()
 
-        # Normalizar nombre de columna de tiempo
-        time_col = None
-        for col in ["Date", "Datetime", "timestamp", "date"]:
-            if col in df.columns:
-                time_col = col
-                break
-
-        if time_col is None and df.index.name in ["Date", "Datetime"]:
-            df = df.reset_index()
-            time_col = df.columns[0]
-
-        if time_col:
-            df = df.rename(columns={time_col: "timestamp"})
-            df["timestamp"] = pd.to_datetime(df["timestamp"])
-
-        # Normalizar nombres de columnas a minúsculas
-        df.columns = [c.lower() for c in df.columns]
-
-        # Asegurar columnas mínimas
-        required = ["timestamp", "open", "high", "low", "close", "volume"]
-        for col in required:
-            if col not in df.columns:
-                raise ValueError(
-                    f"Columna '{col}' no encontrada en {filepath}. "
-                    f"Columnas disponibles: {list(df.columns)}"
-                )
-
-        df = df[required].copy()
-        df = df.sort_values("timestamp").reset_index(drop=True)
-
-        # Filtrar por fechas
-        if start_date:
-            df = df[df["timestamp"] >= pd.to_datetime(start_date)]
-        if end_date:
-            df = df[df["timestamp"] <= pd.to_datetime(end_date)]
-
-        df = df.reset_index(drop=True)
-        return df
+    def _sentiment_path(self, model: str) -> Optional[str]:
+        """CSV de sentimiento a usar: el merged daily o, si no existe, el del modelo."""
+        merged_path = os.path.join(self.sentiment_dir, "merged", "merged_daily.csv")
+        if os.path.exists(merged_path):
+            return merged_path
+        annotated_path = os.path.join(
+            self.sentiment_dir, "annotated", f"merged_daily_{model}_opinion.csv"
+        )
+        if os.path.exists(annotated_path):
+            return annotated_path
+        return None
 
     def load_sentiment(
         self,
@@ -125,44 +267,42 @@ class DataLoader:
         Returns:
             DataFrame con columnas: timestamp, sentiment_score
         """
-        # Intentar cargar el merged daily primero
-        merged_path = os.path.join(self.sentiment_dir, "merged", "merged_daily.csv")
-
-        if os.path.exists(merged_path):
-            df = pd.read_csv(merged_path)
-        else:
-            # Intentar archivo específico del modelo
-            pattern = f"merged_daily_{model}_opinion.csv"
-            annotated_path = os.path.join(self.sentiment_dir, "annotated", pattern)
-
-            if os.path.exists(annotated_path):
-                df = pd.read_csv(annotated_path)
-            else:
-                print(f"  ⚠️  Datos de sentimiento no encontrados para {model}")
-                return pd.DataFrame(columns=["timestamp", "sentiment_score"])
-
-        # Normalizar columnas
-        df.columns = [c.lower().strip() for c in df.columns]
+        sentiment_path = self._sentiment_path(model)
+        if sentiment_path is None:
+            print(f"  ⚠️  Datos de sentimiento no encontrados para {model}")
+            return pd.DataFrame(columns=["timestamp", "sentiment_score"])
+        # Resolver columnas desde el encabezado y leer solo esas dos
+        header = list(pd.read_csv(sentiment_path, nrows=0).columns)
+        normalized = [c.lower().strip() for c in header]
 
         # Buscar columna de fecha
         date_col = None
         for col in ["date", "timestamp", "datetime", "day"]:
-            if col in df.columns:
+            if col in normalized:
                 date_col = col
                 break
 
-        if date_col:
-            df = df.rename(columns={date_col: "timestamp"})
-            df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-            df = df.dropna(subset=["timestamp"])
-
         # Buscar columna de sentimiento
         sent_col = None
-        for col in df.columns:
+        for col in normalized:
             if "sentiment" in col or "opinion" in col or "score" in col:
                 sent_col = col
                 break
 
+        usecols = [orig for orig, col in zip(header, normalized) if col in (date_col, sent_col)]
+        if not usecols:
+            return pd.DataFrame(columns=["timestamp", "sentiment_score"])
+
+        # Lector CSV de pyarrow (multithread); la fecha como texto, se parsea abajo
+        dtype = {header[normalized.index(date_col)]: str} if date_col else None
+        df = pd.read_csv(sentiment_path, engine="pyarrow", usecols=usecols, dtype=dtype)
+        df.columns = [c.lower().strip() for c in df.columns]
+
+        if date_col:
+            df = df.rename(columns={date_col: "timestamp"})
+            df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+            df = df.dropna(subset=["timestamp"])
+
         if sent_col and sent_col != "sentiment_score":
             df = df.rename(columns={sent_col: "sentiment_score"})
 
@@ -203,7 +343,46 @@ class DataLoader:
 
         Returns:
             DataFrame con OHLCV + sentiment_score
+
+        El resultado se guarda en data/cache/ como Parquet, junto con el mtime
+        de los archivos de entrada; mientras no cambien, las llamadas
+        siguientes leen solo ese archivo (sin CSV ni merge).
         """
+        prices_path = self._prices_path(symbol, interval)
+        if not os.path.exists(prices_path):
+            return self.load_prices(symbol, interval, start_date, end_date)  # FileNotFoundError
+
+        sentiment_path = self._sentiment_path(sentiment_model)
+        inputs = json.dumps([
+            MERGED_CACHE_VERSION,
+            prices_path, os.path.getmtime(prices_path),
+            sentiment_path, sentiment_path and os.path.getmtime(sentiment_path),
+        ]).encode()
+        cache_name = hashlib.blake2b(
+            repr((symbol, interval, sentiment_model, start_date, end_date)).encode(),
+            digest_size=8,
+        ).hexdigest()
+        cache_path = os.path.join(
+            self.cache_dir, f"{os.path.basename(prices_path)[:-8]}_{cache_name}.parquet"
+        )
+
+        cached = _read_merged_cache(cache_path, inputs)
+        if cached is not None:
+            return cached
+
+        merged = self._merge(symbol, interval, sentiment_model, start_date, end_date)
+        _write_merged_cache(cache_path, inputs, merged)
+        return merged
+
+    def _merge(
+        self,
+        symbol: str,
+        interval: str,
+        sentiment_model: str,
+        start_date: Optional[str],
+        end_date: Optional[str],
+    ) -> pd.DataFrame:
+        """Fusiona precios + sentimiento desde los archivos fuente."""
         prices = self.load_prices(symbol, interval, start_date, end_date)
         sentiment = self.load_sentiment(sentiment_model, start_date, end_date)
 
@@ -211,20 +390,23 @@ class DataLoader:
             prices["sentiment_score"] = 0.0
             return prices
 
-        # Normalizar a solo fecha para merge (en caso de datos diarios)
-        prices["merge_date"] = prices["timestamp"].dt.date
-        sentiment["merge_date"] = sentiment["timestamp"].dt.date
+        # Alinear por fecha (día calendario) con searchsorted sobre datetime64[D]:
+        # sin columna object de fechas ni hash-merge. Si el sentimiento repite
+        # una fecha se usa su primera fila.
+        price_days = _calendar_days(prices["timestamp"])
+        sentiment_days = _calendar_days(sentiment["timestamp"])
+        order = np.argsort(sentiment_days, kind="stable")
+        sentiment_days = sentiment_days[order]
+        scores = sentiment["sentiment_score"].to_numpy(dtype=np.float64)[order]
 
-        # Merge por fecha
-        merged = prices.merge(
-            sentiment[["merge_date", "sentiment_score"]],
-            on="merge_date",
-            how="left",
-        )
-        merged["sentiment_score"] = merged["sentiment_score"].fillna(0.0)
-        merged = merged.drop(columns=["merge_date"])
+        idx = np.searchsorted(sentiment_days, price_days)
+        found = idx < len(sentiment_days)
+        found[found] = sentiment_days[idx[found]] == price_days[found]
+        aligned = np.zeros(len(prices))
+        aligned[found] = scores[idx[found]]
+        prices["sentiment_score"] = aligned
 
-        return merged
+        return prices
 
     def list_available_data(self) -> dict:
         """Lista los datos disponibles localmente."""
@@ -236,11 +418,7 @@ class DataLoader:
                     available["prices"].append(f)
 
         if os.path.exists(self.sentiment_dir):
-            for root, dirs, files in os.walk(self.sentiment_dir):
-                for f in files:
-                    if f.endswith((".csv", ".parquet")):
-                        rel = os.path.relpath(os.path.join(root, f), self.sentiment_dir)
-                        available["sentiment"].append(rel)
+            available["sentiment"] = _scan_files(self.sentiment_dir, (".csv", ".parquet"))
 
         return available
 
@@ -6,10 +6,12 @@ Entorno de simulación de trading compatible con la API de Gymnasium.
 
 import numpy as np
 import pandas as pd
-from typing import Dict, Optional, Tuple, Any
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict, Optional, Tuple, Any, TypedDict
 
-from cortex.gym.exchange_mock import ExchangeMock
+from cortex.gym.exchange_mock import ExchangeMock, Fill
 from cortex.gym.data_loader import DataLoader
+from cortex.gym.fast_env import run_episode
 
 
 # Acciones
@@ -18,6 +20,44 @@ BUY = 1
 SELL = 2
 ACTION_NAMES = {HOLD: "HOLD", BUY: "BUY", SELL: "SELL"}
 
+# Escala del score por reward: ganancias x100, pérdidas x150
+SCORE_GAIN_SCALE = 100.0
+SCORE_LOSS_SCALE = 150.0
+
+# Indicadores precomputados una vez y compartidos entre agentes vía observación
+# (claves: "sma10", "sma20", "sma30", "rsi14", "ret5")
+INDICATOR_SMA_PERIODS = (10, 20, 30)
+INDICATOR_RSI_PERIOD = 14
+INDICATOR_RETURN_LOOKBACK = 5
+
+
+class _ObservationFields(TypedDict):
+    prices: np.ndarray          # (window_size, 5) OHLCV, vista de solo lectura
+    returns: np.ndarray         # (window_size,) retornos
+    current_price: float
+    position: float             # Cantidad de activo
+    portfolio_value: float
+    cash: float
+    sentiment: float
+    score: float                # Score actual (0-1000)
+    timestamp: Any
+    step: int                   # Fila de `data` del paso
+
+
+class Observation(_ObservationFields, total=False):
+    """
+    Observación que reciben los agentes en cada paso.
+
+    Es un dict común (los agentes leen con .get); el TypedDict documenta las
+    claves y sus tipos. Los indicadores solo están si el periodo cabe en la
+    ventana del entorno.
+    """
+    sma10: float
+    sma20: float
+    sma30: float
+    rsi14: float
+    ret5: float
+
 
 class TradingEnvironment:
     """
@@ -49,7 +89,12 @@ class TradingEnvironment:
             symbol: Símbolo del activo
             hold_penalty_rate: % de cash penalizado por cada HOLD (0.05 = 5%)
         """
-        self.data = data.reset_index(drop=True)
+        # Copia superficial (la columna returns no debe tocar el DataFrame del
+        # caller); reindexar solo si el índice no es ya 0..n-1
+        if data.index.equals(pd.RangeIndex(len(data))):
+            self.data = data.copy(deep=False)
+        else:
+            self.data = data.reset_index(drop=True)
         self.initial_capital = initial_capital
         self.risk_per_trade_pct = risk_per_trade_pct
         self.window_size = window_size
@@ -65,37 +110,127 @@ class TradingEnvironment:
         # Estado interno
         self.current_step: int = 0
         self.done: bool = False
-        self.equity_curve: list = []
+        self._obs_value: tuple = (-1, 0.0)  # (paso, valor del portfolio) de la última observación
         self.trade_pnls: list = []
-        self.step_log: list = []
+        self._alloc_step_log()
 
         # Score system (0-1000): decreases on losses/penalties, increases on gains
         self.score: float = 1000.0
-        self.score_history: list = []
         self.total_hold_penalty: float = 0.0
 
-        # Precomputar returns para observación
-        self.data["returns"] = self.data["close"].pct_change().fillna(0)
+        # Despacho de step() por acción
+        self._action_fns = {HOLD: self._hold, BUY: self._buy, SELL: self._sell}
+
+        # Columnas como arrays (SoA): step() y la observación indexan por
+        # entero en vez de construir una Series por fila con .iloc
+        self._close = self.data["close"].to_numpy(dtype=np.float64)
+
+        # Precomputar returns para observación (misma fórmula que pct_change:
+        # close / close_prev - 1, NaN → 0)
+        returns = np.zeros(len(self._close))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(self._close[1:], self._close[:-1], out=returns[1:])
+        returns[1:] -= 1
+        returns[np.isnan(returns)] = 0.0
+        self.data["returns"] = returns
+        self._ohlcv = self.data[["open", "high", "low", "close", "volume"]].to_numpy(dtype=np.float64)
+        self._returns = returns
+        self._timestamps = self.data["timestamp"].tolist()
+        if "sentiment_score" in self.data.columns:
+            self._sentiment = self.data["sentiment_score"].to_numpy(dtype=np.float64)
+        else:
+            self._sentiment = np.zeros(len(self.data))
+
+        # Ventanas de observación como vistas sin copia: _windows[k] son las
+        # filas [k, k + window_size), es decir, la ventana del paso k + window_size
+        if len(self.data) >= window_size:
+            self._windows = sliding_window_view(self._ohlcv, (window_size, 5))[:, 0]
+            self._return_windows = sliding_window_view(self._returns, window_size)
+        else:
+            self._windows = np.empty((0, window_size, 5))
+            self._return_windows = np.empty((0, window_size))
+
+        # Precomputar indicadores (indexados por paso, sobre la ventana previa)
+        self._indicators = self._precompute_indicators()
+
+    def _precompute_indicators(self) -> Dict[str, np.ndarray]:
+        """
+        Calcula SMA, RSI y retorno reciente para todos los pasos de una vez.
+
+        El valor en la posición `idx` corresponde a la ventana de cierres
+        data[:idx] que ve el agente en ese paso (mismas fórmulas que los agentes).
+        """
+        closes = self.data["close"].to_numpy(dtype=np.float64)
+        n = len(closes)
+        indicators = {}
+
+        for period in INDICATOR_SMA_PERIODS:
+            if period > self.window_size:
+                continue  # El agente nunca ve una ventana tan larga
+            sma = np.full(n, np.nan)
+            if n > period:
+                sma[period:] = sliding_window_view(closes[:-1], period).sum(axis=1) / period
+            indicators[f"sma{period}"] = sma
+
+        period = INDICATOR_RSI_PERIOD
+        rsi = np.full(n, 50.0)  # Neutral si no hay suficientes datos
+        if n > period + 1:
+            deltas = np.diff(closes[:-1])
+            gains = sliding_window_view(np.where(deltas > 0, deltas, 0.0), period).sum(axis=1)
+            losses = sliding_window_view(np.where(deltas < 0, -deltas, 0.0), period).sum(axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values = np.where(losses == 0, 100.0, 100 - 100 / (1 + gains / losses))
+            rsi[period + 1:] = values
+        indicators[f"rsi{period}"] = rsi
+
+        lookback = INDICATOR_RETURN_LOOKBACK
+        ret = np.zeros(n)
+        if n > lookback:
+            ret[lookback:] = (closes[lookback - 1:-1] - closes[:-lookback]) / closes[:-lookback]
+        indicators[f"ret{lookback}"] = ret
+
+        return indicators
+
+    @property
+    def indicators(self) -> Dict[str, np.ndarray]:
+        """Indicadores precomputados por fila de `data` (los mismos de la observación)."""
+        return self._indicators
 
     @property
     def total_steps(self) -> int:
         return len(self.data)
 
-    def reset(self) -> dict:
+    def _alloc_step_log(self):
+        """
+        Buffers columnares del log de pasos, escritos por índice en step().
+
+        Precio, timestamp y sentimiento no se copian: se guardan las filas de
+        `data` y se toman de las columnas al construir el DataFrame.
+        """
+        n = len(self.data)  # Cota superior de pasos por episodio
+        self._log_len = 0
+        self._log_row = np.empty(n, dtype=np.uint32)
+        self._log_action = np.empty(n, dtype=np.int64)
+        self._log_value = np.empty(n)
+        self._log_cash = np.empty(n)
+        self._log_pos = np.empty(n)
+        self._log_reward = np.empty(n)
+        self._log_score = np.empty(n)
+        self._log_holdpen = np.empty(n)
+
+    def reset(self) -> Observation:
         """Reinicia el entorno. Retorna la observación inicial."""
         self.current_step = self.window_size  # Empezar después de la ventana
         self.done = False
         self.exchange.reset()
-        self.equity_curve = []
         self.trade_pnls = []
-        self.step_log = []
+        self._alloc_step_log()
         self.score = 1000.0
-        self.score_history = []
         self.total_hold_penalty = 0.0
 
         return self._get_observation()
 
-    def step(self, action: int) -> Tuple[dict, float, bool, bool, dict]:
+    def step(self, action: int) -> Tuple[Observation, float, bool, bool, dict]:
         """
         Ejecuta un paso en el entorno.
 
@@ -108,75 +243,45 @@ class TradingEnvironment:
         if self.done:
             raise RuntimeError("Environment is done. Call reset().")
 
-        row = self.data.iloc[self.current_step]
-        price = row["close"]
-        timestamp = row["timestamp"]
-        prev_value = self.exchange.get_portfolio_value({self.symbol: price})
-
-        # Ejecutar acción
-        fill = None
-        action_name = ACTION_NAMES.get(action, "UNKNOWN")
-        hold_penalty = 0.0
-
-        if action == HOLD:
-            # ═══ HOLD PENALTY: 5% del cash por cada step sin operar ═══
-            penalty = self.exchange.cash * self.hold_penalty_rate
-            if penalty > 0.01:  # Mínimo $0.01 para aplicar
-                self.exchange.cash -= penalty
-                self.total_hold_penalty += penalty
-                hold_penalty = penalty
-
-        elif action == BUY:
-            # Comprar con risk_per_trade_pct del portfolio
-            trade_amount = prev_value * self.risk_per_trade_pct
-            fill = self.exchange.buy(
-                self.symbol, trade_amount, price, timestamp
-            )
-
-        elif action == SELL:
-            # Vender toda la posición
-            fill = self.exchange.sell(
-                self.symbol, quantity=None, market_price=price, timestamp=timestamp
-            )
-            if fill:
-                # Calcular PnL del round-trip
-                pos = self.exchange.positions.get(self.symbol)
-                self.trade_pnls.append(fill.total_cost - fill.quantity * fill.price)
+        idx = self.current_step
+        price = self._close[idx]
+        timestamp = self._timestamps[idx]
+        if self._obs_value[0] == idx:
+            # Ya calculado en la observación de este paso (el exchange no cambió)
+            prev_value = self._obs_value[1]
+        else:
+            prev_value = self.exchange.get_portfolio_value_at(self.symbol, price)
+
+        # Ejecutar acción (tabla de despacho; acción desconocida = no operar)
+        fill, hold_penalty = self._action_fns.get(action, self._no_action)(
+            price, timestamp, prev_value
+        )
 
         # Calcular nuevo valor del portfolio
-        current_value = self.exchange.get_portfolio_value({self.symbol: price})
-        self.equity_curve.append(current_value)
+        current_value = self.exchange.get_portfolio_value_at(self.symbol, price)
 
         # Reward = cambio porcentual del portfolio
         reward = (current_value - prev_value) / prev_value if prev_value > 0 else 0.0
 
         # ═══ SCORE SYSTEM: sube con ganancias, baja con pérdidas/penalties ═══
-        if reward > 0:
-            self.score += reward * 100  # Ganancias incrementan score
-        elif reward < 0:
-            self.score += reward * 150  # Pérdidas penalizan 1.5x más
+        if reward:
+            # Ganancias incrementan score; pérdidas penalizan 1.5x más
+            self.score += reward * (SCORE_LOSS_SCALE if reward < 0 else SCORE_GAIN_SCALE)
         if hold_penalty > 0:
             self.score -= (hold_penalty / self.initial_capital) * 50
         self.score = max(0.0, min(1000.0, self.score))  # Clamp 0-1000
-        self.score_history.append(self.score)
 
         # Log
-        self.step_log.append({
-            "timestamp": timestamp,
-            "action": action_name,
-            "price": price,
-            "portfolio_value": current_value,
-            "cash": self.exchange.cash,
-            "position_qty": (
-                self.exchange.positions[self.symbol].quantity
-                if self.symbol in self.exchange.positions
-                else 0.0
-            ),
-            "reward": reward,
-            "score": self.score,
-            "hold_penalty": hold_penalty,
-            "sentiment": row.get("sentiment_score", 0.0),
-        })
+        i = self._log_len
+        self._log_row[i] = idx
+        self._log_action[i] = action
+        self._log_value[i] = current_value
+        self._log_cash[i] = self.exchange.cash
+        self._log_pos[i] = self.exchange.position_qty(self.symbol)
+        self._log_reward[i] = reward
+        self._log_score[i] = self.score
+        self._log_holdpen[i] = hold_penalty
+        self._log_len = i + 1
 
         # Avanzar
         self.current_step += 1
@@ -198,31 +303,52 @@ class TradingEnvironment:
 
         return observation, reward, terminated, False, info
 
-    def _get_observation(self) -> dict:
+    def _hold(self, price, timestamp, prev_value) -> Tuple[Optional[Fill], float]:
+        # ═══ HOLD PENALTY: 5% del cash por cada step sin operar ═══
+        penalty = self.exchange.cash * self.hold_penalty_rate
+        if penalty > 0.01:  # Mínimo $0.01 para aplicar
+            self.exchange.cash -= penalty
+            self.total_hold_penalty += penalty
+            return None, penalty
+        return None, 0.0
+
+    def _buy(self, price, timestamp, prev_value) -> Tuple[Optional[Fill], float]:
+        # Comprar con risk_per_trade_pct del portfolio
+        trade_amount = prev_value * self.risk_per_trade_pct
+        return self.exchange.buy(self.symbol, trade_amount, price, timestamp), 0.0
+
+    def _sell(self, price, timestamp, prev_value) -> Tuple[Optional[Fill], float]:
+        # Vender toda la posición
+        fill = self.exchange.sell(
+            self.symbol, quantity=None, market_price=price, timestamp=timestamp
+        )
+        if fill:
+            # Calcular PnL del round-trip
+            self.trade_pnls.append(fill.total_cost - fill.quantity * fill.price)
+        return fill, 0.0
+
+    def _no_action(self, price, timestamp, prev_value) -> Tuple[Optional[Fill], float]:
+        return None, 0.0
+
+    def _get_observation(self) -> Observation:
         """Construye la observación actual para el agente."""
         idx = self.current_step
 
-        # Ventana de precios OHLCV
-        start = max(0, idx - self.window_size)
-        window = self.data.iloc[start:idx]
-
-        prices = window[["open", "high", "low", "close", "volume"]].values
-        returns = window["returns"].values
+        # Ventana de precios OHLCV (vista de solo lectura)
+        prices = self._windows[idx - self.window_size]
+        returns = self._return_windows[idx - self.window_size]
 
         # Posición actual
-        pos_qty = 0.0
-        if self.symbol in self.exchange.positions:
-            pos_qty = self.exchange.positions[self.symbol].quantity
+        pos_qty = self.exchange.position_qty(self.symbol)
 
-        current_price = self.data.iloc[idx]["close"]
-        portfolio_value = self.exchange.get_portfolio_value(
-            {self.symbol: current_price}
-        )
+        current_price = self._close[idx]
+        portfolio_value = self.exchange.get_portfolio_value_at(self.symbol, current_price)
+        self._obs_value = (idx, portfolio_value)  # prev_value del próximo step()
 
         # Sentimiento
-        sentiment = self.data.iloc[idx].get("sentiment_score", 0.0)
+        sentiment = self._sentiment[idx]
 
-        return {
+        observation: Observation = {
             "prices": prices,               # (window_size, 5) OHLCV
             "returns": returns,              # (window_size,) retornos
             "current_price": current_price,  # Precio actual
@@ -231,27 +357,103 @@ class TradingEnvironment:
             "cash": self.exchange.cash,
             "sentiment": sentiment,
             "score": self.score,             # Score actual (0-1000)
-            "timestamp": self.data.iloc[idx]["timestamp"],
+            "timestamp": self._timestamps[idx],
             "step": idx,
         }
+        # Indicadores precomputados: sma10/sma20/sma30, rsi14, ret5
+        for name, values in self._indicators.items():
+            observation[name] = values[idx]
+        return observation
+
+    def run_precomputed_actions(self, actions) -> Dict[str, Any]:
+        """
+        Simula un episodio completo con acciones ya materializadas, en un
+        kernel compilado (cortex.gym.fast_env), sin tocar el estado del entorno.
+
+        Args:
+            actions: Una acción por paso (len(data) - 1 - window_size)
+
+        Returns:
+            Dict con equity_curve, score_history, trade_pnls, score final y
+            total_hold_penalty (mismos valores que reset() + step() en bucle)
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        closes = self._close[self.window_size:len(self.data) - 1]
+        if len(actions) != len(closes):
+            raise ValueError(
+                f"Se esperaban {len(closes)} acciones, se recibieron {len(actions)}"
+            )
+
+        equity, scores, sell_pnl, total_penalty = run_episode(
+            closes, actions,
+            float(self.initial_capital), float(self.exchange.fee_rate),
+            float(self.exchange.slippage), float(self.risk_per_trade_pct),
+            float(self.hold_penalty_rate),
+        )
+        return {
+            "equity_curve": equity,
+            "score_history": scores,
+            "trade_pnls": sell_pnl[~np.isnan(sell_pnl)],
+            "score": float(scores[-1]) if len(scores) else 1000.0,
+            "total_hold_penalty": float(total_penalty),
+        }
 
     def get_step_log_df(self) -> pd.DataFrame:
         """Retorna el log de pasos como DataFrame."""
-        return pd.DataFrame(self.step_log)
+        n = self._log_len
+        if n == 0:
+            return pd.DataFrame()
+
+        rows = self._log_row[:n]
+        actions = self._log_action[:n]
+        action_names = np.full(n, "UNKNOWN", dtype=object)
+        for code, name in ACTION_NAMES.items():
+            action_names[actions == code] = name
+
+        return pd.DataFrame({
+            "timestamp": self.data["timestamp"].take(rows).reset_index(drop=True),
+            "action": action_names,
+            "price": self._close[rows],
+            "portfolio_value": self._log_value[:n],
+            "cash": self._log_cash[:n],
+            "position_qty": self._log_pos[:n],
+            "reward": self._log_reward[:n],
+            "score": self._log_score[:n],
+            "hold_penalty": self._log_holdpen[:n],
+            "sentiment": self._sentiment[rows],
+        })
+
+    @property
+    def equity_curve(self) -> np.ndarray:
+        """
+        Valor del portfolio tras cada paso (float64, columna portfolio_value
+        del log). Es una vista del buffer del episodio: reset() asigna uno
+        nuevo, así que la vista retornada no cambia al reiniciar.
+        """
+        return self._log_value[:self._log_len]
+
+    @property
+    def score_history(self) -> np.ndarray:
+        """Score tras cada paso del episodio (columna score del log)."""
+        return self._log_score[:self._log_len].copy()
+
+    @property
+    def step_log(self) -> list:
+        """Log de pasos como lista de dicts (una entrada por step)."""
+        return self.get_step_log_df().to_dict("records")
 
     def render(self):
         """Imprime estado actual del entorno."""
         if self.current_step >= len(self.data):
             return
 
-        row = self.data.iloc[self.current_step]
-        price = row["close"]
-        value = self.exchange.get_portfolio_value({self.symbol: price})
+        price = self._close[self.current_step]
+        value = self.exchange.get_portfolio_value_at(self.symbol, price)
         summary = self.exchange.get_summary({self.symbol: price})
 
         print(
             f"  Step {self.current_step}/{self.total_steps} | "
-            f"{row['timestamp']} | "
+            f"{self._timestamps[self.current_step]} | "
             f"Price: ${price:,.2f} | "
             f"Portfolio: ${value:.2f} | "
             f"Return: {summary['total_return_pct']:+.1f}%"
@@ -4,12 +4,18 @@ SENTINEL Cortex — Exchange Mock
 Simula un exchange de criptomonedas (Binance) con fees y slippage realistas.
 """
 
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
 from datetime import datetime
 
+import numpy as np
 
-@dataclass
+
+# Cantidad por debajo de la cual una posición se considera cerrada
+OPEN_QTY_EPS = 1e-10
+
+
+@dataclass(slots=True)
 class Fill:
     """Resultado de una operación ejecutada."""
     timestamp: datetime
@@ -21,7 +27,7 @@ class Fill:
     total_cost: float   # Costo total (quantity * price + fee)
 
 
-@dataclass
+@dataclass(slots=True)
 class Position:
     """Posición abierta en un activo."""
     symbol: str
@@ -31,7 +37,7 @@ class Position:
 
     @property
     def is_open(self) -> bool:
-        return self.quantity > 1e-10
+        return self.quantity > OPEN_QTY_EPS
 
     def value_at(self, current_price: float) -> float:
         """Valor de mercado de la posición."""
@@ -44,6 +50,24 @@ class Position:
         return (current_price - self.avg_entry_price) * self.quantity
 
 
+# Lado de cada trade en el buffer (trade_history_array["side_code"])
+BUY_SIDE_CODE = 0
+SELL_SIDE_CODE = 1
+SIDE_NAMES = ("BUY", "SELL")
+
+# Fila del buffer del historial de trades (ver trade_history_array)
+TRADE_DTYPE = np.dtype([
+    ("symbol_id", np.int32),
+    ("side_code", np.int8),
+    ("quantity", np.float64),
+    ("price", np.float64),
+    ("fee", np.float64),
+    ("total_cost", np.float64),
+])
+
+INITIAL_CAPACITY = 64
+
+
 class ExchangeMock:
     """
     Simulador de exchange con fees y slippage realistas.
@@ -51,6 +75,14 @@ class ExchangeMock:
     Simula el comportamiento de Binance:
     - Fee estándar: 0.1% por operación
     - Slippage: 0.05% simulado por impacto de mercado
+
+    Estado en arrays: el historial de trades es un buffer estructurado
+    (TRADE_DTYPE, crece x2 al llenarse) y las posiciones son arrays paralelos
+    indexados por símbolo (`_sym_idx`). `positions` y `trade_history` siguen
+    disponibles como vistas de objetos para el código que las usa.
+
+    Las órdenes sin timestamp usan el último timestamp recibido (reloj de la
+    simulación); datetime.now() solo se consulta si nunca se recibió uno.
     """
 
     def __init__(
@@ -65,16 +97,124 @@ class ExchangeMock:
 
         # Estado
         self.cash: float = initial_capital
-        self.positions: Dict[str, Position] = {}
-        self.trade_history: List[Fill] = []
         self.realized_pnl: float = 0.0
+        self._clock: Optional[datetime] = None
+
+        # Posiciones: símbolo → índice en los arrays _pos_*
+        self._sym_idx: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        self._pos_qty = np.zeros(4)
+        self._pos_cost = np.zeros(4)        # Σ precio × cantidad de lo comprado
+        self._pos_invested = np.zeros(4)
+        self._open_count = 0                # Posiciones con cantidad > OPEN_QTY_EPS
+
+        # Historial de trades: filas válidas hasta _n_trades (timestamps aparte,
+        # son objetos datetime)
+        self._n_trades = 0
+        self._trades = np.empty(INITIAL_CAPACITY, dtype=TRADE_DTYPE)
+        self._trade_ts = np.empty(INITIAL_CAPACITY, dtype=object)
 
     def reset(self):
-        """Reinicia el exchange al estado inicial."""
+        """Reinicia el exchange al estado inicial (conserva la capacidad de los buffers)."""
         self.cash = self.initial_capital
-        self.positions = {}
-        self.trade_history = []
         self.realized_pnl = 0.0
+        self._clock = None
+        self._sym_idx = {}
+        self._symbols = []
+        self._pos_qty[:] = 0.0
+        self._pos_cost[:] = 0.0
+        self._pos_invested[:] = 0.0
+        self._open_count = 0
+        self._n_trades = 0
+
+    # ─── Estado interno ───
+
+    def _symbol_index(self, symbol: str) -> int:
+        """Índice del símbolo en los arrays de posición (lo agrega si es nuevo)."""
+        i = self._sym_idx.get(symbol)
+        if i is None:
+            i = len(self._symbols)
+            if i == len(self._pos_qty):
+                self._pos_qty = _grow(self._pos_qty, 0.0)
+                self._pos_cost = _grow(self._pos_cost, 0.0)
+                self._pos_invested = _grow(self._pos_invested, 0.0)
+            self._sym_idx[symbol] = i
+            self._symbols.append(symbol)
+        return i
+
+    def _timestamp(self, timestamp: Optional[datetime]) -> datetime:
+        """Timestamp de la orden: el recibido, o el último conocido de la simulación."""
+        if timestamp:
+            self._clock = timestamp
+        elif self._clock is None:
+            return datetime.now()
+        return self._clock
+
+    def _record_trade(self, timestamp, symbol_id, side_code, quantity, price, fee, total_cost):
+        n = self._n_trades
+        if n == len(self._trades):
+            self._trades = _grow(self._trades)
+            self._trade_ts = _grow(self._trade_ts)
+        self._trades[n] = (symbol_id, side_code, quantity, price, fee, total_cost)
+        self._trade_ts[n] = timestamp
+        self._n_trades = n + 1
+
+    # ─── Vistas ───
+
+    @property
+    def positions(self) -> Dict[str, Position]:
+        """Posiciones por símbolo (copias; modificar el exchange vía buy/sell)."""
+        return {
+            symbol: Position(
+                symbol=symbol,
+                quantity=float(self._pos_qty[i]),
+                avg_entry_price=self._avg_entry_price(i),
+                total_invested=float(self._pos_invested[i]),
+            )
+            for symbol, i in self._sym_idx.items()
+        }
+
+    def _avg_entry_price(self, i: int) -> float:
+        """Precio promedio de entrada de la posición i (0.0 si está vacía)."""
+        qty = self._pos_qty[i]
+        return float(self._pos_cost[i] / qty) if qty > 0 else 0.0
+
+    def position_qty(self, symbol: str) -> float:
+        """Cantidad en posición del símbolo (0.0 si nunca operó)."""
+        i = self._sym_idx.get(symbol)
+        return 0.0 if i is None else self._pos_qty[i]
+
+    def fills_view(self) -> Iterator[Fill]:
+        """Recorre el historial de trades creando cada Fill recién al pedirlo."""
+        trades, timestamps = self._trades, self._trade_ts
+        for k in range(self._n_trades):
+            row = trades[k]
+            yield Fill(
+                timestamp=timestamps[k],
+                symbol=self._symbols[row["symbol_id"]],
+                side=SIDE_NAMES[row["side_code"]],
+                quantity=row["quantity"],
+                price=row["price"],
+                fee=row["fee"],
+                total_cost=row["total_cost"],
+            )
+
+    @property
+    def trade_history(self) -> List[Fill]:
+        """Historial de trades como lista de Fill (construida a pedido)."""
+        return list(self.fills_view())
+
+    @property
+    def trade_history_array(self) -> np.ndarray:
+        """
+        Historial de trades como array estructurado (TRADE_DTYPE), sin timestamps.
+
+        Es una vista de solo lectura del buffer, sin copia: deja de reflejar
+        el historial tras la próxima orden si el buffer tuvo que crecer.
+        """
+        trades = self._trades[:self._n_trades]
+        trades.flags.writeable = False
+        return trades
 
     def buy(
         self,
@@ -99,7 +239,8 @@ class ExchangeMock:
             return None
 
         # No gastar más de lo que tenemos
-        usd_amount = min(usd_amount, self.cash)
+        cash = self.cash
+        usd_amount = min(usd_amount, cash)
         if usd_amount < 0.01:  # Mínimo $0.01
             return None
 
@@ -114,26 +255,25 @@ class ExchangeMock:
         quantity = effective_usd / execution_price
 
         # Actualizar cash
-        self.cash -= usd_amount
-
-        # Actualizar posición
-        if symbol not in self.positions:
-            self.positions[symbol] = Position(symbol=symbol)
-
-        pos = self.positions[symbol]
-        # Calcular nuevo precio promedio
-        total_qty = pos.quantity + quantity
-        if total_qty > 0:
-            pos.avg_entry_price = (
-                (pos.avg_entry_price * pos.quantity + execution_price * quantity)
-                / total_qty
-            )
-        pos.quantity = total_qty
-        pos.total_invested += effective_usd
+        self.cash = cash - usd_amount
+
+        # Actualizar posición (el precio promedio se deriva de _pos_cost al
+        # leerlo); cada celda de los arrays se lee y escribe una sola vez
+        i = self._symbol_index(symbol)
+        pos_qty = self._pos_qty
+        prev_qty = pos_qty[i]
+        new_qty = prev_qty + quantity
+        pos_qty[i] = new_qty
+        if new_qty > OPEN_QTY_EPS and not prev_qty > OPEN_QTY_EPS:
+            self._open_count += 1
+        self._pos_cost[i] += execution_price * quantity
+        self._pos_invested[i] += effective_usd
 
         # Crear y registrar fill
-        fill = Fill(
-            timestamp=timestamp or datetime.now(),
+        timestamp = self._timestamp(timestamp)
+        self._record_trade(timestamp, i, BUY_SIDE_CODE, quantity, execution_price, fee, usd_amount)
+        return Fill(
+            timestamp=timestamp,
             symbol=symbol,
             side="BUY",
             quantity=quantity,
@@ -141,8 +281,6 @@ class ExchangeMock:
             fee=fee,
             total_cost=usd_amount,
         )
-        self.trade_history.append(fill)
-        return fill
 
     def sell(
         self,
@@ -163,17 +301,20 @@ class ExchangeMock:
         Returns:
             Fill con detalles, o None si no hay posición
         """
-        if symbol not in self.positions or not self.positions[symbol].is_open:
+        i = self._sym_idx.get(symbol)
+        if i is None:
+            return None
+        pos_qty_arr = self._pos_qty
+        pos_qty = pos_qty_arr[i]
+        if not pos_qty > OPEN_QTY_EPS:
             return None
-
-        pos = self.positions[symbol]
 
         # Si no se especifica cantidad, vender todo
         if quantity is None:
-            quantity = pos.quantity
+            quantity = pos_qty
 
-        quantity = min(quantity, pos.quantity)
-        if quantity < 1e-10:
+        quantity = min(quantity, pos_qty)
+        if quantity < OPEN_QTY_EPS:
             return None
 
         # Aplicar slippage (vendemos ligeramente más barato)
@@ -188,8 +329,9 @@ class ExchangeMock:
         # Valor neto
         net_value = gross_value - fee
 
-        # PnL realizado
-        cost_basis = pos.avg_entry_price * quantity
+        # PnL realizado: costo proporcional a la fracción vendida
+        pos_cost = self._pos_cost[i]
+        cost_basis = pos_cost * (quantity / pos_qty)
         trade_pnl = net_value - cost_basis
         self.realized_pnl += trade_pnl
 
@@ -197,14 +339,20 @@ class ExchangeMock:
         self.cash += net_value
 
         # Actualizar posición
-        pos.quantity -= quantity
-        if pos.quantity < 1e-10:
-            pos.quantity = 0.0
-            pos.avg_entry_price = 0.0
-            pos.total_invested = 0.0
-
-        fill = Fill(
-            timestamp=timestamp or datetime.now(),
+        remaining = pos_qty - quantity
+        if remaining < OPEN_QTY_EPS:
+            self._open_count -= 1
+            pos_qty_arr[i] = 0.0
+            self._pos_cost[i] = 0.0
+            self._pos_invested[i] = 0.0
+        else:
+            pos_qty_arr[i] = remaining
+            self._pos_cost[i] = pos_cost - cost_basis
+
+        timestamp = self._timestamp(timestamp)
+        self._record_trade(timestamp, i, SELL_SIDE_CODE, quantity, execution_price, fee, net_value)
+        return Fill(
+            timestamp=timestamp,
             symbol=symbol,
             side="SELL",
             quantity=quantity,
@@ -212,8 +360,21 @@ class ExchangeMock:
             fee=fee,
             total_cost=net_value,
         )
-        self.trade_history.append(fill)
-        return fill
+
+    def _price_vector(self, current_prices: Dict[str, float]):
+        """
+        (cantidades, precios, máscara) alineados con _symbols; la máscara marca
+        posiciones abiertas con precio en `current_prices`.
+        """
+        n = len(self._symbols)
+        qty = self._pos_qty[:n]
+        prices = np.fromiter(
+            (current_prices.get(s, 0.0) for s in self._symbols), dtype=np.float64, count=n
+        )
+        has_price = np.fromiter(
+            (s in current_prices for s in self._symbols), dtype=bool, count=n
+        )
+        return qty, prices, (qty > OPEN_QTY_EPS) & has_price
 
     def get_portfolio_value(self, current_prices: Dict[str, float]) -> float:
         """
@@ -225,19 +386,31 @@ class ExchangeMock:
         Returns:
             Valor total = cash + valor de todas las posiciones
         """
+        if not self._open_count:
+            return self.cash
+        qty, prices, open_mask = self._price_vector(current_prices)
+        return self.cash + float((qty * prices)[open_mask].sum())
+
+    def get_portfolio_value_at(self, symbol: str, price: float) -> float:
+        """
+        get_portfolio_value({symbol: price}) sin armar el dict ni los vectores
+        (camino por paso del entorno, que opera un solo símbolo).
+        """
         total = self.cash
-        for symbol, pos in self.positions.items():
-            if pos.is_open and symbol in current_prices:
-                total += pos.value_at(current_prices[symbol])
+        i = self._sym_idx.get(symbol)
+        if i is not None:
+            qty = self._pos_qty[i]
+            if qty > OPEN_QTY_EPS:
+                total += qty * price
         return total
 
     def get_total_unrealized_pnl(self, current_prices: Dict[str, float]) -> float:
         """PnL no realizado total."""
-        total = 0.0
-        for symbol, pos in self.positions.items():
-            if pos.is_open and symbol in current_prices:
-                total += pos.unrealized_pnl(current_prices[symbol])
-        return total
+        if not self._open_count:
+            return 0.0
+        qty, prices, open_mask = self._price_vector(current_prices)
+        cost = self._pos_cost[:len(qty)]
+        return float((prices * qty - cost)[open_mask].sum())
 
     def get_summary(self, current_prices: Dict[str, float]) -> dict:
         """Resumen del estado del portfolio."""
@@ -252,23 +425,38 @@ class ExchangeMock:
             "unrealized_pnl": round(
                 self.get_total_unrealized_pnl(current_prices), 2
             ),
-            "total_trades": len(self.trade_history),
-            "open_positions": {
-                s: {
-                    "qty": round(p.quantity, 8),
-                    "avg_price": round(p.avg_entry_price, 2),
-                    "current_value": round(
-                        p.value_at(current_prices.get(s, 0)), 2
-                    ),
-                }
-                for s, p in self.positions.items()
-                if p.is_open
-            },
+            "total_trades": self._n_trades,
+            "open_positions": self._open_positions_summary(current_prices),
         }
 
+    def _open_positions_summary(self, current_prices: Dict[str, float]) -> dict:
+        """Detalle de las posiciones abiertas (sin recorrer las cerradas)."""
+        if not self._open_count:
+            return {}
+        open_idx = np.flatnonzero(self._pos_qty[:len(self._symbols)] > OPEN_QTY_EPS)
+        summary = {}
+        for i in open_idx.tolist():
+            symbol = self._symbols[i]
+            qty = float(self._pos_qty[i])
+            summary[symbol] = {
+                "qty": round(qty, 8),
+                "avg_price": round(self._avg_entry_price(i), 2),
+                "current_value": round(qty * current_prices.get(symbol, 0), 2),
+            }
+        return summary
+
     def __repr__(self):
         return (
             f"ExchangeMock(cash=${self.cash:.2f}, "
-            f"positions={len([p for p in self.positions.values() if p.is_open])}, "
-            f"trades={len(self.trade_history)})"
+            f"positions={self._open_count}, "
+            f"trades={self._n_trades})"
         )
+
+
+def _grow(buffer: np.ndarray, fill=None) -> np.ndarray:
+    """Copia `buffer` en uno del doble de tamaño (el resto sin inicializar, o `fill`)."""
+    grown = np.empty(2 * len(buffer), dtype=buffer.dtype)
+    if fill is not None:
+        grown[len(buffer):] = fill
+    grown[:len(buffer)] = buffer
+    return grown
@@ -0,0 +1,205 @@
+"""
+SENTINEL Cortex — Episodio compilado
+═════════════════════════════════════
+Simula episodios completos de TradingEnvironment + ExchangeMock para una
+secuencia de acciones ya materializada (política determinista), con escalares
+float en vez de dicts/Series por paso:
+
+- run_episode: un episodio (TradingEnvironment.run_precomputed_actions)
+- replay_grid: las mismas acciones sobre un grid de hold_penalty_rate ×
+  risk_per_trade_pct (agentes deterministas en el runner de experimentos)
+
+La aritmética sigue el mismo orden de operaciones que step(), así que la curva
+de equity, los PnL y el score coinciden con la simulación paso a paso. Las
+reglas de trading están solo en _simulate.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+HOLD = 0
+BUY = 1
+SELL = 2
+
+# Umbrales de ExchangeMock / TradingEnvironment
+MIN_ORDER_USD = 0.01
+MIN_PENALTY_USD = 0.01
+OPEN_QTY_EPS = 1e-10
+
+
+def _simulate(
+    closes, actions, ref_open, initial_capital, fee_rate, slippage, risk_pct, hold_penalty_rate,
+    equity, scores, sell_pnl,
+):
+    """
+    Reglas de trading de step() para una celda: ejecuta `actions` sobre
+    `closes` desde una cuenta nueva y escribe cada paso en `equity`,
+    `scores` y `sell_pnl` (NaN previo si no hubo venta).
+
+    Si `ref_open` no está vacío (replay), se detiene en el primer paso en que
+    la posición abierta no coincide con la de la corrida de referencia.
+
+    Returns:
+        (score final, total_hold_penalty, pasos simulados)
+    """
+    n_steps = actions.shape[0]
+    check_open = ref_open.shape[0] > 0
+
+    cash = initial_capital
+    qty = 0.0
+    score = 1000.0
+    total_penalty = 0.0
+
+    for t in range(n_steps):
+        if check_open and (qty > 0.0) != ref_open[t]:
+            return score, total_penalty, t
+
+        price = closes[t]
+        prev_value = cash
+        if qty > OPEN_QTY_EPS:
+            prev_value += qty * price
+
+        action = actions[t]
+        hold_penalty = 0.0
+        if action == HOLD:
+            penalty = cash * hold_penalty_rate
+            if penalty > MIN_PENALTY_USD:
+                cash -= penalty
+                total_penalty += penalty
+                hold_penalty = penalty
+        elif action == BUY:
+            usd_amount = prev_value * risk_pct
+            if usd_amount > 0:
+                usd_amount = min(usd_amount, cash)
+                if usd_amount >= MIN_ORDER_USD:
+                    execution_price = price * (1 + slippage)
+                    fee = usd_amount * fee_rate
+                    quantity = (usd_amount - fee) / execution_price
+                    cash -= usd_amount
+                    qty += quantity
+        elif action == SELL:
+            if qty > OPEN_QTY_EPS:
+                quantity = qty
+                execution_price = price * (1 - slippage)
+                gross_value = quantity * execution_price
+                net_value = gross_value - gross_value * fee_rate
+                cash += net_value
+                qty -= quantity
+                if qty < OPEN_QTY_EPS:
+                    qty = 0.0
+                sell_pnl[t] = net_value - quantity * execution_price
+
+        current_value = cash
+        if qty > OPEN_QTY_EPS:
+            current_value += qty * price
+        equity[t] = current_value
+
+        reward = (current_value - prev_value) / prev_value if prev_value > 0 else 0.0
+        if reward > 0:
+            score += reward * 100
+        elif reward < 0:
+            score += reward * 150
+        if hold_penalty > 0:
+            score -= (hold_penalty / initial_capital) * 50
+        score = max(0.0, min(1000.0, score))
+        scores[t] = score
+
+    return score, total_penalty, n_steps
+
+
+# Los kernels exportados llaman a _simulate por el nombre global: compilado
+# con Numba (y dentro del módulo AOT) o en Python si no está instalado
+if HAS_NUMBA:
+    _simulate = njit(cache=True, error_model="numpy")(_simulate)
+
+
+def _run_episode(closes, actions, initial_capital, fee_rate, slippage, risk_pct, hold_penalty_rate):
+    """
+    Ejecuta `actions` sobre `closes` desde una cuenta nueva.
+
+    Args:
+        closes: Precio de cierre de cada paso ejecutado (T,)
+        actions: Acción de cada paso, 0=HOLD 1=BUY 2=SELL (T,)
+
+    Returns:
+        (equity (T,), score tras cada paso (T,), sell_pnl (T,) con NaN si no
+         hubo venta, total_hold_penalty)
+    """
+    n_steps = actions.shape[0]
+    equity = np.empty(n_steps)
+    scores = np.empty(n_steps)
+    sell_pnl = np.full(n_steps, np.nan)
+    _, total_penalty, _ = _simulate(
+        closes, actions, np.empty(0, dtype=np.bool_), initial_capital, fee_rate, slippage,
+        risk_pct, hold_penalty_rate, equity, scores, sell_pnl,
+    )
+    return equity, scores, sell_pnl, total_penalty
+
+
+def _replay_grid(closes, actions, ref_open, hps, rpts, fee_rate, slippage, initial_capital):
+    """
+    Reproduce `actions` para cada celda (hps[k], rpts[k]).
+
+    Args:
+        closes: Precio de cierre de cada paso ejecutado (T,)
+        actions: Acción tomada en cada paso (T,)
+        ref_open: Si el agente veía posición abierta (> 0) en cada paso (T,)
+        hps, rpts: hold_penalty_rate y risk_per_trade_pct por celda (K,)
+
+    Returns:
+        (equity (K, T), sell_pnl (K, T) con NaN si no hubo venta,
+         score final (K,), total_hold_penalty (K,), valid (K,))
+
+        valid[k] es False si en esa celda la posición abierta/cerrada diverge
+        de la corrida de referencia (p. ej. una compra sin fondos): las
+        decisiones del agente ya no serían las mismas y la celda debe
+        simularse completa.
+    """
+    n_cells = hps.shape[0]
+    n_steps = actions.shape[0]
+    equity = np.empty((n_cells, n_steps))
+    sell_pnl = np.full((n_cells, n_steps), np.nan)
+    step_scores = np.empty(n_steps)  # Solo interesa el score final de cada celda
+    scores = np.empty(n_cells)
+    total_penalties = np.empty(n_cells)
+    valid = np.ones(n_cells, dtype=np.bool_)
+
+    for k in range(n_cells):
+        score, total_penalty, done = _simulate(
+            closes, actions, ref_open, initial_capital, fee_rate, slippage, rpts[k], hps[k],
+            equity[k], step_scores, sell_pnl[k],
+        )
+        valid[k] = done == n_steps
+        scores[k] = score
+        total_penalties[k] = total_penalty
+
+    return equity, sell_pnl, scores, total_penalties, valid
+
+
+# Firmas para la compilación AOT (cortex/_fastkernels_build.py)
+RUN_EPISODE_SIGNATURE = (
+    "Tuple((f8[:], f8[:], f8[:], f8))"
+    "(f8[:], i8[:], f8, f8, f8, f8, f8)"
+)
+REPLAY_GRID_SIGNATURE = (
+    "Tuple((f8[:,:], f8[:,:], f8[:], f8[:], b1[:]))"
+    "(f8[:], i8[:], b1[:], f8[:], f8[:], f8, f8, f8)"
+)
+
+# Orden de preferencia: módulo AOT compilado > Numba JIT (cache en disco) > Python.
+# Sin parallel=True: el runner ya reparte grupos entre procesos (fork) y la
+# capa de threads de Numba no es segura tras un fork.
+try:
+    from cortex._fastkernels import replay_grid, run_episode
+except ImportError:
+    if HAS_NUMBA:
+        run_episode = njit(cache=True, error_model="numpy")(_run_episode)
+        replay_grid = njit(cache=True, error_model="numpy")(_replay_grid)
+    else:
+        run_episode = _run_episode
+        replay_grid = _replay_grid
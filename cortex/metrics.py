@@ -9,6 +9,226 @@ import pandas as pd
 from dataclasses import dataclass
 from typing import List, Optional
 
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+def _max_drawdown_loop(values):
+    """(max drawdown como fracción, duración en pasos) de una curva float64."""
+    peak = values[0]
+    max_dd = 0.0
+    max_dd_duration = 0
+    current_dd_start = 0
+
+    for i in range(values.shape[0]):
+        val = values[i]
+        if val >= peak:
+            peak = val
+            current_dd_start = i
+        else:
+            dd = (peak - val) / peak
+            if dd > max_dd:
+                max_dd = dd
+                max_dd_duration = i - current_dd_start
+
+    return max_dd, max_dd_duration
+
+
+def _max_drawdown_numpy(values):
+    """
+    Igual que _max_drawdown_loop con operaciones vectorizadas: pico acumulado,
+    drawdown por punto y el último nuevo pico antes del peor drawdown.
+    """
+    if values.shape[0] == 0 or values[0] != values[0]:
+        return 0.0, 0  # Con el primer valor NaN el bucle nunca fija un pico
+    peaks = np.fmax.accumulate(values)  # Un NaN no reemplaza el pico
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dd = (peaks - values) / peaks
+    dd[~(values < peaks)] = 0.0
+    i_end = int(np.nanargmax(dd))  # Primera ocurrencia, como `dd > max_dd`
+    max_dd = float(dd[i_end])
+    if not max_dd > 0:
+        return 0.0, 0
+    new_peak = values >= np.concatenate((values[:1], peaks[:-1]))
+    i_start = i_end - int(np.argmax(new_peak[i_end::-1]))
+    return max_dd, i_end - i_start
+
+
+# Sin Numba, el bucle en Python solo conviene en curvas cortas: la forma
+# vectorizada gana desde ~150 puntos (compilado, el bucle gana en todo tamaño)
+NUMPY_DRAWDOWN_MIN_LEN = 128
+
+
+def _max_drawdown(values):
+    """Sin Numba elige bucle o forma vectorizada según el largo de la curva."""
+    if values.shape[0] < NUMPY_DRAWDOWN_MIN_LEN:
+        return _max_drawdown_loop(values)
+    return _max_drawdown_numpy(values)
+
+
+# Términos que suma _returns_sum sobre r_i = (v[i+1] - v[i]) / v[i]
+_RET = 0             # r_i
+_RET_SQDEV = 1       # (r_i - a)²
+_EXCESS = 2          # r_i - rf
+_EXCESS_SQDEV = 3    # (r_i - rf - a)²
+
+
+def _returns_term(values, i, kind, a, rf):
+    r = (values[i + 1] - values[i]) / values[i]
+    if kind == _RET:
+        return r
+    if kind == _RET_SQDEV:
+        d = r - a
+        return d * d
+    e = r - rf
+    if kind == _EXCESS:
+        return e
+    d = e - a
+    return d * d
+
+
+def _returns_sum(values, start, n, kind, a, rf):
+    """
+    Suma de n términos de retorno desde `start`, sin materializar el array de
+    retornos y con el mismo orden de operaciones que np.sum (suma por pares:
+    8 acumuladores, bloques de 128), así que coincide bit a bit con NumPy.
+    """
+    if n < 8:
+        res = 0.0
+        for i in range(start, start + n):
+            res += _returns_term(values, i, kind, a, rf)
+        return res
+    if n <= 128:
+        r0 = _returns_term(values, start, kind, a, rf)
+        r1 = _returns_term(values, start + 1, kind, a, rf)
+        r2 = _returns_term(values, start + 2, kind, a, rf)
+        r3 = _returns_term(values, start + 3, kind, a, rf)
+        r4 = _returns_term(values, start + 4, kind, a, rf)
+        r5 = _returns_term(values, start + 5, kind, a, rf)
+        r6 = _returns_term(values, start + 6, kind, a, rf)
+        r7 = _returns_term(values, start + 7, kind, a, rf)
+        i = 8
+        while i < n - (n % 8):
+            k = start + i
+            r0 += _returns_term(values, k, kind, a, rf)
+            r1 += _returns_term(values, k + 1, kind, a, rf)
+            r2 += _returns_term(values, k + 2, kind, a, rf)
+            r3 += _returns_term(values, k + 3, kind, a, rf)
+            r4 += _returns_term(values, k + 4, kind, a, rf)
+            r5 += _returns_term(values, k + 5, kind, a, rf)
+            r6 += _returns_term(values, k + 6, kind, a, rf)
+            r7 += _returns_term(values, k + 7, kind, a, rf)
+            i += 8
+        res = ((r0 + r1) + (r2 + r3)) + ((r4 + r5) + (r6 + r7))
+        while i < n:
+            res += _returns_term(values, start + i, kind, a, rf)
+            i += 1
+        return res
+    n2 = n // 2
+    n2 -= n2 % 8
+    return _returns_sum(values, start, n2, kind, a, rf) + _returns_sum(values, start + n2, n - n2, kind, a, rf)
+
+
+def _sharpe_loop(values, daily_rf, periods_per_year):
+    """
+    Sharpe anualizado de una curva (al menos 3 puntos), igual a
+    mean(excess) / std(excess) * sqrt(periods) con np.mean/np.std (ddof=0);
+    0.0 si los retornos tienen desviación nula.
+    """
+    n = values.shape[0] - 1
+    mean_ret = _returns_sum(values, 0, n, _RET, 0.0, 0.0) / n
+    if np.sqrt(_returns_sum(values, 0, n, _RET_SQDEV, mean_ret, 0.0) / n) == 0:
+        return 0.0
+    mean_excess = _returns_sum(values, 0, n, _EXCESS, 0.0, daily_rf) / n
+    std_excess = np.sqrt(_returns_sum(values, 0, n, _EXCESS_SQDEV, mean_excess, daily_rf) / n)
+    return (mean_excess / std_excess) * np.sqrt(periods_per_year)
+
+
+def _sharpe_numpy(values, daily_rf, periods_per_year):
+    """Igual que _sharpe_loop con los arrays de retornos de NumPy."""
+    returns = np.diff(values) / values[:-1]
+    if np.std(returns) == 0:
+        return 0.0
+    excess_returns = returns - daily_rf
+    return (np.mean(excess_returns) / np.std(excess_returns)) * np.sqrt(periods_per_year)
+
+
+# Sin Numba los kernels de retornos serían bucles en Python (cientos de veces
+# más lentos que NumPy): se usan solo compilados
+_sharpe = _sharpe_numpy
+
+
+def _equity_metrics(values, daily_rf, periods_per_year):
+    """
+    (sharpe, max drawdown como fracción, duración en pasos) de una curva en
+    una sola llamada (compilada con Numba; si no, Sharpe y drawdown con
+    NumPy); mismos casos borde que sharpe_ratio y max_drawdown.
+    """
+    n = values.shape[0]
+    sharpe = _sharpe(values, daily_rf, periods_per_year) if n >= 3 else 0.0
+    if n < 2:
+        return sharpe, 0.0, 0
+    max_dd, max_dd_duration = _max_drawdown(values)
+    return sharpe, max_dd, max_dd_duration
+
+
+def _trade_stats_loop(pnls):
+    """
+    (ganadores, perdedores, ganancia bruta, pérdida neta) de una lista de PnL.
+    Las sumas son secuenciales (igual que sum()); un NaN no cuenta en ninguno.
+    """
+    n_wins = 0
+    n_losses = 0
+    gross_profit = 0.0
+    net_loss = -0.0  # Neutro de la suma: un único PnL de -0.0 se conserva
+    for i in range(pnls.shape[0]):
+        pnl = pnls[i]
+        if pnl > 0:
+            n_wins += 1
+            gross_profit += pnl
+        elif pnl <= 0:
+            n_losses += 1
+            net_loss += pnl
+    return n_wins, n_losses, gross_profit, net_loss
+
+
+def _trade_stats_numpy(pnls):
+    """
+    Igual que _trade_stats_loop con máscaras. cumsum acumula en orden, igual
+    que sum() (np.sum suma por pares y puede diferir en el último bit).
+    """
+    win_mask = pnls > 0
+    loss_mask = pnls <= 0  # No ~win_mask: un NaN no cuenta como pérdida
+    n_wins = int(win_mask.sum())
+    n_losses = int(loss_mask.sum())
+    gross_profit = np.cumsum(pnls[win_mask])[-1] if n_wins else 0.0
+    net_loss = np.cumsum(pnls[loss_mask])[-1] if n_losses else -0.0
+    return n_wins, n_losses, gross_profit, net_loss
+
+
+_trade_stats = _trade_stats_numpy
+
+
+# Firma fija de los kernels de retornos: con `kind` tipado como literal Numba
+# genera una especialización por constante, y la recursión de _returns_sum
+# sobre varias versiones cacheadas rompe la carga desde disco
+_RETURNS_TERM_SIGNATURE = "f8(f8[::1], i8, i8, f8, f8)"
+_RETURNS_SUM_SIGNATURE = "f8(f8[::1], i8, i8, i8, f8, f8)"
+
+# Numba JIT (cache en disco) si está disponible; si no, Sharpe y trades con
+# NumPy y _max_drawdown elige la forma vectorizada en curvas largas. Los
+# kernels se llaman entre sí por el nombre global.
+if HAS_NUMBA:
+    _max_drawdown = njit(cache=True, error_model="numpy")(_max_drawdown_loop)
+    _returns_term = njit(_RETURNS_TERM_SIGNATURE, cache=True, error_model="numpy")(_returns_term)
+    _returns_sum = njit(_RETURNS_SUM_SIGNATURE, cache=True, error_model="numpy")(_returns_sum)
+    _sharpe = njit(cache=True, error_model="numpy")(_sharpe_loop)
+    _equity_metrics = njit(cache=True, error_model="numpy")(_equity_metrics)
+    _trade_stats = njit(cache=True, error_model="numpy")(_trade_stats_loop)
+
 
 @dataclass
 class BacktestResult:
@@ -38,7 +258,7 @@ class BacktestResult:
     avg_loss: float
 
     # Datos completos
-    equity_curve: Optional[List[float]] = None
+    equity_curve: Optional[np.ndarray] = None
     trade_log: Optional[pd.DataFrame] = None
 
     def __repr__(self):
@@ -85,7 +305,7 @@ class MetricsEngine:
     @staticmethod
     def calculate_returns(equity_curve: List[float]) -> np.ndarray:
         """Calcula retornos porcentuales diarios."""
-        values = np.array(equity_curve)
+        values = np.asarray(equity_curve, dtype=np.float64)
         if len(values) < 2:
             return np.array([0.0])
         returns = np.diff(values) / values[:-1]
@@ -98,16 +318,15 @@ class MetricsEngine:
 
         Sharpe = (mean_return - risk_free_daily) / std_return * sqrt(365)
         """
-        returns = cls.calculate_returns(equity_curve)
-        if len(returns) < 2 or np.std(returns) == 0:
+        # Los kernels de retornos tienen firma fija (contiguo y escribible)
+        values = np.require(equity_curve, dtype=np.float64, requirements=("C", "W"))
+        if len(values) < 3:  # Menos de 2 retornos
             return 0.0
 
+        # Kernel fusionado: mismas operaciones que calculate_returns + np.mean
+        # + np.std, sin arrays intermedios
         daily_rf = cls.RISK_FREE_RATE / cls.TRADING_DAYS_PER_YEAR
-        excess_returns = returns - daily_rf
-        sharpe = (np.mean(excess_returns) / np.std(excess_returns)) * np.sqrt(
-            cls.TRADING_DAYS_PER_YEAR
-        )
-        return float(sharpe)
+        return float(_sharpe(values, daily_rf, float(cls.TRADING_DAYS_PER_YEAR)))
 
     @staticmethod
     def max_drawdown(equity_curve: List[float]) -> tuple:
@@ -117,28 +336,12 @@ class MetricsEngine:
         Returns:
             (max_dd_pct, duration_days)
         """
-        values = np.array(equity_curve)
+        values = np.ascontiguousarray(equity_curve, dtype=np.float64)
         if len(values) < 2:
             return 0.0, 0
 
-        peak = values[0]
-        max_dd = 0.0
-        dd_start = 0
-        max_dd_duration = 0
-        current_dd_start = 0
-
-        for i, val in enumerate(values):
-            if val >= peak:
-                peak = val
-                current_dd_start = i
-            else:
-                dd = (peak - val) / peak
-                if dd > max_dd:
-                    max_dd = dd
-                    dd_start = current_dd_start
-                    max_dd_duration = i - current_dd_start
-
-        return float(max_dd * 100), max_dd_duration  # En porcentaje
+        max_dd, max_dd_duration = _max_drawdown(values)
+        return float(max_dd * 100), int(max_dd_duration)  # En porcentaje
 
     @staticmethod
     def analyze_trades(trade_pnls: List[float]) -> dict:
@@ -151,7 +354,7 @@ class MetricsEngine:
         Returns:
             Dict con métricas de trades
         """
-        if not trade_pnls:
+        if len(trade_pnls) == 0:
             return {
                 "total_trades": 0,
                 "winning_trades": 0,
@@ -162,20 +365,20 @@ class MetricsEngine:
                 "avg_loss": 0.0,
             }
 
-        wins = [p for p in trade_pnls if p > 0]
-        losses = [p for p in trade_pnls if p <= 0]
-
-        gross_profit = sum(wins) if wins else 0.0
-        gross_loss = abs(sum(losses)) if losses else 0.0
+        pnls = np.asarray(trade_pnls, dtype=np.float64)
+        n_wins, n_losses, gross_profit, net_loss = _trade_stats(pnls)
+        gross_profit = float(gross_profit)
+        net_loss = float(net_loss)
+        gross_loss = abs(net_loss)
 
         return {
-            "total_trades": len(trade_pnls),
-            "winning_trades": len(wins),
-            "losing_trades": len(losses),
-            "win_rate": (len(wins) / len(trade_pnls) * 100) if trade_pnls else 0.0,
+            "total_trades": len(pnls),
+            "winning_trades": n_wins,
+            "losing_trades": n_losses,
+            "win_rate": n_wins / len(pnls) * 100,
             "profit_factor": (gross_profit / gross_loss) if gross_loss > 0 else float("inf"),
-            "avg_win": (sum(wins) / len(wins)) if wins else 0.0,
-            "avg_loss": (sum(losses) / len(losses)) if losses else 0.0,
+            "avg_win": (gross_profit / n_wins) if n_wins else 0.0,
+            "avg_loss": (net_loss / n_losses) if n_losses else 0.0,
         }
 
     @classmethod
@@ -199,19 +402,28 @@ class MetricsEngine:
             start_date: Fecha inicio
             end_date: Fecha fin
             initial_capital: Capital inicial
-            equity_curve: Lista de valores del portfolio por timestamp
+            equity_curve: Valores del portfolio por timestamp
+                (np.ndarray[float64], como env.equity_curve, se usa sin
+                copiarlo; también acepta listas)
             trade_pnls: Lista de PnL por trade round-trip
             trade_log: DataFrame con detalles de cada trade
 
         Returns:
             BacktestResult con todas las métricas
         """
-        final_value = equity_curve[-1] if equity_curve else initial_capital
+        final_value = float(equity_curve[-1]) if len(equity_curve) else initial_capital
         total_pnl = final_value - initial_capital
         total_return_pct = (total_pnl / initial_capital) * 100
 
-        sharpe = cls.sharpe_ratio(equity_curve)
-        max_dd_pct, max_dd_duration = cls.max_drawdown(equity_curve)
+        # Sharpe y drawdown sobre una sola conversión de la curva, en una
+        # llamada compilada (mismos valores que sharpe_ratio / max_drawdown)
+        values = np.require(equity_curve, dtype=np.float64, requirements=("C", "W"))
+        daily_rf = cls.RISK_FREE_RATE / cls.TRADING_DAYS_PER_YEAR
+        sharpe, max_dd, max_dd_duration = _equity_metrics(
+            values, daily_rf, float(cls.TRADING_DAYS_PER_YEAR)
+        )
+        sharpe = float(sharpe)
+        max_dd_pct, max_dd_duration = float(max_dd * 100), int(max_dd_duration)
         trade_stats = cls.analyze_trades(trade_pnls)
 
         return BacktestResult(
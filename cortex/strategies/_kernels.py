@@ -0,0 +1,150 @@
+"""
+SENTINEL — Kernels Numba de las estrategias
+════════════════════════════════════════════
+Cálculos por paso sobre ventanas cortas (decenas de velas), donde el costo de
+despachar varias llamadas NumPy pequeñas supera al de la aritmética.
+
+Las sumas replican la suma por pares de NumPy (bloques de 8 acumuladores), así
+que las medias coinciden bit a bit con np.mean y las decisiones no cambian.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+# Tamaño de bloque de la suma por pares de NumPy (PW_BLOCKSIZE)
+PAIRWISE_BLOCKSIZE = 128
+
+
+def _block_sum(a, start, n):
+    """Suma de un bloque de hasta PAIRWISE_BLOCKSIZE elementos (hoja de np.sum)."""
+    if n < 8:
+        res = 0.0
+        for i in range(start, start + n):
+            res += a[i]
+        return res
+    r0 = a[start]
+    r1 = a[start + 1]
+    r2 = a[start + 2]
+    r3 = a[start + 3]
+    r4 = a[start + 4]
+    r5 = a[start + 5]
+    r6 = a[start + 6]
+    r7 = a[start + 7]
+    i = 8
+    while i < n - (n % 8):
+        r0 += a[start + i]
+        r1 += a[start + i + 1]
+        r2 += a[start + i + 2]
+        r3 += a[start + i + 3]
+        r4 += a[start + i + 4]
+        r5 += a[start + i + 5]
+        r6 += a[start + i + 6]
+        r7 += a[start + i + 7]
+        i += 8
+    res = ((r0 + r1) + (r2 + r3)) + ((r4 + r5) + (r6 + r7))
+    while i < n:
+        res += a[start + i]
+        i += 1
+    return res
+
+
+def _pairwise_sum(a, start, n):
+    """
+    Suma de a[start:start + n] con el mismo orden de operaciones que np.sum.
+
+    La partición recursiva de NumPy se recorre con una pila explícita: Numba
+    no carga de forma fiable desde la cache funciones recursivas con varias
+    especializaciones (ventanas contiguas, con stride, de solo lectura).
+    """
+    if n <= PAIRWISE_BLOCKSIZE:
+        return _block_sum(a, start, n)
+
+    # Marcos pendientes: (inicio, tamaño, etapa, suma de la mitad izquierda)
+    # etapa 0 = sin expandir, 1 = esperando la izquierda, 2 = esperando la derecha
+    frame_start = np.empty(64, np.int64)
+    frame_n = np.empty(64, np.int64)
+    frame_stage = np.zeros(64, np.int64)
+    frame_left = np.empty(64)
+    frame_start[0] = start
+    frame_n[0] = n
+    top = 0
+    while True:
+        s = frame_start[top]
+        m = frame_n[top]
+        if m <= PAIRWISE_BLOCKSIZE:
+            value = _block_sum(a, s, m)
+            top -= 1
+        else:
+            half = m // 2
+            half -= half % 8
+            frame_stage[top] = 1
+            top += 1
+            frame_start[top] = s
+            frame_n[top] = half
+            frame_stage[top] = 0
+            continue
+
+        # Propagar el resultado hacia los marcos padre
+        while True:
+            if top < 0:
+                return value
+            half = frame_n[top] // 2
+            half -= half % 8
+            if frame_stage[top] == 1:
+                frame_left[top] = value
+                frame_stage[top] = 2
+                top += 1
+                frame_start[top] = frame_start[top - 1] + half
+                frame_n[top] = frame_n[top - 1] - half
+                frame_stage[top] = 0
+                break
+            value = frame_left[top] + value
+            top -= 1
+
+
+def _window_mean(a, start, stop):
+    """Media de a[start:stop] (igual a np.mean)."""
+    return _pairwise_sum(a, start, stop - start) / (stop - start)
+
+
+def _rolling_mean(a, period):
+    """out[i] = media de a[i:i + period] (igual a np.mean de cada ventana)."""
+    n = a.shape[0] - period + 1
+    out = np.empty(max(n, 0))
+    for i in range(n):
+        out[i] = _pairwise_sum(a, i, period) / period
+    return out
+
+
+def _spike_stats(closes, volumes):
+    """
+    (cambio % del último cierre, volumen actual / promedio de los 19 previos)
+    de ContrarianStrategy._detect_spike. Requiere al menos 2 velas.
+    """
+    n = closes.shape[0]
+    pct_change = (closes[n - 1] - closes[n - 2]) / closes[n - 2]
+
+    m = volumes.shape[0]
+    start = m - 20 if m > 20 else 0
+    avg_volume = _window_mean(volumes, start, m - 1)
+    volume_ratio = volumes[m - 1] / avg_volume if avg_volume > 0 else 1.0
+    return pct_change, volume_ratio
+
+
+# Con Numba se compilan en el lugar (los kernels se llaman entre sí por el
+# nombre global); sin Numba quedan como funciones Python equivalentes
+if HAS_NUMBA:
+    _block_sum = njit(cache=True, error_model="numpy")(_block_sum)
+    _pairwise_sum = njit(cache=True, error_model="numpy")(_pairwise_sum)
+    _window_mean = njit(cache=True, error_model="numpy")(_window_mean)
+    _rolling_mean = njit(cache=True, error_model="numpy")(_rolling_mean)
+    _spike_stats = njit(cache=True, error_model="numpy")(_spike_stats)
+
+window_mean = _window_mean
+rolling_mean = _rolling_mean
+spike_stats = _spike_stats
@@ -7,8 +7,12 @@ Hipótesis: Las noticias falsas o exageradas causan spikes que se revierten.
 Mecánica: Detectar spike → Verificar manipulación → Operar INVERSO a la masa.
 """
 
+from typing import Optional
+
 import numpy as np
 from cortex.agents.base_agent import BaseAgent
+from cortex.gym.environment import Observation
+from cortex.strategies._kernels import rolling_mean, spike_stats
 
 HOLD = 0
 BUY = 1
@@ -47,7 +51,7 @@ class ContrarianStrategy(BaseAgent):
         self._reasoning = ""
         self._position_direction = None  # "contrarian_long" o "contrarian_short"
 
-    def decide(self, observation: dict) -> int:
+    def decide(self, observation: Observation) -> int:
         self._step_count += 1
 
         prices = observation.get("prices")
@@ -129,23 +133,90 @@ class ContrarianStrategy(BaseAgent):
 
         return HOLD
 
+    def decide_batch(self, env) -> Optional[np.ndarray]:
+        """
+        Acciones que tomaría decide() en cada paso de `env` desde reset(),
+        calculadas de una vez.
+
+        Parte del estado de reset() y asume que cada BUY abre posición y cada
+        SELL la cierra; quien reproduzca las acciones debe verificar que la
+        posición del entorno coincida (una compra puede fallar sin fondos).
+        No modifica el estado del agente.
+        """
+        data = env.data
+        window = env.window_size
+        n_steps = max(0, len(data) - 1 - window)
+        actions = np.zeros(n_steps, dtype=np.int8)
+        if n_steps == 0 or window < 10:
+            return actions  # "Datos insuficientes" en todos los pasos
+
+        idx = np.arange(window, window + n_steps)
+        all_closes = data["close"].to_numpy(dtype=float)
+        all_volumes = data["volume"].to_numpy(dtype=float)
+        closes = all_closes[idx]
+        if "sentiment_score" in data.columns:
+            sentiment = data["sentiment_score"].to_numpy(dtype=float)[idx]
+        else:
+            sentiment = np.zeros(n_steps)
+
+        # _detect_spike sobre la ventana data[idx - window:idx] de cada paso:
+        # cambio de la última vela y volumen vs el promedio de las previas
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct_change = (all_closes[idx - 1] - all_closes[idx - 2]) / all_closes[idx - 2]
+            n_avg = min(19, window - 1)
+            avg_volume = rolling_mean(all_volumes, n_avg)[idx - 1 - n_avg]
+            volume_ratio = np.where(avg_volume > 0, all_volumes[idx - 1] / avg_volume, 1.0)
+        spike = (np.abs(pct_change) >= self.price_spike_threshold) & (
+            volume_ratio >= self.volume_multiplier
+        )
+        # _assess_manipulation
+        manipulation = (
+            ((pct_change > 0) & (sentiment > self.sentiment_extreme))
+            | ((pct_change < 0) & (sentiment < -self.sentiment_extreme))
+            | (volume_ratio > self.volume_multiplier * 2)
+        )
+        # Solo un dump (no pump) abre posición
+        entry = spike & manipulation & ~(pct_change > 0)
+
+        # Stop-loss / salida por tiempo / take-profit dependen de la entrada:
+        # recorrido escalar
+        has_position = False
+        entry_price = 0.0
+        hold_counter = 0
+        for t, (price, enter) in enumerate(zip(closes.tolist(), entry.tolist())):
+            if has_position:
+                hold_counter += 1
+                pnl_pct = (price - entry_price) / entry_price
+                if (
+                    pnl_pct <= -self.stop_loss_pct
+                    or hold_counter >= self.max_hold_periods
+                    or pnl_pct >= self.price_spike_threshold
+                ):
+                    actions[t] = SELL
+                    has_position = False
+            elif enter:
+                actions[t] = BUY
+                has_position = True
+                entry_price = price
+                hold_counter = 0
+
+        return actions
+
     def _detect_spike(self, closes: np.ndarray, volumes: np.ndarray) -> tuple:
         """Detecta spikes de precio anormales."""
         if len(closes) < 5:
             return False, {}
 
-        # Cambio de precio en último periodo
-        pct_change = (closes[-1] - closes[-2]) / closes[-2]
-
-        # Volumen promedio (últimos 20 periodos, excluyendo el actual)
-        avg_volume = np.mean(volumes[-20:-1]) if len(volumes) > 20 else np.mean(volumes[:-1])
-        current_volume = volumes[-1]
-        volume_ratio = current_volume / avg_volume if avg_volume > 0 else 1.0
+        # Cambio de precio en último periodo y volumen actual vs promedio de
+        # los últimos 20 periodos (excluyendo el actual), en un kernel Numba
+        pct_change, volume_ratio = spike_stats(closes, volumes)
 
         is_spike = (
             abs(pct_change) >= self.price_spike_threshold
             and volume_ratio >= self.volume_multiplier
         )
+        if not is_spike:
+            return False, {}
 
         info = {
             "pct_change": pct_change,
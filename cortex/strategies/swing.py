@@ -4,7 +4,12 @@ SENTINEL Cortex — Swing Strategy
 Estrategia de Swing Trading: opera en marcos temporales de horas/días.
 """
 
+from typing import Optional
+
+import numpy as np
 from cortex.agents.base_agent import BaseAgent
+from cortex.gym.environment import Observation
+from cortex.strategies._kernels import rolling_mean, window_mean
 
 HOLD = 0
 BUY = 1
@@ -36,8 +41,10 @@ class SwingStrategy(BaseAgent):
         self.sentiment_threshold = sentiment_threshold
         self._entry_price = 0.0
         self._reasoning = ""
+        # SMA precomputada por el entorno para cada paso (si está presente)
+        self._sma_key = f"sma{sma_period}"
 
-    def decide(self, observation: dict) -> int:
+    def decide(self, observation: Observation) -> int:
         self._step_count += 1
 
         prices = observation.get("prices")
@@ -49,9 +56,12 @@ class SwingStrategy(BaseAgent):
         position = observation.get("position", 0.0)
         has_position = position > 0
         sentiment = observation.get("sentiment", 0.0)
-        closes = prices[:, 3]
 
-        sma = float(closes[-self.sma_period:].mean())
+        sma = observation.get(self._sma_key)
+        if sma is None:
+            closes = prices[:, 3]
+            sma = window_mean(closes, len(closes) - self.sma_period, len(closes))
+        sma = float(sma)
 
         # --- Si tenemos posición: verificar stop-loss / take-profit ---
         if has_position and self._entry_price > 0:
@@ -93,6 +103,57 @@ class SwingStrategy(BaseAgent):
         self._reasoning = f"HOLD | Price=${current_price:.0f} | SMA20=${sma:.0f} | Sent={sentiment:.2f}"
         return HOLD
 
+    def decide_batch(self, env) -> Optional[np.ndarray]:
+        """
+        Acciones que tomaría decide() en cada paso de `env` desde reset(),
+        calculadas de una vez.
+
+        Parte del estado de reset() y asume que cada BUY abre posición y cada
+        SELL la cierra; quien reproduzca las acciones debe verificar que la
+        posición del entorno coincida (una compra puede fallar sin fondos).
+        No modifica el estado del agente.
+        """
+        data = env.data
+        start = env.window_size
+        n_steps = max(0, len(data) - 1 - start)
+        actions = np.zeros(n_steps, dtype=np.int8)
+        if n_steps == 0 or env.window_size < self.sma_period:
+            return actions  # "Datos insuficientes" en todos los pasos
+
+        idx = np.arange(start, start + n_steps)
+        all_closes = data["close"].to_numpy(dtype=float)
+        closes = all_closes[idx]
+        if "sentiment_score" in data.columns:
+            sentiment = data["sentiment_score"].to_numpy(dtype=float)[idx]
+        else:
+            sentiment = np.zeros(n_steps)
+        # SMA de las sma_period velas previas (la ventana no incluye el precio actual)
+        sma = rolling_mean(all_closes, self.sma_period)[idx - self.sma_period]
+
+        # Condiciones que no dependen de la posición, en bloque
+        below_sma = closes < sma * 0.98
+        trend_entry = (closes > sma) & (sentiment >= self.sentiment_threshold)
+        bounce_entry = (0.98 * sma <= closes) & (closes <= 1.01 * sma) & (sentiment > 0)
+        entry = trend_entry | bounce_entry
+
+        # El precio de entrada depende de las acciones previas: recorrido escalar
+        has_position = False
+        entry_price = 0.0
+        for t, (price, below, enter) in enumerate(zip(
+            closes.tolist(), below_sma.tolist(), entry.tolist()
+        )):
+            if has_position:
+                pnl_pct = (price - entry_price) / entry_price
+                if pnl_pct <= -self.stop_loss_pct or pnl_pct >= self.take_profit_pct or below:
+                    actions[t] = SELL
+                    has_position = False
+            elif enter:
+                actions[t] = BUY
+                has_position = True
+                entry_price = price
+
+        return actions
+
     def reset(self):
         super().reset()
         self._entry_price = 0.0
@@ -11,16 +11,133 @@ Uso:
 import os
 import sys
 import json
+import gzip
+import time
 import argparse
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+try:
+    import orjson  # Serializador en C para las respuestas de la API (opcional)
+except ImportError:
+    orjson = None
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+# Dependencias pesadas al arrancar el servidor, no en el primer request
+import pandas as pd
+import pyarrow.parquet as pq
+
+from cortex.experiments.experiment_store import (
+    ExperimentStore, _experiments_path, _file_version,
+)
+
 DASHBOARD_DIR = os.path.dirname(os.path.abspath(__file__))
 
 
+def _dumps(data) -> bytes:
+    """JSON de una respuesta de la API (orjson si está instalado; tipos no JSON → str)."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, default=str).encode()
+
+
+# Experimentos ya serializados: "current" → ((mtime_ns, tamaño) del JSONL,
+# bytes, cantidad). Se recalcula solo si el JSONL cambió; la tupla se
+# reemplaza entera para que los hilos del servidor no vean estados mezclados.
+_EXPERIMENTS_CACHE = {}
+
+
+@functools.lru_cache(maxsize=1)
+def _experiment_store() -> ExperimentStore:
+    """Store compartido por todos los requests (se crea en el primer uso)."""
+    return ExperimentStore()
+
+
+def _experiments():
+    """(JSON de todos los experimentos, cantidad), releyendo el store solo si cambió."""
+    version = _file_version(_experiments_path())
+    cached = _EXPERIMENTS_CACHE.get("current")
+    if cached is not None and cached[0] == version:
+        return cached[1], cached[2]
+
+    data = [e.to_dict() for e in _experiment_store().list_all()]
+    payload = _dumps(data)
+    _EXPERIMENTS_CACHE["current"] = (version, payload, len(data))
+    return payload, len(data)
+
+
+# /api/status se sondea seguido: la respuesta se reutiliza durante STATUS_TTL
+# segundos. "current" → (time.monotonic() al armarla, bytes)
+STATUS_TTL = 5.0
+_STATUS_CACHE = {}
+
+# Respuestas más chicas que esto se envían sin comprimir
+GZIP_MIN_BYTES = 1024
+
+# Formatos de resultados de backtest que lista /api/backtests
+BACKTEST_EXTENSIONS = (".csv", ".parquet")
+BACKTEST_TAIL_ROWS = 50
+
+# Lecturas de resultados de backtest en paralelo (pyarrow y el parser CSV de
+# pandas liberan el GIL mientras leen y decodifican)
+_READ_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="backtest-read")
+
+# Entrada JSON ya serializada de cada archivo de backtest:
+# ruta → (st_mtime_ns, st_size, bytes). Solo se relee el archivo si cambió.
+_BACKTEST_CACHE = {}
+
+
+def _parquet_tail(path: str, n: int):
+    """
+    (filas totales, columnas, DataFrame con las últimas `n` filas) de un
+    Parquet: filas y columnas salen del footer y solo se decodifican los
+    últimos row groups.
+    """
+    pf = pq.ParquetFile(path)
+    total = pf.metadata.num_rows
+    groups, covered = [], 0
+    for rg in range(pf.metadata.num_row_groups - 1, -1, -1):
+        if covered >= n:
+            break
+        groups.insert(0, rg)
+        covered += pf.metadata.row_group(rg).num_rows
+    table = pf.read_row_groups(groups) if groups else pf.schema_arrow.empty_table()
+    if table.num_rows > n:
+        table = table.slice(table.num_rows - n)
+    return total, pf.schema_arrow.names, table.to_pandas()
+
+
+def _backtest_entry(entry):
+    """JSON de un resultado de results/ (b"" si está vacío o no se puede leer)."""
+    stat = entry.stat()
+    cached = _BACKTEST_CACHE.get(entry.path)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    payload = b""
+    try:
+        if entry.name.endswith(".parquet"):
+            rows, columns, tail = _parquet_tail(entry.path, BACKTEST_TAIL_ROWS)
+        else:
+            df = pd.read_csv(entry.path)
+            rows, columns, tail = len(df), list(df.columns), df.tail(BACKTEST_TAIL_ROWS)
+        if rows:
+            payload = _dumps({
+                "filename": entry.name,
+                "rows": rows,
+                "columns": columns,
+                "data": tail.to_dict(orient="records"),
+            })
+    except Exception:
+        pass
+    _BACKTEST_CACHE[entry.path] = (stat.st_mtime_ns, stat.st_size, payload)
+    return payload
+
+
 class DashboardHandler(SimpleHTTPRequestHandler):
     """Handler que sirve el dashboard y provee una API para datos."""
 
@@ -40,60 +157,64 @@ class DashboardHandler(SimpleHTTPRequestHandler):
         else:
             super().do_GET()
 
-    def _serve_experiments(self):
-        """API endpoint: lista todos los experimentos."""
-        from cortex.experiments.experiment_store import ExperimentStore
-        store = ExperimentStore()
-        experiments = store.list_all()
-        data = [e.to_dict() for e in experiments]
-
+    def _send_json(self, payload: bytes):
+        """Responde `payload` (JSON), con gzip nivel 1 si el cliente lo acepta."""
         self.send_response(200)
         self.send_header("Content-Type", "application/json")
         self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Vary", "Accept-Encoding")
+        if len(payload) >= GZIP_MIN_BYTES and "gzip" in self.headers.get("Accept-Encoding", ""):
+            payload = gzip.compress(payload, compresslevel=1)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(payload)))
         self.end_headers()
-        self.wfile.write(json.dumps(data, default=str).encode())
+        self.wfile.write(payload)
+
+    def _serve_experiments(self):
+        """API endpoint: lista todos los experimentos."""
+        payload, _ = _experiments()
+
+        self._send_json(payload)
 
     def _serve_backtests(self):
-        """API endpoint: lista CSVs de backtests disponibles."""
+        """API endpoint: lista resultados de backtests (CSV/Parquet, últimas 50 filas de cada uno)."""
         results_dir = os.path.join(PROJECT_ROOT, "results")
         backtests = []
 
         if os.path.exists(results_dir):
-            for f in sorted(os.listdir(results_dir)):
-                if f.endswith(".csv"):
-                    filepath = os.path.join(results_dir, f)
-                    try:
-                        import pandas as pd
-                        df = pd.read_csv(filepath)
-                        if not df.empty:
-                            backtests.append({
-                                "filename": f,
-                                "rows": len(df),
-                                "columns": list(df.columns),
-                                "data": df.to_dict(orient="records")[-50:],
-                            })
-                    except Exception:
-                        pass
+            with os.scandir(results_dir) as it:
+                entries = sorted(
+                    (e for e in it if e.name.endswith(BACKTEST_EXTENSIONS) and e.is_file()),
+                    key=lambda e: e.name,
+                )
+            # map conserva el orden por nombre
+            backtests = [p for p in _READ_POOL.map(_backtest_entry, entries) if p]
+            # Olvidar los archivos que ya no existen
+            current = {e.path for e in entries}
+            for path in list(_BACKTEST_CACHE):
+                if path not in current:
+                    _BACKTEST_CACHE.pop(path, None)
 
-        self.send_response(200)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.end_headers()
-        self.wfile.write(json.dumps(backtests, default=str).encode())
+        self._send_json(b"[" + b",".join(backtests) + b"]")
 
     def _serve_status(self):
-        """API endpoint: estado del sistema."""
+        """API endpoint: estado del sistema (cacheado STATUS_TTL segundos)."""
+        now = time.monotonic()
+        cached = _STATUS_CACHE.get("current")
+        if cached is not None and now - cached[0] < STATUS_TTL:
+            self._send_json(cached[1])
+            return
+
         data_dir = os.path.join(PROJECT_ROOT, "data", "market", "raw")
         parquet_files = []
         if os.path.exists(data_dir):
-            for f in os.listdir(data_dir):
-                if f.endswith(".parquet"):
-                    size = os.path.getsize(os.path.join(data_dir, f))
-                    parquet_files.append({"name": f, "size_kb": round(size / 1024, 1)})
+            with os.scandir(data_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".parquet"):
+                        size = entry.stat().st_size
+                        parquet_files.append({"name": entry.name, "size_kb": round(size / 1024, 1)})
 
-        from cortex.experiments.experiment_store import ExperimentStore
-        store = ExperimentStore()
-        total_experiments = len(store.list_all())
+        _, total_experiments = _experiments()
 
         status = {
             "project": "SENTINEL",
@@ -103,11 +224,9 @@ class DashboardHandler(SimpleHTTPRequestHandler):
             "agents_available": ["buy_hold", "statistical", "swing", "contrarian", "llm"],
         }
 
-        self.send_response(200)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.end_headers()
-        self.wfile.write(json.dumps(status, default=str).encode())
+        payload = _dumps(status)
+        _STATUS_CACHE["current"] = (now, payload)
+        self._send_json(payload)
 
     def log_message(self, format, *args):
         if "/api/" not in str(args[0]):
@@ -120,7 +239,8 @@ def main():
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Host")
     args = parser.parse_args()
 
-    server = HTTPServer((args.host, args.port), DashboardHandler)
+    # Un hilo por request: una lectura lenta de /api/backtests no bloquea al resto
+    server = ThreadingHTTPServer((args.host, args.port), DashboardHandler)
     print(f"\n  SENTINEL Dashboard")
     print(f"  URL: http://localhost:{args.port}")
     print(f"  API: /api/experiments | /api/backtests | /api/status")
@@ -4,6 +4,7 @@ import os
 import subprocess
 import json
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 
 # Configuration
 REGION = "us-east-1"
@@ -14,17 +15,25 @@ SG_NAME = f"{PROJECT_NAME}-sg"
 ROLE_NAME = f"{PROJECT_NAME}-role"
 INSTANCE_TYPE = "t3.medium"
 AMI_NAME_FILTER = "al2023-ami-2023*" # Amazon Linux 2023
+AMI_CACHE_PATH = os.path.expanduser("~/.cache/sentinel/ami.json")
+AMI_CACHE_TTL = 24 * 3600  # seconds
 
 ec2 = boto3.client("ec2", region_name=REGION)
 s3 = boto3.client("s3", region_name=REGION)
 iam = boto3.client("iam", region_name=REGION)
 
+_MY_IP = None
+
 def get_my_ip():
-    try:
-        with urllib.request.urlopen("http://checkip.amazonaws.com") as response:
-            return response.read().decode("utf-8").strip() + "/32"
-    except:
-        return "0.0.0.0/0"
+    # Looked up once per run; a hung checkip endpoint gives up after 3 seconds
+    global _MY_IP
+    if _MY_IP is None:
+        try:
+            with urllib.request.urlopen("http://checkip.amazonaws.com", timeout=3) as response:
+                _MY_IP = response.read().decode("utf-8").strip() + "/32"
+        except:
+            return "0.0.0.0/0"
+    return _MY_IP
 
 def create_key_pair():
     print(f"Checking Key Pair '{KEY_NAME}'...")
@@ -130,20 +139,47 @@ def create_s3_bucket():
         print(f"⚠️ Could not create bucket (might exist): {e}")
     return BUCKET_NAME
 
+def _read_ami_cache():
+    """Cached AMI id for this region/filter if younger than AMI_CACHE_TTL, else None."""
+    try:
+        with open(AMI_CACHE_PATH) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (cached.get("region") == REGION and cached.get("filter") == AMI_NAME_FILTER
+            and time.time() - cached.get("ts", 0) < AMI_CACHE_TTL):
+        return cached.get("id")
+    return None
+
+def _write_ami_cache(ami_id):
+    try:
+        os.makedirs(os.path.dirname(AMI_CACHE_PATH), exist_ok=True)
+        with open(AMI_CACHE_PATH, "w") as f:
+            json.dump({"region": REGION, "filter": AMI_NAME_FILTER, "id": ami_id, "ts": time.time()}, f)
+    except OSError:
+        pass  # The cache is only an optimization
+
 def get_latest_ami():
+    # describe_images returns every matching AMI; reuse the last answer for a day
+    ami_id = _read_ami_cache()
+    if ami_id:
+        return ami_id
+
     response = ec2.describe_images(
         Filters=[
             {'Name': 'name', 'Values': [AMI_NAME_FILTER]},
             {'Name': 'architecture', 'Values': ['x86_64']},
-            {'Name': 'owner-alias', 'Values': ['amazon']}
+            {'Name': 'owner-alias', 'Values': ['amazon']},
+            {'Name': 'state', 'Values': ['available']}
         ],
         Owners=['amazon']
     )
-    # Sort by creation date
-    images = sorted(response['Images'], key=lambda x: x['CreationDate'], reverse=True)
-    if not images:
+    # Most recent by creation date
+    if not response['Images']:
         raise Exception("No AMI found")
-    return images[0]['ImageId']
+    ami_id = max(response['Images'], key=lambda x: x['CreationDate'])['ImageId']
+    _write_ami_cache(ami_id)
+    return ami_id
 
 def launch_instance(sg_id):
     ami_id = get_latest_ami()
@@ -182,10 +218,17 @@ chown -R ec2-user:ec2-user /home/ec2-user/sentinel
 def main():
     print("🚀 Initializing Sentinel Cloud Environment...")
     
-    create_key_pair()
-    sg_id = create_security_group()
-    create_iam_role()
-    bucket = create_s3_bucket()
+    # Key pair, security group, IAM role (with its propagation wait) and bucket
+    # don't depend on each other: create them concurrently
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        key_pair = pool.submit(create_key_pair)
+        security_group = pool.submit(create_security_group)
+        iam_role = pool.submit(create_iam_role)
+        s3_bucket = pool.submit(create_s3_bucket)
+        key_pair.result()
+        sg_id = security_group.result()
+        iam_role.result()
+        bucket = s3_bucket.result()
     
     instance_id = launch_instance(sg_id)
     
@@ -1,6 +1,7 @@
 import yfinance as yf
 import pandas as pd
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 # Configuración
@@ -9,29 +10,42 @@ DATA_DIR = os.path.join(SCRIPT_DIR, "data", "market", "raw")
 SYMBOLS = ["BTC-USD", "ETH-USD", "SOL-USD"]
 INTERVALS = ["1d", "1h"]  # Diario y Horario
 START_DATE = "2020-01-01"
+MAX_WORKERS = 6  # Descargas simultáneas (limitadas por la red, no por CPU)
+# Parquet con ZSTD, diccionario y estadísticas min/max por row group
+PARQUET_OPTIONS = {
+    "engine": "pyarrow",
+    "compression": "zstd",
+    "compression_level": 3,
+    "use_dictionary": True,
+    "write_statistics": True,
+    "row_group_size": 50_000,
+}
 
 def setup_dirs():
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
         print(f"Created directory: {DATA_DIR}")
 
-def download_data(symbol, interval):
-    print(f"Downloading {symbol} ({interval})...")
-    
+def fetch_history(symbol, interval):
     # Yahoo Finance tiene limites para datos horarios (max 730 dias atras)
     # Para diario podemos ir más atrás.
     
+    # Ticker object
+    ticker = yf.Ticker(symbol)
+    
+    # Download
+    # period="max" intenta traer todo, pero limitado por intervalo
+    if interval == "1h":
+        # Para 1h, bajamos los ultimos 2 años (limite de YF)
+        return ticker.history(period="2y", interval=interval)
+    return ticker.history(start=START_DATE, interval=interval)
+
+def download_data(symbol, interval, pending=None):
+    """Descarga y guarda un símbolo; `pending` es un Future de fetch_history ya en curso."""
+    print(f"Downloading {symbol} ({interval})...")
+    
     try:
-        # Ticker object
-        ticker = yf.Ticker(symbol)
-        
-        # Download
-        # period="max" intenta traer todo, pero limitado por intervalo
-        if interval == "1h":
-            # Para 1h, bajamos los ultimos 2 años (limite de YF)
-            df = ticker.history(period="2y", interval=interval)
-        else:
-            df = ticker.history(start=START_DATE, interval=interval)
+        df = pending.result() if pending is not None else fetch_history(symbol, interval)
             
         if df.empty:
             print(f"⚠️ No data found for {symbol} {interval}")
@@ -44,7 +58,7 @@ def download_data(symbol, interval):
         # Reset index to keep Date/Datetime as a column
         df.reset_index(inplace=True)
         
-        df.to_parquet(filepath)
+        df.to_parquet(filepath, **PARQUET_OPTIONS)
         print(f"✅ Saved {len(df)} rows to {filepath}")
         
         # Preview
@@ -58,9 +72,12 @@ def main():
     setup_dirs()
     print(f"🚀 Starting Price Downloader to {DATA_DIR}")
     
-    for symbol in SYMBOLS:
-        for interval in INTERVALS:
-            download_data(symbol, interval)
+    # Todas las descargas salen a la vez; se guardan en orden desde este hilo
+    jobs = [(symbol, interval) for symbol in SYMBOLS for interval in INTERVALS]
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = [pool.submit(fetch_history, symbol, interval) for symbol, interval in jobs]
+        for (symbol, interval), future in zip(jobs, futures):
+            download_data(symbol, interval, future)
             
     print("\n🏁 Download complete. Data is ready for the Gym.")
 
@@ -6,16 +6,129 @@ Actualiza los datos de precios al día más reciente.
 Preserva datos existentes y solo descarga lo que falta.
 
 Uso: python3 refresh_data.py [--full]
+     python3 refresh_data.py --s3-status BUCKET   # fecha de los datos en S3
 """
 
 import os
 import sys
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(SCRIPT_DIR, "data", "market", "raw")
 
+# Símbolo → intervalos que se mantienen actualizados
+SYMBOLS = {
+    "BTC-USD": ["1d", "1h"],
+    "ETH-USD": ["1d", "1h"],
+    "SOL-USD": ["1d", "1h"],
+}
+
+# Prefijo de los precios en el Data Lake (ver sync_to_s3.py)
+S3_PRICES_PREFIX = "raw/prices"
+
+# Descargas simultáneas (cada una espera casi todo el tiempo a la red)
+MAX_WORKERS = 6
+
+# Columnas de tiempo de los Parquet de precios (índice de yfinance)
+TIME_COLUMNS = ("Date", "Datetime")
+
+# Opciones de escritura de los Parquet: ZSTD, diccionario y estadísticas
+# min/max por row group (el loader las usa para saltar row groups por fecha)
+PARQUET_OPTIONS = {
+    "compression": "zstd",
+    "compression_level": 3,
+    "use_dictionary": True,
+    "write_statistics": True,
+}
+ROW_GROUP_SIZE = 50_000
+
+
+def _download_one(symbol: str, interval: str, period: str):
+    """Historial de `symbol` para `period` (corre en un hilo del pool)."""
+    import yfinance as yf
+    return yf.Ticker(symbol).history(period=period, interval=interval)
+
+
+def _last_timestamp(filepath: str, filesystem=None):
+    """
+    Último timestamp guardado en el Parquet, leído de las estadísticas max de
+    cada row group (footer, sin decodificar filas). None si no hay columna de
+    tiempo reconocible.
+
+    Con un `filesystem` de pyarrow (p. ej. S3FileSystem) solo se piden por
+    rango los bytes del footer, no el archivo completo.
+    """
+    import pandas as pd
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(filepath, filesystem=filesystem)
+    names = pf.schema_arrow.names
+    time_col = next((c for c in TIME_COLUMNS if c in names), None)
+    if time_col is None:
+        return None
+
+    col_idx = pf.metadata.schema.names.index(time_col)
+    maxima = []
+    for rg in range(pf.metadata.num_row_groups):
+        stats = pf.metadata.row_group(rg).column(col_idx).statistics
+        if stats is None or not stats.has_min_max:
+            # Sin estadísticas: leer solo esa columna
+            return pd.Timestamp(pc.max(pf.read(columns=[time_col]).column(0)).as_py())
+        maxima.append(pd.Timestamp(stats.max))
+    return max(maxima) if maxima else None
+
+
+def _append_rows(filepath: str, df):
+    """
+    Agrega `df` (historial con índice de tiempo) al Parquet. Las velas
+    guardadas desde el primer timestamp de `df` en adelante se reemplazan (la
+    última suele estar incompleta).
+
+    Parquet no permite agregar a un archivo existente: se copian los row
+    groups previos tal cual (sin pasar por pandas) a un archivo temporal y
+    se reemplaza el original. El último row group se reescribe junto con las
+    filas nuevas, en grupos de hasta ROW_GROUP_SIZE, para que cada refresh
+    no deje un row group diminuto más.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(filepath)
+    schema = pf.schema_arrow
+    time_col = next(c for c in TIME_COLUMNS if c in schema.names)
+
+    new = pa.Table.from_pandas(df.reset_index(), preserve_index=False)
+    new = new.rename_columns([time_col if n in TIME_COLUMNS else n for n in new.column_names])
+    new = new.select(schema.names).cast(schema)
+    first_new = new.column(time_col)[0]
+
+    tmp_path = filepath + ".tmp"
+    try:
+        with pq.ParquetWriter(tmp_path, schema, **PARQUET_OPTIONS) as writer:
+            tail = None
+            for rg in range(pf.metadata.num_row_groups):
+                table = pf.read_row_group(rg)
+                keep = pc.less(table.column(time_col), first_new)
+                if not pc.all(keep).as_py():
+                    table = table.filter(keep)
+                if not table.num_rows:
+                    continue
+                if tail is not None:
+                    writer.write_table(tail)
+                tail = table
+            if tail is not None:
+                new = pa.concat_tables([tail, new])
+            writer.write_table(new, row_group_size=ROW_GROUP_SIZE)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 
 def refresh_prices(full: bool = False):
     """Descarga/actualiza datos de precios."""
@@ -28,18 +141,15 @@ def refresh_prices(full: bool = False):
 
     os.makedirs(DATA_DIR, exist_ok=True)
 
-    symbols = {
-        "BTC-USD": ["1d", "1h"],
-        "ETH-USD": ["1d", "1h"],
-        "SOL-USD": ["1d", "1h"],
-    }
-
     print(f"\n🛡️  SENTINEL — Refresh Data")
     print(f"    Fecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"    Modo:  {'COMPLETO (2 años)' if full else 'INCREMENTAL'}")
     print(f"    Dir:   {DATA_DIR}\n")
 
-    for symbol, intervals in symbols.items():
+    # (símbolo, intervalo, periodo, archivo, etiqueta, agregar al existente)
+    # de cada descarga pendiente
+    jobs = []
+    for symbol, intervals in SYMBOLS.items():
         for interval in intervals:
             filename = f"{symbol}_{interval}.parquet"
             filepath = os.path.join(DATA_DIR, filename)
@@ -51,17 +161,15 @@ def refresh_prices(full: bool = False):
                     period = "2y"
                 else:
                     period = "60d"  # yfinance limita hourly a ~60 días
-                print(f"  ⬇️  {symbol} {interval} (completo, {period})...", end=" ", flush=True)
+                label = f"{symbol} {interval} (completo, {period})"
+                append = False
             else:
-                # Incremental: leer último timestamp y descargar desde ahí
-                existing = pd.read_parquet(filepath)
-                
-                # Buscar columna de timestamp
-                if "Date" in existing.columns:
-                    last_date = pd.to_datetime(existing["Date"]).max()
-                elif "Datetime" in existing.columns:
-                    last_date = pd.to_datetime(existing["Datetime"]).max()
-                else:
+                # Incremental: último timestamp (del footer) y descargar desde ahí
+                last_date = _last_timestamp(filepath)
+                append = last_date is not None
+                if last_date is None:
+                    # Sin columna Date/Datetime: el tiempo es el índice (solo se lee ese)
+                    existing = pd.read_parquet(filepath, columns=[])
                     last_date = pd.to_datetime(existing.index).max()
                 
                 days_behind = (datetime.now() - last_date.to_pydatetime().replace(tzinfo=None)).days
@@ -71,18 +179,30 @@ def refresh_prices(full: bool = False):
                     continue
 
                 period = f"{min(days_behind + 5, 730)}d"  # +5 días de margen
-                print(f"  ⬇️  {symbol} {interval} (incremental, {days_behind} días atrás)...", end=" ", flush=True)
+                label = f"{symbol} {interval} (incremental, {days_behind} días atrás)"
 
+            jobs.append((symbol, interval, period, filepath, label, append))
+
+    # Descargas en paralelo; los Parquet se escriben desde este hilo, en orden
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(jobs)))) as pool:
+        futures = [
+            pool.submit(_download_one, symbol, interval, period)
+            for symbol, interval, period, _, _, _ in jobs
+        ]
+        for (symbol, interval, period, filepath, label, append), future in zip(jobs, futures):
+            print(f"  ⬇️  {label}...", end=" ", flush=True)
             try:
-                ticker = yf.Ticker(symbol)
-                df = ticker.history(period=period, interval=interval)
+                df = future.result()
 
                 if df.empty:
                     print(f"❌ sin datos")
                     continue
 
-                # Guardar como Parquet
-                df.to_parquet(filepath, engine="pyarrow")
+                # Guardar como Parquet (incremental: solo se agrega lo nuevo)
+                if append:
+                    _append_rows(filepath, df)
+                else:
+                    df.to_parquet(filepath, engine="pyarrow", row_group_size=ROW_GROUP_SIZE, **PARQUET_OPTIONS)
                 print(f"✅ {len(df)} filas ({df.index[0].date()} → {df.index[-1].date()})")
 
             except Exception as e:
@@ -100,12 +220,38 @@ def refresh_prices(full: bool = False):
     print(f"  💡 Para subir a S3: python3 sync_to_s3.py")
 
 
+def s3_status(bucket: str):
+    """Último timestamp de cada Parquet de precios en S3, leyendo solo los footers."""
+    try:
+        from pyarrow.fs import S3FileSystem
+    except ImportError:
+        print("❌ Esta versión de pyarrow no incluye soporte para S3")
+        sys.exit(1)
+
+    fs = S3FileSystem()
+    print(f"\n🛡️  SENTINEL — Datos en s3://{bucket}/{S3_PRICES_PREFIX}/\n")
+    for symbol, intervals in SYMBOLS.items():
+        for interval in intervals:
+            key = f"{bucket}/{S3_PRICES_PREFIX}/{symbol}_{interval}.parquet"
+            try:
+                last_date = _last_timestamp(key, filesystem=fs)
+            except OSError as e:  # Incluye archivo inexistente y errores de S3
+                print(f"  ❌ {symbol} {interval}: {e}")
+                continue
+            print(f"  • {symbol} {interval}: {last_date if last_date is not None else 'sin columna de tiempo'}")
+
+
 def main():
     parser = argparse.ArgumentParser(description="🛡️ SENTINEL Refresh Data")
     parser.add_argument("--full", action="store_true",
                         help="Descarga completa (ignora datos existentes)")
+    parser.add_argument("--s3-status", metavar="BUCKET", default=None,
+                        help="Solo mostrar hasta qué fecha llegan los datos en S3")
     args = parser.parse_args()
-    refresh_prices(full=args.full)
+    if args.s3_status:
+        s3_status(args.s3_status)
+    else:
+        refresh_prices(full=args.full)
 
 
 if __name__ == "__main__":
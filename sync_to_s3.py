@@ -10,10 +10,16 @@ Uploads local data/ directory to S3 following the Data Lake structure:
 """
 
 import boto3
+import hashlib
+import json
 import os
+import time
 import sys
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -23,24 +29,66 @@ KNOWN_BUCKETS = [
     "sentinel-hft-datalake-1767754483",
 ]
 
+# Auto-detected bucket, reused for an hour so repeated syncs skip list_buckets
+BUCKET_CACHE_PATH = os.path.expanduser("~/.cache/sentinel/bucket.json")
+BUCKET_CACHE_TTL = 3600  # seconds
+
+# Uploads are bound by per-request round trips, so several run at once
+UPLOAD_WORKERS = 16
+# Files above S3's minimum part size go up as 8 MB parts, up to 8 in flight
+# per file (read by offset from the path, so parts do not wait on each other)
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=5 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=8,
+    use_threads=True,
+)
+
+
+def _read_bucket_cache():
+    """Bucket found by a previous run if younger than BUCKET_CACHE_TTL, else None."""
+    try:
+        with open(BUCKET_CACHE_PATH) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - cached.get("ts", 0) < BUCKET_CACHE_TTL:
+        return cached.get("bucket")
+    return None
+
+
+def _write_bucket_cache(bucket):
+    try:
+        os.makedirs(os.path.dirname(BUCKET_CACHE_PATH), exist_ok=True)
+        with open(BUCKET_CACHE_PATH, "w") as f:
+            json.dump({"bucket": bucket, "ts": time.time()}, f)
+    except OSError:
+        pass  # The cache is only an optimization
+
 
 def find_sentinel_bucket(s3_client):
     """Auto-detect the sentinel S3 bucket."""
+    cached = _read_bucket_cache()
+    if cached:
+        print(f"  🪣 Cached bucket: {cached}")
+        return cached
+    
     try:
         response = s3_client.list_buckets()
         buckets = [b["Name"] for b in response["Buckets"]]
-        sentinel_buckets = [b for b in buckets if "sentinel" in b.lower()]
         
-        if sentinel_buckets:
-            # Use the most recent one
-            bucket = sorted(sentinel_buckets)[-1]
+        # Use the most recent one (names end in the creation timestamp)
+        bucket = max((b for b in buckets if "sentinel" in b.lower()), default=None)
+        if bucket:
             print(f"  🪣 Auto-detected bucket: {bucket}")
+            _write_bucket_cache(bucket)
             return bucket
         
         # Check known buckets
         for known in KNOWN_BUCKETS:
             if known in buckets:
                 print(f"  🪣 Found known bucket: {known}")
+                _write_bucket_cache(known)
                 return known
         
         print("  ❌ No sentinel bucket found. Create one with:")
@@ -51,34 +99,99 @@ def find_sentinel_bucket(s3_client):
         return None
 
 
-def sync_directory(s3_client, local_dir, bucket, s3_prefix, dry_run=False):
-    """Upload files from local_dir to s3://bucket/s3_prefix/"""
+def iter_files(directory):
+    """Yield (path, size) for every file under directory, in os.walk order.
+
+    DirEntry caches the file type from the directory listing, so each file
+    costs a single stat() for its size.
+    """
+    subdirs = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_dir():
+                if not entry.is_symlink():  # os.walk does not follow links
+                    subdirs.append(entry.path)
+            else:
+                yield entry.path, entry.stat().st_size
+    for subdir in subdirs:
+        yield from iter_files(subdir)
+
+
+def local_etag(path, file_size):
+    """ETag S3 would report for this file if uploaded with TRANSFER_CONFIG.
+
+    Single-part objects use the MD5 of the body; multipart objects use the MD5
+    of the concatenated part MD5s plus "-<parts>".
+    """
+    chunk = TRANSFER_CONFIG.multipart_chunksize
+    with open(path, "rb") as f:
+        if file_size < TRANSFER_CONFIG.multipart_threshold:
+            return hashlib.md5(f.read()).hexdigest()
+        part_digests = [hashlib.md5(part).digest() for part in iter(lambda: f.read(chunk), b"")]
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+
+def upload_if_changed(s3_client, local_path, bucket, s3_key, force=False):
+    """Upload unless S3 already holds the same bytes (ETag match). Returns True if uploaded."""
+    if not force:
+        try:
+            head = s3_client.head_object(Bucket=bucket, Key=s3_key)
+        except Exception:
+            head = None  # Missing object (404) or no HEAD permission: upload
+        if head is not None and head["ContentLength"] == os.path.getsize(local_path):
+            if head["ETag"].strip('"') == local_etag(local_path, head["ContentLength"]):
+                return False
+    s3_client.upload_file(local_path, bucket, s3_key, Config=TRANSFER_CONFIG)
+    return True
+
+
+def sync_directory(s3_client, local_dir, bucket, s3_prefix, dry_run=False, workers=UPLOAD_WORKERS, force=False):
+    """Upload files from local_dir to s3://bucket/s3_prefix/ (up to `workers` at a time).
+
+    Files whose S3 object already matches (same size and ETag) are skipped
+    unless force=True. Returns the number of files uploaded (or attempted).
+    """
     if not os.path.exists(local_dir):
         print(f"  ⚠️  Directory not found: {local_dir}")
         return 0
     
-    uploaded = 0
-    for root, dirs, files in os.walk(local_dir):
-        for filename in files:
-            local_path = os.path.join(root, filename)
-            # Build S3 key preserving subdirectory structure
-            relative_path = os.path.relpath(local_path, local_dir)
-            s3_key = f"{s3_prefix}/{relative_path}"
-            
-            file_size = os.path.getsize(local_path)
-            size_mb = file_size / (1024 * 1024)
-            
-            if dry_run:
-                print(f"  [DRY-RUN] Would upload: {relative_path} → s3://{bucket}/{s3_key} ({size_mb:.2f} MB)")
-            else:
-                print(f"  ⬆️  Uploading: {relative_path} ({size_mb:.2f} MB)...", end=" ", flush=True)
-                try:
-                    s3_client.upload_file(local_path, bucket, s3_key)
-                    print("✅")
-                except Exception as e:
-                    print(f"❌ {e}")
+    # (local path, relative path, S3 key preserving subdirectory structure, size in MB)
+    jobs = []
+    for local_path, file_size in iter_files(local_dir):
+        relative_path = os.path.relpath(local_path, local_dir)
+        jobs.append((local_path, relative_path, f"{s3_prefix}/{relative_path}", file_size / (1024 * 1024)))
+    
+    if dry_run:
+        for _, relative_path, s3_key, size_mb in jobs:
+            print(f"  [DRY-RUN] Would upload: {relative_path} → s3://{bucket}/{s3_key} ({size_mb:.2f} MB)")
+        return len(jobs)
+    
+    if not jobs:
+        return 0
+    
+    # The S3 client is thread-safe; the HEAD checks run in the same workers as
+    # the uploads, and results are printed as they finish
+    uploaded = skipped = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+        futures = {
+            pool.submit(upload_if_changed, s3_client, local_path, bucket, s3_key, force):
+                (relative_path, size_mb)
+            for local_path, relative_path, s3_key, size_mb in jobs
+        }
+        for future in as_completed(futures):
+            relative_path, size_mb = futures[future]
+            try:
+                if future.result():
+                    print(f"  ⬆️  Uploaded: {relative_path} ({size_mb:.2f} MB) ✅")
+                else:
+                    skipped += 1
+                    continue
+            except Exception as e:
+                print(f"  ❌ Failed: {relative_path} ({size_mb:.2f} MB): {e}")
             uploaded += 1
     
+    if skipped:
+        print(f"  ⏭️  {skipped} unchanged files skipped")
     return uploaded
 
 
@@ -86,6 +199,8 @@ def main():
     parser = argparse.ArgumentParser(description="Sync SENTINEL data to S3")
     parser.add_argument("--bucket", help="S3 bucket name (auto-detected if omitted)")
     parser.add_argument("--dry-run", action="store_true", help="Show what would be uploaded without uploading")
+    parser.add_argument("--workers", type=int, default=UPLOAD_WORKERS, help="Concurrent uploads")
+    parser.add_argument("--force", action="store_true", help="Upload even files that are unchanged in S3")
     args = parser.parse_args()
     
     print("\n🛡️  SENTINEL — Data Sync to S3")
@@ -93,7 +208,12 @@ def main():
     print(f"    Mode: {'DRY RUN' if args.dry_run else 'LIVE UPLOAD'}")
     print()
     
-    s3_client = boto3.client("s3")
+    # One client shared by every upload thread: size its connection pool for
+    # all of their parts in flight (botocore defaults to 10 sockets)
+    s3_client = boto3.client(
+        "s3",
+        config=Config(max_pool_connections=max(1, args.workers) * TRANSFER_CONFIG.max_concurrency),
+    )
     
     # Determine bucket
     bucket = args.bucket or find_sentinel_bucket(s3_client)
@@ -105,12 +225,12 @@ def main():
     # Sync price data
     print("  ── Precio (Market Data) ──")
     prices_dir = os.path.join(SCRIPT_DIR, "data", "market", "raw")
-    count_prices = sync_directory(s3_client, prices_dir, bucket, "raw/prices", args.dry_run)
+    count_prices = sync_directory(s3_client, prices_dir, bucket, "raw/prices", args.dry_run, args.workers, args.force)
     
     # Sync sentiment data
     print("\n  ── Sentimiento ──")
     sentiment_dir = os.path.join(SCRIPT_DIR, "data", "sentimental", "raw")
-    count_sentiment = sync_directory(s3_client, sentiment_dir, bucket, "raw/sentiment", args.dry_run)
+    count_sentiment = sync_directory(s3_client, sentiment_dir, bucket, "raw/sentiment", args.dry_run, args.workers, args.force)
     
     # Summary
     total = count_prices + count_sentiment
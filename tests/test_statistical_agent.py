@@ -0,0 +1,98 @@
+"""
+StatisticalAgent: el kernel Numba, el camino NumPy y decide_series deben dar
+las mismas acciones, también con precios planos (SMA rápida == lenta).
+
+Uso: python -m unittest discover tests
+"""
+
+import unittest
+
+import numpy as np
+
+import cortex.agents.statistical_agent as statistical_agent
+from cortex.agents.statistical_agent import StatisticalAgent
+
+WINDOW = 50
+
+
+def _prices(closes: np.ndarray) -> np.ndarray:
+    """Velas OHLCV con los cierres dados (columna 3)."""
+    return np.column_stack([closes, closes, closes, closes, np.ones(len(closes))])
+
+
+def _piecewise_flat(seed: int, n: int = 300) -> np.ndarray:
+    """Tramos de precio constante con saltos, redondeados como cotizaciones reales."""
+    rng = np.random.default_rng(seed)
+    closes = np.empty(n)
+    i, price = 0, 100.0
+    while i < n:
+        length = int(rng.integers(1, 60))
+        price = round(price * (1 + rng.normal(0, 0.03)), int(rng.integers(0, 4)))
+        closes[i:i + length] = price
+        i += length
+    return _prices(closes)
+
+
+def _step_actions(prices: np.ndarray, use_numba: bool, window: int = WINDOW) -> np.ndarray:
+    """Acciones de decide() paso a paso, sin indicadores precomputados."""
+    previous = statistical_agent.HAS_NUMBA
+    statistical_agent.HAS_NUMBA = use_numba
+    try:
+        agent = StatisticalAgent()
+        position = 0.0
+        actions = []
+        for t in range(len(prices)):
+            observation = {
+                "prices": prices[max(0, t + 1 - window):t + 1],
+                "position": position,
+                "sentiment": 0.0,
+                "step": t,
+            }
+            action = agent.decide(observation)
+            if action == 1:
+                position = 1.0
+            elif action == 2:
+                position = 0.0
+            actions.append(action)
+        return np.array(actions, dtype=np.int8)
+    finally:
+        statistical_agent.HAS_NUMBA = previous
+
+
+class StatisticalAgentPathsTest(unittest.TestCase):
+
+    def test_constant_window_matches_np_mean(self):
+        # Con precio constante las SMA dependen del orden de suma: ambos
+        # caminos deben dar exactamente np.mean de cada ventana
+        closes = np.full(WINDOW, 123.45)
+        expected = (np.mean(closes[-10:]), np.mean(closes[-30:]), 100.0)
+        previous = statistical_agent.HAS_NUMBA
+        try:
+            for use_numba in {False, previous}:
+                statistical_agent.HAS_NUMBA = use_numba
+                indicators = StatisticalAgent()._compute_indicators(closes, 0.0)
+                self.assertEqual(indicators[:3], expected)
+        finally:
+            statistical_agent.HAS_NUMBA = previous
+
+    @unittest.skipUnless(statistical_agent.HAS_NUMBA, "Numba no instalado")
+    def test_numba_matches_numpy(self):
+        constant = _prices(np.full(120, 0.1 + 0.2))
+        np.testing.assert_array_equal(
+            _step_actions(constant, True), _step_actions(constant, False)
+        )
+        for seed in range(10):
+            prices = _piecewise_flat(seed)
+            np.testing.assert_array_equal(
+                _step_actions(prices, True), _step_actions(prices, False)
+            )
+
+    def test_decide_series_matches_decide(self):
+        for seed in range(10):
+            prices = _piecewise_flat(seed)
+            expected = _step_actions(prices, False, window=len(prices))
+            np.testing.assert_array_equal(StatisticalAgent().decide_series(prices), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()